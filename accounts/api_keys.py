@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import ApiKey, hash_api_key
+from .versions import bump_version, read_version
+
+logger = logging.getLogger(__name__)
+
+# What a verified key grants; cached instead of the model instance
+VerifiedApiKey = namedtuple('VerifiedApiKey', ['id', 'user_id', 'user_email', 'prefix', 'rate_limit', 'burst_limit'])
+
+# SharedVersion bumped when a key changes, so every worker drops its verified keys
+API_KEYS_VERSION = 'api_keys'
+
+
+class VerifiedKeyCache:
+    """
+    In-process, bounded TTL cache of verified API keys by digest. Saving or
+    deleting a key clears it here and bumps the 'api_keys' SharedVersion in the
+    same transaction; other processes compare it at most every
+    API_KEY_VERSION_CHECK_INTERVAL seconds and drop their keys when it moved.
+    """
+
+    def __init__(self):
+        self._entries = {}  # digest -> (expires_at, VerifiedApiKey)
+        self._version = None
+        self._checked_at = 0.0
+        self.generation = 0  # Moves on every invalidation; lookups started before it are not cached
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'API_KEY_CACHE_TTL', 60)
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'API_KEY_CACHE_SIZE', 1000)
+
+    def _check_version(self, now):
+        if now - self._checked_at < getattr(settings, 'API_KEY_VERSION_CHECK_INTERVAL', 1):
+            return
+        version = read_version(API_KEYS_VERSION)
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self.generation += 1
+                self._version = version
+            self._checked_at = now
+
+    def get(self, digest):
+        now = time.monotonic()
+        self._check_version(now)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[0] < now:
+                del self._entries[digest]
+                return None
+            return entry[1]
+
+    def set(self, digest, verified, generation):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            if len(self._entries) >= self.max_size:
+                self._entries.clear()
+            self._entries[digest] = (time.monotonic() + self.ttl, verified)
+
+    def invalidate(self, pk=None):
+        """Drop a key (or every key) here and in every other process."""
+        bump_version(API_KEYS_VERSION)
+        with self._lock:
+            self.generation += 1
+            if pk is None:
+                self._entries.clear()
+            else:
+                for digest in [digest for digest, (_, verified) in self._entries.items() if verified.id == pk]:
+                    del self._entries[digest]
+
+
+USAGE_COUNTERS = ('request_count', 'event_count', 'throttled_count')
+
+
+class UsageRecorder:
+    """
+    Counts requests, events and throttled requests per key in memory and adds
+    them to the ApiKey counters (and last_used_at) at most every
+    API_KEY_USAGE_FLUSH_INTERVAL seconds, with one UPDATE per key used in the
+    interval, instead of a write per request. Counts not flushed when a worker
+    stops are lost.
+    """
+
+    def __init__(self):
+        self._pending = {}  # key id -> [requests, events, throttled, last used]
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, pk, requests=0, events=0, throttled=0):
+        now = timezone.now()
+        with self._lock:
+            usage = self._pending.setdefault(pk, [0, 0, 0, now])
+            usage[0] += requests
+            usage[1] += events
+            usage[2] += throttled
+            usage[3] = now
+            due = time.monotonic() - self._flushed_at >= getattr(settings, 'API_KEY_USAGE_FLUSH_INTERVAL', 5)
+        if due:
+            self.flush()
+
+    def pending(self, pk):
+        """Counts of a key not written yet, as {counter: value}."""
+        with self._lock:
+            usage = self._pending.get(pk, [0, 0, 0])
+            return dict(zip(USAGE_COUNTERS, usage[:3]))
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        for pk, usage in sorted(pending.items()):
+            last_used_at = usage[3]
+            try:
+                ApiKey.objects.filter(pk=pk).update(
+                    last_used_at=Greatest(Coalesce('last_used_at', last_used_at), last_used_at),
+                    **{counter: F(counter) + value for counter, value in zip(USAGE_COUNTERS, usage) if value},
+                )
+            except Exception as e:
+                logger.error(f"[UsageRecorder] Could not record usage of API key {pk}: {str(e)}")
+
+
+verified_keys = VerifiedKeyCache()
+key_usage = UsageRecorder()
+
+
+def authenticate_api_key(raw_key):
+    """The VerifiedApiKey of an active key, None for unknown or inactive keys. Counts the request."""
+    if not raw_key:
+        return None
+    digest = hash_api_key(raw_key)
+    verified = verified_keys.get(digest)
+    if verified is None:
+        generation = verified_keys.generation
+        api_key = ApiKey.objects.select_related('user').filter(key_hash=digest, is_active=True).first()
+        if api_key is None:
+            return None
+        verified = VerifiedApiKey(
+            api_key.pk, api_key.user_id, api_key.user.email, api_key.prefix, api_key.rate_limit, api_key.burst_limit,
+        )
+        verified_keys.set(digest, verified, generation)
+    key_usage.record(verified.id, requests=1)
+    return verified
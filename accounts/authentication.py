@@ -0,0 +1,144 @@
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import router
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import ClaimsChange, User, UserProfile
+
+logger = logging.getLogger(__name__)
+
+# User fields copied into the token; saving one of them (or the profile name) invalidates the user's claims
+CLAIM_FIELDS = ('email', 'name', 'role', 'is_staff')
+
+
+def claims_max_age():
+    return getattr(settings, 'JWT_CLAIMS_MAX_AGE', 300)
+
+
+def display_name(user, full_name=None):
+    """Name shown for a user: the profile's full name, else the user's name, else the start of the email."""
+    return full_name or user.name or user.email.split('@')[0]
+
+
+def claims_clock():
+    """Current time in milliseconds precision, the unit of the 'claims_at' claim."""
+    return math.floor(time.time() * 1000) / 1000
+
+
+def add_user_claims(token, user, claims_at=None):
+    """
+    Copy CLAIM_FIELDS, the display name and the time they were read into
+    ``token``. Pass ``claims_at`` when ``user`` was loaded earlier: a change
+    saved after that time must make the claims fall back to the database.
+    """
+    claims_at = claims_clock() if claims_at is None else claims_at
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    full_name = UserProfile.objects.filter(user=user).values_list('full_name', flat=True).first()
+    token['display_name'] = display_name(user, full_name)
+    token['claims_at'] = claims_at
+    return token
+
+
+class ClaimsChanges:
+    """
+    When the claims of users changed within the last JWT_CLAIMS_MAX_AGE seconds
+    (older claims are never trusted anyway). Each process reads them from
+    ClaimsChange, with one indexed range query at most every
+    JWT_CLAIMS_CHECK_INTERVAL seconds; changes marked in this process apply at once.
+    """
+
+    def __init__(self):
+        self._changed = {}  # user id -> changed_at
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < getattr(settings, 'JWT_CLAIMS_CHECK_INTERVAL', 1):
+            return
+        since = time.time() - claims_max_age()
+        changed = dict(ClaimsChange.objects.filter(changed_at__gte=since).values_list('user_id', 'changed_at'))
+        with self._lock:
+            for user_id, changed_at in self._changed.items():
+                # Marked here but not committed yet when the query ran
+                if changed_at >= since and changed_at > changed.get(user_id, 0):
+                    changed[user_id] = changed_at
+            self._changed = changed
+            self._checked_at = now
+
+    def changed_at(self, user_id):
+        self.refresh()
+        return self._changed.get(user_id)
+
+    def mark(self, user_id):
+        changed_at = time.time()
+        ClaimsChange.objects.update_or_create(user_id=user_id, defaults={'changed_at': changed_at})
+        with self._lock:
+            self._changed[user_id] = changed_at
+
+    def clear(self):
+        """Forget what was read; the next lookup reloads it."""
+        with self._lock:
+            self._changed = {}
+            self._checked_at = 0.0
+
+
+claims_changes = ClaimsChanges()
+
+
+def invalidate_user_claims(user_id):
+    """Make the claims of every token issued to the user so far fall back to the database."""
+    claims_changes.mark(user_id)
+
+
+def claims_user(validated_token):
+    """
+    User built from the claims of ``validated_token`` without a query, None
+    when the token carries no claims, they are older than JWT_CLAIMS_MAX_AGE
+    seconds or the user changed since. Fields missing from the claims are
+    deferred, so reading one loads it and save() only writes the loaded ones.
+    """
+    if api_settings.CHECK_REVOKE_TOKEN:
+        return None
+    try:
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        claims_at = validated_token['claims_at']
+        loaded = {field: validated_token[field] for field in CLAIM_FIELDS}
+        shown_name = validated_token['display_name']
+    except KeyError:
+        return None
+    if time.time() - claims_at > claims_max_age():
+        return None
+    changed_at = claims_changes.changed_at(user_id)
+    if changed_at is not None and claims_at <= changed_at:
+        return None
+
+    # Deactivating a user invalidates its claims, so claims are only ever those of an active user
+    loaded.update({api_settings.USER_ID_FIELD: user_id, 'is_active': True})
+    field_names = [field.attname for field in User._meta.concrete_fields if field.attname in loaded]
+    user = User.from_db(router.db_for_read(User), field_names, [loaded[name] for name in field_names])
+    user.display_name = shown_name
+    return user
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that trusts the claims CustomTokenObtainPairSerializer
+    adds (id, email, name, role, is_staff) instead of loading the user on every
+    request. Saving a user's claim fields or profile name records the change in
+    ClaimsChange and tokens with older claims go through the usual lookup; other
+    workers see it within JWT_CLAIMS_CHECK_INTERVAL seconds. Enable it in REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'] as
+    'accounts.authentication.StatelessJWTAuthentication'.
+    """
+
+    def get_user(self, validated_token):
+        user = claims_user(validated_token)
+        if user is None:
+            return super().get_user(validated_token)
+        return user
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:40
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_existing_keys(apps, schema_editor):
+    ApiKey = apps.get_model('accounts', 'ApiKey')
+    for api_key in ApiKey.objects.all().only('id', 'key'):
+        api_key.key_hash = hashlib.sha256(api_key.key.encode()).hexdigest()
+        api_key.prefix = api_key.key[:8]
+        api_key.save(update_fields=['key_hash', 'prefix'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_add_action_permissions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apikey',
+            name='key_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='apikey',
+            name='prefix',
+            field=models.CharField(blank=True, editable=False, help_text='First characters of the key, to tell keys apart', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='apikey',
+            name='last_used_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='apikey',
+            name='request_count',
+            field=models.BigIntegerField(default=0),
+        ),
+        # Existing keys keep working: only their digest is kept
+        migrations.RunPython(hash_existing_keys, reverse_code=migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='apikey',
+            name='key',
+        ),
+        migrations.AlterField(
+            model_name='apikey',
+            name='key_hash',
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_apikey_key_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apikey',
+            name='burst_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Events allowed at once (default: API_KEY_BURST_LIMIT)', null=True),
+        ),
+        migrations.AddField(
+            model_name='apikey',
+            name='event_count',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='apikey',
+            name='rate_limit',
+            field=models.FloatField(blank=True, help_text='Sustained events per second (default: API_KEY_RATE_LIMIT)', null=True),
+        ),
+        migrations.AddField(
+            model_name='apikey',
+            name='throttled_count',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_sharedversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimsChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField(unique=True)),
+                ('changed_at', models.FloatField(db_index=True)),
+            ],
+        ),
+    ]
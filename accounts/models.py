@@ -2,6 +2,7 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.db import models
 from django.conf import settings
+import hashlib
 import secrets
 
 ROLE_LEVELS = {
@@ -12,8 +13,17 @@ ROLE_LEVELS = {
     "admin": 5,
 }
 
+def hash_api_key(raw_key):
+    return hashlib.sha256(raw_key.encode()).hexdigest()
+
 class ApiKey(models.Model):
-    key = models.CharField(max_length=64, unique=True)
+    """
+    API key of an IoT gateway. Only the SHA-256 digest of the key is stored;
+    the plain key is available as ``key`` on the instance that generated it,
+    to be shown once.
+    """
+    key_hash = models.CharField(max_length=64, unique=True, editable=False)
+    prefix = models.CharField(max_length=12, blank=True, editable=False, help_text="First characters of the key, to tell keys apart")
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='api_keys')
     name = models.CharField(max_length=100, blank=True, help_text="Descriptive name for the API key")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -26,10 +36,29 @@ class ApiKey(models.Model):
     )
     is_active = models.BooleanField(default=True)
     is_viewed = models.BooleanField(default=False, help_text="True if key has been viewed")
+    rate_limit = models.FloatField(null=True, blank=True, help_text="Sustained events per second (default: API_KEY_RATE_LIMIT)")
+    burst_limit = models.PositiveIntegerField(null=True, blank=True, help_text="Events allowed at once (default: API_KEY_BURST_LIMIT)")
+    last_used_at = models.DateTimeField(null=True, blank=True)  # Usage is written in batches, see accounts.api_keys
+    request_count = models.BigIntegerField(default=0)
+    event_count = models.BigIntegerField(default=0)
+    throttled_count = models.BigIntegerField(default=0)
+
+    _raw_key = None
+
+    @property
+    def key(self):
+        """The plain key, only known right after it was set or generated."""
+        return self._raw_key
+
+    @key.setter
+    def key(self, raw_key):
+        self._raw_key = raw_key
+        self.key_hash = hash_api_key(raw_key)
+        self.prefix = raw_key[:8]
 
     def save(self, *args, **kwargs):
-        if not self.key:
-            self.key = secrets.token_urlsafe(32)  # Generates a 64-char secure key
+        if not self.key_hash:
+            self.key = secrets.token_urlsafe(32)  # 43 URL-safe characters
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -113,6 +142,25 @@ class ActionPermission(models.Model):
     def __str__(self):
         return f"Action: {self.action_name} requires {self.min_role}+"
 
+class SharedVersion(models.Model):
+    """
+    Counter every worker process reads to tell whether its in-process copy of
+    some table is current (see accounts.versions). It is moved in the
+    transaction that changes the table, so it becomes visible with the change.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+class ClaimsChange(models.Model):
+    """When a user's token claims last changed (see accounts.authentication); tokens with older claims are not trusted."""
+    user_id = models.BigIntegerField(unique=True)  # Not a foreign key: deleting a user changes its claims too
+    changed_at = models.FloatField(db_index=True)  # Seconds since the epoch, the unit of the 'claims_at' claim
+    def __str__(self):
+        return f"User {self.user_id} claims changed at {self.changed_at}"
+
 PERMISSION_ROLES = {
     'default': 'staff',
     'product_documentation': 'finance_manager',
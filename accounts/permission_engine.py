@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.exceptions import PermissionDenied
+
+from .models import ALL_ACTIONS, ALL_PAGES, ActionPermission, PagePermission, ROLE_LEVELS
+from .versions import bump_version, read_version
+
+logger = logging.getLogger(__name__)
+
+# SharedVersion moved by every permission change, so every worker process sees an admin's edit
+PERMISSIONS_VERSION = 'permissions'
+
+
+def role_level(user):
+    return ROLE_LEVELS.get((getattr(user, 'role', None) or 'staff').lower(), 0)
+
+
+def role_required_level(min_role, default=1):
+    return ROLE_LEVELS.get((min_role or '').lower(), default)
+
+
+def page_entry(user, min_role):
+    """What page_allowed answers for a page requiring ``min_role`` (None when it is not configured)."""
+    if min_role is None:
+        return {"allowed": False, "reason": "page_not_configured"}
+    if ROLE_LEVELS.get(getattr(user, 'role', None), 0) >= ROLE_LEVELS.get(min_role, 0):
+        return {"allowed": True}
+    return {"allowed": False, "reason": f"Requires {min_role} role"}
+
+
+def action_entry(user, min_role):
+    """What action_allowed answers for an action requiring ``min_role`` (None when it is not configured)."""
+    if min_role is None:
+        return {"allowed": False, "reason": "action_not_configured"}
+    return {"allowed": role_level(user) >= role_required_level(min_role, 999)}
+
+
+class PermissionEngine:
+    """
+    In-process snapshot of every PagePermission and ActionPermission
+    (name -> min_role), stamped with the 'permissions' SharedVersion. Saving
+    or deleting a permission bumps the version in the same transaction (see
+    accounts.signals); each process compares its stamp with the stored one at
+    most every PERMISSION_VERSION_CHECK_INTERVAL seconds and reloads the two
+    tables when it moved, so a permission check rarely costs a query.
+    PERMISSION_SNAPSHOT_TTL forces a reload now and then regardless.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.current = (None, {}, {})  # (version, pages, actions), swapped whole
+        self.loaded_at = 0.0
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def check_interval(self):
+        return getattr(settings, 'PERMISSION_VERSION_CHECK_INTERVAL', 1)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'PERMISSION_SNAPSHOT_TTL', 60)
+
+    def refresh(self):
+        now = time.monotonic()
+        if self.version is not None and now - self.checked_at < self.check_interval and now - self.loaded_at < self.ttl:
+            return
+        with self._lock:
+            # Read the stamp before the tables: a change committed meanwhile leaves it stale, never the reverse
+            version = read_version(PERMISSIONS_VERSION)
+            if self.version is None or version != self.version or now - self.loaded_at >= self.ttl:
+                pages = dict(PagePermission.objects.values_list('page_name', 'min_role'))
+                actions = dict(ActionPermission.objects.values_list('action_name', 'min_role'))
+                self.current = (version, pages, actions)
+                self.loaded_at = now
+                self.version = version
+                logger.debug(f"[PermissionEngine] Loaded {len(pages)} pages and {len(actions)} actions, version {version}")
+            self.checked_at = now
+
+    def snapshot(self):
+        """(version, {page_name: min_role}, {action_name: min_role}) of the current snapshot."""
+        self.refresh()
+        return self.current
+
+    def page_role(self, page_name):
+        """min_role of a page, None when it is not configured."""
+        return self.snapshot()[1].get(page_name)
+
+    def action_role(self, action_name):
+        """min_role of an action, None when it is not configured."""
+        return self.snapshot()[2].get(action_name)
+
+    def page_required_level(self, page_name):
+        return role_required_level(self.page_role(page_name))
+
+    def action_required_level(self, action_name):
+        return role_required_level(self.action_role(action_name))
+
+    def check(self, user, page=None, action=None):
+        """Raise PermissionDenied unless ``user`` may open ``page`` and run ``action`` (unconfigured names need level 1)."""
+        if not user.is_authenticated:
+            raise PermissionDenied("User not authenticated")
+        user_level = role_level(user)
+        if page:
+            required = self.page_required_level(page)
+            if user_level < required:
+                logger.warning(f"[check_permission] Denied: page {page} requires level {required}, user has {user_level}")
+                raise PermissionDenied(f"Access denied: {page} requires role level {required}")
+        if action:
+            required = self.action_required_level(action)
+            if user_level < required:
+                logger.warning(f"[check_permission] Denied: action {action} requires level {required}, user has {user_level}")
+                raise PermissionDenied(f"Access denied: {action} requires role level {required}")
+        return True
+
+    def evaluate(self, user):
+        """
+        What page_allowed and action_allowed answer for every configured or
+        known page and action: (version, {page: entry}, {action: entry}).
+        """
+        version, pages, actions = self.snapshot()
+        return (
+            version,
+            {name: page_entry(user, pages.get(name)) for name in sorted(set(pages) | set(ALL_PAGES))},
+            {name: action_entry(user, actions.get(name)) for name in sorted(set(actions) | set(ALL_ACTIONS))},
+        )
+
+    def invalidate(self):
+        """Publish a new version to every process and drop this process's snapshot."""
+        bump_version(PERMISSIONS_VERSION)
+        with self._lock:
+            self.version = None
+
+
+permission_engine = PermissionEngine()
+
+
+def check_permission(user, page=None, action=None):
+    return permission_engine.check(user, page=page, action=action)
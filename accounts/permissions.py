@@ -1,32 +1,30 @@
 # accounts/permissions.py
 from rest_framework.permissions import BasePermission
-from .models import PagePermission, ActionPermission
+from .permission_engine import permission_engine
 from rest_framework import permissions
 from django.conf import settings
-from .models import ApiKey
+from .api_keys import authenticate_api_key
 import logging
 
 logger = logging.getLogger(__name__)
 
 class APIKeyPermission(permissions.BasePermission):
+    """
+    Valid for requests carrying an active API key in ?api_key= (GET) or the
+    X-API-Key header (POST). Keys are checked through the cache of verified
+    digests in accounts.api_keys; the key is available as request.api_key.
+    """
     def has_permission(self, request, view):
-        # Log the request method and parameters for debugging
-        logger.debug(f"[APIKeyPermission] Request method: {request.method}, Query params: {request.query_params}, Headers: {request.headers}")
-        # Check query parameter first (for GET requests)
-        api_key = request.query_params.get('api_key')
-        if not api_key:
-            # Fallback to header (for POST requests)
-            api_key = request.headers.get('X-API-Key')
+        api_key = request.query_params.get('api_key') or request.headers.get('X-API-Key')
         if not api_key:
             logger.warning("[APIKeyPermission] No API key provided in query params or headers")
             return False
-        try:
-            api_key_obj = ApiKey.objects.get(key=api_key, is_active=True)
-            logger.info(f"[APIKeyPermission] Valid API key found for user: {api_key_obj.user.email}, key: {api_key[:8]}...")
-            return True
-        except ApiKey.DoesNotExist:
-            logger.error(f"[APIKeyPermission] Invalid or inactive API key: {api_key[:8]}...")
+        verified = authenticate_api_key(api_key)
+        if verified is None:
+            logger.warning(f"[APIKeyPermission] Invalid or inactive API key: {api_key[:8]}...")
             return False
+        request.api_key = verified
+        return True
 
 
 
@@ -56,7 +54,8 @@ class DynamicPermission(BasePermission):
     Central, DB-backed permission check.
 
     Works with PagePermission (by view.page_permission_name) and
-    ActionPermission (by view.action_permission_name or auto-inferred).
+    ActionPermission (by view.action_permission_name or auto-inferred),
+    read from the cached snapshot of accounts.permission_engine.
 
     If a PagePermission/ActionPermission record is missing in DB, access is denied
     (fail-safe deny).
@@ -95,14 +94,12 @@ class DynamicPermission(BasePermission):
         # ---- Page check ----
         page_name = getattr(view, 'page_permission_name', None)
         if page_name:
-            try:
-                page_perm = PagePermission.objects.get(page_name=page_name)
-                required_level = ROLE_LEVELS[page_perm.min_role]
-                if user_level < required_level:
-                    return False
-            except PagePermission.DoesNotExist:
+            page_role = permission_engine.page_role(page_name)
+            if page_role is None:
                 # No config => deny
                 return False
+            if user_level < ROLE_LEVELS[page_role]:
+                return False
 
         # ---- Action check ----
         action_name = getattr(view, 'action_permission_name', None)
@@ -122,14 +119,12 @@ class DynamicPermission(BasePermission):
 
         # If we have an action to enforce, check it against DB
         if action_name:
-            try:
-                action_perm = ActionPermission.objects.get(action_name=action_name)
-                required_level = ROLE_LEVELS[action_perm.min_role]
-                if user_level < required_level:
-                    return False
-            except ActionPermission.DoesNotExist:
+            action_role = permission_engine.action_role(action_name)
+            if action_role is None:
                 # No config => deny
                 return False
+            if user_level < ROLE_LEVELS[action_role]:
+                return False
 
         # If no action_name applicable, page-level decision already handled.
         return True
\ No newline at end of file
@@ -78,10 +78,18 @@ class ApiKeySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ApiKey
-        fields = ['id', 'name', 'key', 'user', 'created_by_email', 'created_by_full_name', 'created_at', 'is_active', 'is_viewed']
-        read_only_fields = ['id', 'key', 'created_at', 'created_by_email', 'created_by_full_name', 'is_viewed', 'user']
+        fields = [
+            'id', 'name', 'prefix', 'user', 'created_by_email', 'created_by_full_name', 'created_at', 'is_active', 'is_viewed',
+            'last_used_at', 'request_count', 'rate_limit', 'burst_limit', 'event_count', 'throttled_count',
+        ]
+        read_only_fields = [
+            'id', 'prefix', 'created_at', 'created_by_email', 'created_by_full_name', 'is_viewed', 'user',
+            'last_used_at', 'request_count', 'event_count', 'throttled_count',
+        ]
         extra_kwargs = {
             'name': {'required': False, 'allow_blank': True},
+            'rate_limit': {'min_value': 0.001},
+            'burst_limit': {'min_value': 1},
         }
 
     def get_created_by_full_name(self, obj):
@@ -1,7 +1,11 @@
 # accounts/signals.py
-from django.db.models.signals import post_migrate
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
-from .models import PagePermission, ActionPermission, ALL_PAGES, ALL_ACTIONS, PERMISSION_ROLES, PRODUCT_DOCUMENTATION_PAGES, WAREHOUSE_PAGES, WAREHOUSE_ACTIONS, PRODUCT_DOCUMENTATION_ACTIONS
+from .api_keys import verified_keys
+from .authentication import CLAIM_FIELDS, invalidate_user_claims
+from .permission_engine import permission_engine
+from .models import ApiKey, User, UserProfile, PagePermission, ActionPermission, ALL_PAGES, ALL_ACTIONS, PERMISSION_ROLES, PRODUCT_DOCUMENTATION_PAGES, WAREHOUSE_PAGES, WAREHOUSE_ACTIONS, PRODUCT_DOCUMENTATION_ACTIONS
 
 @receiver(post_migrate, sender=None)
 def create_permissions(sender, **kwargs):
@@ -30,4 +34,26 @@ def create_permissions(sender, **kwargs):
             obj, created = ActionPermission.objects.get_or_create(action_name=action, defaults={'min_role': role})
             if not created and obj.min_role != role:
                 obj.min_role = role
-                obj.save()
\ No newline at end of file
+                obj.save()
+
+@receiver([post_save, post_delete], sender=PagePermission)
+@receiver([post_save, post_delete], sender=ActionPermission)
+def invalidate_permission_snapshot(sender, **kwargs):
+    # The version commits with the change, so workers that reload in between keep the old version and reload again
+    permission_engine.invalidate()
+
+@receiver([post_save, post_delete], sender=ApiKey)
+def invalidate_verified_api_key(sender, instance, **kwargs):
+    verified_keys.invalidate(instance.pk)
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_user_claims_on_change(sender, instance, update_fields=None, **kwargs):
+    # Saves that touch no claim (e.g. last_login, the profile location) keep the tokens' claims valid
+    claim_fields = CLAIM_FIELDS + ('is_active',) if sender is User else ('full_name',)
+    if update_fields is not None and not set(update_fields) & set(claim_fields):
+        return
+    user_id = instance.pk if sender is User else instance.user_id
+    invalidate_user_claims(user_id)
+    # Again once committed: tokens issued in between were given the old values
+    transaction.on_commit(lambda: invalidate_user_claims(user_id))
@@ -1,3 +1,80 @@
-from django.test import TestCase
+import time
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .authentication import StatelessJWTAuthentication, add_user_claims, claims_changes
+from .models import ClaimsChange, PagePermission, User
+from .permission_engine import PERMISSIONS_VERSION, PermissionEngine
+from .versions import bump_version
+
+
+@override_settings(JWT_CLAIMS_CHECK_INTERVAL=60)
+class StatelessJWTRefreshTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('jwt@example.com', 'pw', name='Jay', role='staff')
+        self.authentication = StatelessJWTAuthentication()
+        claims_changes.clear()
+        claims_changes.refresh()
+
+    def login_refresh_token(self, age):
+        """Refresh token as issued at login ``age`` seconds ago."""
+        refresh = add_user_claims(RefreshToken.for_user(self.user), self.user)
+        refresh['claims_at'] -= age
+        return refresh
+
+    def refresh(self, refresh):
+        response = APIClient().post(reverse('token-refresh'), {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return AccessToken(response.json()['access'])
+
+    def test_refreshed_token_authenticates_without_query(self):
+        refresh = self.login_refresh_token(age=3600)
+        # The access token copied from the old refresh token is past JWT_CLAIMS_MAX_AGE
+        with self.assertNumQueries(1):
+            self.authentication.get_user(refresh.access_token)
+
+        access = self.refresh(refresh)
+        with self.assertNumQueries(0):
+            user = self.authentication.get_user(access)
+        self.assertEqual((user.pk, user.email, user.role), (self.user.pk, 'jwt@example.com', 'staff'))
+
+    def test_refresh_carries_current_role(self):
+        refresh = self.login_refresh_token(age=10)
+        self.user.role = 'admin'
+        self.user.save()
+        access = self.refresh(refresh)
+        self.assertEqual(access['role'], 'admin')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authentication.get_user(access).role, 'admin')
+
+    def test_refresh_rejects_inactive_user(self):
+        refresh = self.login_refresh_token(age=10)
+        self.user.is_active = False
+        self.user.save()
+        response = APIClient().post(reverse('token-refresh'), {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_claims_changed_by_another_process_fall_back_to_database(self):
+        access = self.refresh(self.login_refresh_token(age=10))
+        # What another worker's save of the user leaves behind
+        ClaimsChange.objects.filter(user_id=self.user.pk).update(changed_at=time.time())
+        claims_changes.clear()
+        with self.assertNumQueries(2):  # The recent changes, then the user
+            self.authentication.get_user(access)
+
+
+@override_settings(PERMISSION_VERSION_CHECK_INTERVAL=0)
+class PermissionVersionTests(TestCase):
+    def test_version_bumped_by_another_process_reloads_snapshot(self):
+        PagePermission.objects.update_or_create(page_name='trackers', defaults={'min_role': 'staff'})
+        engine = PermissionEngine()
+        self.assertEqual(engine.page_role('trackers'), 'staff')
+
+        # What another worker's edit leaves in the database: the row and the version, no signal here
+        PagePermission.objects.filter(page_name='trackers').update(min_role='admin')
+        self.assertEqual(engine.page_role('trackers'), 'staff')
+        bump_version(PERMISSIONS_VERSION)
+        self.assertEqual(engine.page_role('trackers'), 'admin')
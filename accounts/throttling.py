@@ -0,0 +1,205 @@
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import BaseThrottle
+
+from .api_keys import key_usage
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY_PREFIX = 'accounts:api_key_bucket:'
+
+# Refill, then take ``cost`` tokens if there are enough; atomic inside Redis
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(state[1]) or burst
+local at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - at) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+def key_limits(api_key):
+    """(sustained events per second, burst) of a VerifiedApiKey."""
+    rate = api_key.rate_limit or getattr(settings, 'API_KEY_RATE_LIMIT', 50)
+    burst = api_key.burst_limit or getattr(settings, 'API_KEY_BURST_LIMIT', 1000)
+    return max(float(rate), 0.001), max(int(burst), 1)
+
+
+class LocalTokenBuckets:
+    """In-process token buckets, for single-process setups and when Redis is unavailable."""
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, at)
+        self._lock = threading.Lock()
+
+    def _refill(self, key, rate, burst, now):
+        tokens, at = self._buckets.get(key, (burst, now))
+        return min(burst, tokens + max(0.0, now - at) * rate)
+
+    def take(self, key, rate, burst, cost):
+        """(allowed, tokens left) after trying to take ``cost`` tokens."""
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._refill(key, rate, burst, now)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+        return allowed, tokens
+
+    def peek(self, key, rate, burst):
+        with self._lock:
+            return self._refill(key, rate, burst, time.monotonic())
+
+
+class RedisTokenBuckets:
+    """Token buckets shared by every worker, kept in the Redis server of the channel layer."""
+
+    def __init__(self, client):
+        self.client = client
+        self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key, rate, burst, cost):
+        allowed, tokens = self.script(keys=[key], args=[rate, burst, cost])
+        return bool(allowed), float(tokens)
+
+    def peek(self, key, rate, burst):
+        tokens, at = self.client.hmget(key, 'tokens', 'at')
+        if tokens is None:
+            return float(burst)
+        seconds, microseconds = self.client.time()
+        return min(burst, float(tokens) + max(0.0, seconds + microseconds / 1_000_000 - float(at)) * rate)
+
+
+def redis_client():
+    """A client for the first Redis host of CHANNEL_LAYERS['default'], None without a Redis channel layer."""
+    layer = getattr(settings, 'CHANNEL_LAYERS', {}).get('default', {})
+    if 'redis' not in layer.get('BACKEND', '').lower():
+        return None
+    hosts = layer.get('CONFIG', {}).get('hosts') or [('localhost', 6379)]
+    host = hosts[0]
+    try:
+        import redis
+    except ImportError:
+        logger.warning("[ApiKeyRateThrottle] redis is not installed, rate limits are per process")
+        return None
+    if isinstance(host, str):
+        return redis.Redis.from_url(host)
+    if isinstance(host, dict):
+        options = {name: value for name, value in host.items() if name != 'address'}
+        return redis.Redis.from_url(host['address'], **options) if 'address' in host else redis.Redis(**options)
+    return redis.Redis(host=host[0], port=host[1])
+
+
+class TokenBuckets:
+    """Redis buckets when the channel layer runs on Redis, in-process ones otherwise or while Redis is down."""
+
+    def __init__(self):
+        self.local = LocalTokenBuckets()
+        self._shared = None
+        self._resolved = False
+        self._retry_at = 0.0  # While Redis is down, skip it until then instead of failing every request
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        if not self._resolved:
+            with self._lock:
+                if not self._resolved:
+                    client = redis_client()
+                    self._shared = RedisTokenBuckets(client) if client is not None else None
+                    self._resolved = True
+        return self._shared
+
+    def _call(self, method, *args):
+        if self.shared is not None and time.monotonic() >= self._retry_at:
+            try:
+                return getattr(self.shared, method)(*args)
+            except Exception as e:
+                self._retry_at = time.monotonic() + getattr(settings, 'API_KEY_RATE_LIMIT_RETRY_INTERVAL', 5)
+                logger.error(f"[ApiKeyRateThrottle] Redis unavailable, using local buckets: {str(e)}")
+        return getattr(self.local, method)(*args)
+
+    def take(self, api_key, cost):
+        rate, burst = key_limits(api_key)
+        return self._call('take', f"{BUCKET_KEY_PREFIX}{api_key.id}", rate, burst, cost)
+
+    def tokens(self, api_key):
+        rate, burst = key_limits(api_key)
+        return self._call('peek', f"{BUCKET_KEY_PREFIX}{api_key.id}", rate, burst)
+
+
+token_buckets = TokenBuckets()
+
+
+class BatchExceedsBurst(APIException):
+    """A batch costs more tokens than the key's bucket holds, so no wait would let it through."""
+    status_code = 413
+    default_detail = 'Batch exceeds the burst limit of this API key.'
+    default_code = 'batch_exceeds_burst'
+
+
+def request_cost(request):
+    """Events carried by an IoT request: one, or the length of a batch."""
+    if request.method != 'POST':
+        return 1
+    data = request.data
+    return max(len(data), 1) if isinstance(data, list) else 1
+
+
+def charge_events(api_key, cost):
+    """
+    Take ``cost`` tokens from the bucket of a VerifiedApiKey and count the
+    events, or the throttled request. Returns None when the events may go
+    through, else the seconds to wait; raises BatchExceedsBurst for batches
+    larger than the burst.
+    """
+    rate, burst = key_limits(api_key)
+    if cost > burst:
+        key_usage.record(api_key.id, throttled=1)
+        logger.warning(f"[ApiKeyRateThrottle] Rejected batch of API key {api_key.prefix}...: {cost} events, burst is {burst}")
+        raise BatchExceedsBurst(f"Batch of {cost} events exceeds the burst limit of {burst} events for this API key")
+    allowed, tokens = token_buckets.take(api_key, cost)
+    if allowed:
+        key_usage.record(api_key.id, events=cost)
+        return None
+    key_usage.record(api_key.id, throttled=1)
+    logger.warning(f"[ApiKeyRateThrottle] Throttled API key {api_key.prefix}...: {cost} events, {tokens:.0f} tokens left")
+    return math.ceil((cost - tokens) / rate)
+
+
+class ApiKeyRateThrottle(BaseThrottle):
+    """
+    Token bucket per API key (after APIKeyPermission set request.api_key): a
+    bucket holds up to ``burst`` events and refills at ``rate`` events per
+    second, both per key or from API_KEY_BURST_LIMIT / API_KEY_RATE_LIMIT. A
+    batch costs one token per event. Rejected requests get a 429 before any
+    transaction is opened, and batches larger than the burst a 413.
+    """
+
+    def allow_request(self, request, view):
+        api_key = getattr(request, 'api_key', None)
+        if api_key is None:
+            return True
+        self.retry_after = charge_events(api_key, request_cost(request))
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
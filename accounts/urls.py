@@ -1,10 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    MeView, CustomTokenObtainPairView, RegisterView, UserView,
+    MeView, CustomTokenObtainPairView, CustomTokenRefreshView, RegisterView, UserView,
     ChangePasswordView, UserListView, AdminCreateUserView,
     AdminDeleteUserView, UserProfileView, ProfilePictureUploadView, LogoutView,
-    PagePermissionViewSet, ActionPermissionViewSet, page_allowed, action_allowed,
+    PagePermissionViewSet, ActionPermissionViewSet, page_allowed, action_allowed, permissions_bootstrap,
     ForgotPasswordView, ResetPasswordView, UpdateLocationView, ApiKeyViewSet
 )
 
@@ -16,6 +16,7 @@ router.register(r'api-keys', ApiKeyViewSet, basename='api-key')
 urlpatterns = [
     path('me/', MeView.as_view(), name='me'),
     path('login/', CustomTokenObtainPairView.as_view(), name='login'),
+    path('token/refresh/', CustomTokenRefreshView.as_view(), name='token-refresh'),
     path('register/', RegisterView.as_view(), name='register'),
     path('user/', UserView.as_view(), name='user'),
     path('change-password/', ChangePasswordView.as_view(), name='change-password'),
@@ -28,6 +29,7 @@ urlpatterns = [
     path('forgot-password/', ForgotPasswordView.as_view(), name='forgot-password'),
     path('reset-password/', ResetPasswordView.as_view(), name='reset-password'),
     path('update_location/', UpdateLocationView.as_view(), name='update_location'),  # Updated path
+    path('permissions/', permissions_bootstrap, name='permissions-bootstrap'),
     path('permissions/page/<str:page_name>/', page_allowed, name='page-allowed'),
     path('permissions/action/<str:action_name>/', action_allowed, name='action-allowed'),
     path('', include(router.urls)),
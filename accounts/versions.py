@@ -0,0 +1,24 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import SharedVersion
+
+
+def read_version(name):
+    """Current value of a shared version (0 until it is first bumped)."""
+    return SharedVersion.objects.filter(name=name).values_list('value', flat=True).first() or 0
+
+
+def bump_version(name):
+    """
+    Move a shared version with one F() UPDATE. Inside a transaction the row
+    stays locked until it commits, and other processes see the new value
+    together with the change that caused it.
+    """
+    if SharedVersion.objects.filter(name=name).update(value=F('value') + 1):
+        return
+    try:
+        with transaction.atomic():
+            SharedVersion.objects.create(name=name, value=1)
+    except IntegrityError:
+        SharedVersion.objects.filter(name=name).update(value=F('value') + 1)  # Created concurrently
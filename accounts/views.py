@@ -4,7 +4,7 @@ import string
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework import generics, status, permissions, serializers, viewsets
 from rest_framework.generics import CreateAPIView, DestroyAPIView
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -18,10 +18,14 @@ from .serializers import (
     ProfilePictureUploadSerializer, ForgotPasswordSerializer,
     ResetPasswordSerializer, PagePermissionSerializer, ActionPermissionSerializer, ApiKeySerializer
 )
-from .token_serializers import CustomTokenObtainPairSerializer
+from .token_serializers import CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer
+from .authentication import display_name
 from .permissions import HasMinimumRole, APIKeyPermission
+from .permission_engine import action_entry, check_permission, page_entry, permission_engine
+from .api_keys import USAGE_COUNTERS, VerifiedApiKey, key_usage
+from .throttling import key_limits, token_buckets
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.utils.http import parse_etags, urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.conf import settings
 from django.utils import timezone
@@ -66,38 +70,6 @@ ROLE_LEVELS = {
     "admin": 5,
 }
 
-def get_user_role_level(user):
-    return ROLE_LEVELS.get(getattr(user, 'role', 'staff').lower(), 0)
-
-def get_page_required_level(page):
-    perm = PagePermission.objects.filter(page_name=page).first()
-    return ROLE_LEVELS.get(perm.min_role.lower(), 1) if perm else 1
-
-def get_action_required_level(action_name: str) -> int:
-    try:
-        perm = ActionPermission.objects.get(action_name=action_name)
-        return ROLE_LEVELS.get(perm.min_role.lower(), 1)
-    except ActionPermission.DoesNotExist:
-        return 1
-
-def check_permission(user, page=None, action=None):
-    logger.info(f"[check_permission] Checking for user: {user}, role: {getattr(user, 'role', 'None')}, page: {page}, action: {action}")
-    user_level = get_user_role_level(user)
-    if not user.is_authenticated:
-        logger.warning("[check_permission] User not authenticated")
-        raise permissions.PermissionDenied("User not authenticated")
-    if page:
-        required = get_page_required_level(page)
-        if user_level < required:
-            logger.warning(f"[check_permission] Denied: page {page} requires level {required}, user has {user_level}")
-            raise permissions.PermissionDenied(f"Access denied: {page} requires role level {required}")
-    if action:
-        required = get_action_required_level(action)
-        if user_level < required:
-            logger.warning(f"[check_permission] Denied: action {action} requires level {required}, user has {user_level}")
-            raise permissions.PermissionDenied(f"Access denied: {action} requires role level {required}")
-    return True
-
 class SomeProtectedView(APIView):
     permission_classes = [IsAuthenticated, HasMinimumRole]
     required_role_level = 2
@@ -108,12 +80,15 @@ class MeView(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
         user = request.user
-        profile, _ = UserProfile.objects.get_or_create(user=user)
+        name = getattr(user, 'display_name', None)  # Set by StatelessJWTAuthentication from the token claims
+        if name is None:
+            profile, _ = UserProfile.objects.get_or_create(user=user)
+            name = display_name(user, profile.full_name)
         return Response({
             "id": user.id,
             "email": user.email,
             "role": user.role,
-            "name": profile.full_name or user.name or user.email.split('@')[0]
+            "name": name
         })
 
 class CustomTokenObtainPairView(TokenObtainPairView):
@@ -123,6 +98,13 @@ class CustomTokenObtainPairView(TokenObtainPairView):
         view = super().as_view(**initkwargs)
         return csrf_exempt(view)
 
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        return csrf_exempt(view)
+
 class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = ProfileSerializer
@@ -268,30 +250,31 @@ class ActionPermissionViewSet(viewsets.ModelViewSet):
         self.perform_create(serializer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def permissions_bootstrap(request):
+    """
+    Allowed/denied map of every page and action for the current user, in one
+    response. The ETag combines the permission version and the user's role,
+    so a client sending it back in If-None-Match gets a 304 until either changes.
+    """
+    version, pages, actions = permission_engine.evaluate(request.user)
+    role = getattr(request.user, 'role', None) or 'staff'  # Page entries compare the role as stored
+    etag = f'"{version}-{role}"'
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response({"version": version, "role": role, "pages": pages, "actions": actions}, headers=headers)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def page_allowed(request, page_name):
-    try:
-        permission = PagePermission.objects.get(page_name=page_name)
-        user_role = request.user.role
-        if ROLE_LEVELS.get(user_role, 0) >= ROLE_LEVELS.get(permission.min_role, 0):
-            return Response({"allowed": True})
-        else:
-            return Response({"allowed": False, "reason": f"Requires {permission.min_role} role"})
-    except PagePermission.DoesNotExist:
-        return Response({"allowed": False, "reason": "page_not_configured"})
+    return Response(page_entry(request.user, permission_engine.page_role(page_name)))
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def action_allowed(request, action_name: str):
-    try:
-        action_perm = ActionPermission.objects.get(action_name=action_name)
-    except ActionPermission.DoesNotExist:
-        return Response({"allowed": False, "reason": "action_not_configured"})
-    user_role = getattr(request.user, "role", "staff")
-    user_level = ROLE_LEVELS.get(user_role.lower(), 0)
-    required_level = ROLE_LEVELS.get(action_perm.min_role.lower(), 999)
-    return Response({"allowed": user_level >= required_level})
+    return Response(action_entry(request.user, permission_engine.action_role(action_name)))
 
 class ForgotPasswordView(APIView):
     permission_classes = [AllowAny]
@@ -399,26 +382,30 @@ class ApiKeyViewSet(viewsets.ModelViewSet):
         logger.debug(f"[ApiKeyViewSet] Fetching API keys for user: {self.request.user.email}")
         return ApiKey.objects.filter(user=self.request.user)
 
-    def create(self, request, *args, **kwargs):
-        logger.debug(f"[ApiKeyViewSet] User {request.user.email} attempting to generate API key. Role: {request.user.role}")
-        # Check permission
-        try:
-            action_perm = ActionPermission.objects.get(action_name='generate_api_key')
-            user_level = ROLE_LEVELS.get(request.user.role.lower(), 0)
-            required_level = ROLE_LEVELS.get(action_perm.min_role.lower(), 1)
-            logger.debug(f"[ApiKeyViewSet] User level: {user_level}, Required level: {required_level}")
-            if user_level < required_level:
-                logger.warning(f"[ApiKeyViewSet] Permission denied for user {request.user.email}: requires {action_perm.min_role}")
-                return Response(
-                    {"error": f"Permission denied: requires {action_perm.min_role} role"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-        except ActionPermission.DoesNotExist:
-            logger.error(f"[ApiKeyViewSet] ActionPermission for 'generate_api_key' not found")
+    def denied_response(self, request, action_name):
+        """403/500 response when the user may not run ``action_name``, None when allowed."""
+        min_role = permission_engine.action_role(action_name)
+        if min_role is None:
+            logger.error(f"[ApiKeyViewSet] ActionPermission for '{action_name}' not found")
             return Response(
-                {"error": "Action permission not configured for generate_api_key"},
+                {"error": f"Action permission not configured for {action_name}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        user_level = ROLE_LEVELS.get(request.user.role.lower(), 0)
+        required_level = ROLE_LEVELS.get(min_role.lower(), 1)
+        if user_level < required_level:
+            logger.warning(f"[ApiKeyViewSet] Permission denied for user {request.user.email}: requires {min_role}")
+            return Response(
+                {"error": f"Permission denied: requires {min_role} role"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return None
+
+    def create(self, request, *args, **kwargs):
+        logger.debug(f"[ApiKeyViewSet] User {request.user.email} attempting to generate API key. Role: {request.user.role}")
+        denied = self.denied_response(request, 'generate_api_key')
+        if denied is not None:
+            return denied
 
         # Validate serializer
         serializer = self.get_serializer(data=request.data)
@@ -453,40 +440,36 @@ class ApiKeyViewSet(viewsets.ModelViewSet):
 
     def destroy(self, request, *args, **kwargs):
         logger.debug(f"[ApiKeyViewSet] User {request.user.email} attempting to delete API key")
-        try:
-            action_perm = ActionPermission.objects.get(action_name='delete_api_key')
-            user_level = ROLE_LEVELS.get(request.user.role.lower(), 0)
-            required_level = ROLE_LEVELS.get(action_perm.min_role.lower(), 1)
-            if user_level < required_level:
-                logger.warning(f"[ApiKeyViewSet] Permission denied for user {request.user.email}: requires {action_perm.min_role}")
-                return Response(
-                    {"error": f"Permission denied: requires {action_perm.min_role} role"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-        except ActionPermission.DoesNotExist:
-            logger.error(f"[ApiKeyViewSet] ActionPermission for 'delete_api_key' not found")
-            return Response(
-                {"error": "Action permission not configured for delete_api_key"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        denied = self.denied_response(request, 'delete_api_key')
+        if denied is not None:
+            return denied
         return super().destroy(request, *args, **kwargs)
 
     def retrieve(self, request, *args, **kwargs):
         logger.debug(f"[ApiKeyViewSet] User {request.user.email} attempting to view API key")
-        try:
-            action_perm = ActionPermission.objects.get(action_name='view_api_key')
-            user_level = ROLE_LEVELS.get(request.user.role.lower(), 0)
-            required_level = ROLE_LEVELS.get(action_perm.min_role.lower(), 1)
-            if user_level < required_level:
-                logger.warning(f"[ApiKeyViewSet] Permission denied for user {request.user.email}: requires {action_perm.min_role}")
-                return Response(
-                    {"error": f"Permission denied: requires {action_perm.min_role} role"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-        except ActionPermission.DoesNotExist:
-            logger.error(f"[ApiKeyViewSet] ActionPermission for 'view_api_key' not found")
-            return Response(
-                {"error": "Action permission not configured for view_api_key"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-        return super().retrieve(request, *args, **kwargs)
\ No newline at end of file
+        denied = self.denied_response(request, 'view_api_key')
+        if denied is not None:
+            return denied
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=True, methods=['get'])
+    def usage(self, request, pk=None):
+        """Counters of a key (including counts this worker has not written yet) and its effective limits."""
+        denied = self.denied_response(request, 'view_api_key')
+        if denied is not None:
+            return denied
+        api_key = self.get_object()
+        pending = key_usage.pending(api_key.pk)
+        verified = VerifiedApiKey(
+            api_key.pk, api_key.user_id, api_key.user.email, api_key.prefix, api_key.rate_limit, api_key.burst_limit,
+        )
+        rate, burst = key_limits(verified)
+        return Response({
+            "id": api_key.id,
+            "prefix": api_key.prefix,
+            "last_used_at": api_key.last_used_at,
+            **{counter: getattr(api_key, counter) + pending[counter] for counter in USAGE_COUNTERS},
+            "rate_limit": rate,
+            "burst_limit": burst,
+            "tokens": round(token_buckets.tokens(verified), 3),
+        })
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity_log', '0002_remove_activitylog_action_name_activitylog_app_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['timestamp', 'id'], name='activity_lo_timesta_4f8708_idx'),
+        ),
+    ]
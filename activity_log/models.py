@@ -12,5 +12,10 @@ class ActivityLog(models.Model):
     description = models.TextField(blank=True, null=True)  # optional details
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'id']),  # Keyset pagination seeks on this
+        ]
+
     def __str__(self):
         return f"{self.user} | {self.app}.{self.table} | {self.action}"
\ No newline at end of file
@@ -1,4 +1,5 @@
 from rest_framework import viewsets, permissions
+from core.pagination import StandardResultsSetPagination
 from .models import ActivityLog
 from .serializers import ActivityLogSerializer
 
@@ -6,3 +7,5 @@ class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = ActivityLog.objects.all().order_by("-timestamp")
     serializer_class = ActivityLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+    pagination_mode = None  # Whole list unless asked; ?pagination=cursor seeks on (timestamp, id)
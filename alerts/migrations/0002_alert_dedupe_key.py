@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='dedupe_key',
+            field=models.CharField(blank=True, max_length=150, null=True, unique=True),
+        ),
+    ]
@@ -15,6 +15,7 @@ class Alert(models.Model):
     type = models.CharField(max_length=50, choices=ALERT_TYPES)
     message = models.TextField()
     time = models.DateTimeField(auto_now_add=True)
+    dedupe_key = models.CharField(max_length=150, unique=True, null=True, blank=True)  # Set by automated sweeps
 
     def __str__(self):
         return f"{self.type} - {self.message[:30]}"
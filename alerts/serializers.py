@@ -5,4 +5,4 @@ class AlertSerializer(serializers.ModelSerializer):
     class Meta:
         model = Alert
         fields = '__all__'
-        read_only_fields = ['user', 'time']
+        read_only_fields = ['user', 'time', 'dedupe_key']
@@ -16,5 +16,10 @@ class AuditLog(models.Model):
     description = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'id']),  # Keyset pagination seeks on this
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.action} at {self.timestamp}"
@@ -1,5 +1,6 @@
 from django.shortcuts import render
 from rest_framework import generics, permissions
+from core.pagination import StandardResultsSetPagination
 from .models import AuditLog
 from .serializers import AuditLogSerializer
 
@@ -7,3 +8,5 @@ class AuditLogListView(generics.ListAPIView):
     queryset = AuditLog.objects.all().order_by('-timestamp')
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+    pagination_mode = None  # Whole list unless asked; ?pagination=cursor seeks on (timestamp, id)
@@ -0,0 +1,204 @@
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination, _reverse_ordering
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on the full ordering of the queryset (e.g.
+    (-created_at, -id)) instead of OFFSET, so every page costs the same index
+    range scan however deep it is. The primary key is appended as a tie-breaker,
+    which makes positions unique. Foreign keys seek on their id, and NULLs of
+    a nullable field sort after every value. The total count is only
+    computed when asked for with ?count=true.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-id',)
+    count_query_param = 'count'
+
+    def get_ordering(self, request, queryset, view):
+        model = queryset.model
+        ordering = tuple(queryset.query.order_by or model._meta.ordering or self.ordering)
+        if any(not isinstance(order, str) or '__' in order or order == '?' for order in ordering):
+            ordering = self.ordering  # Only plain model fields can be read back into a cursor
+        try:
+            columns = [self.column(model, order) for order in ordering]
+        except (FieldDoesNotExist, ValueError):
+            columns = [self.column(model, order) for order in self.ordering]
+        self.fields = {field.attname: field for _, field in columns}
+        ordering = tuple(order for order, _ in columns)
+        pk = model._meta.pk
+        if pk.attname not in self.fields:
+            ordering += (('-' if ordering[-1].startswith('-') else '') + pk.attname,)
+            self.fields[pk.attname] = pk
+        return ordering
+
+    def column(self, model, order):
+        """(order on the field's column, field); foreign keys seek on their id."""
+        name = order.lstrip('-')
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        if not field.concrete or field.many_to_many:
+            raise ValueError(f"Cannot seek on {name}")
+        if field.is_relation and field.related_model._meta.ordering:
+            raise ValueError(f"{name} orders by the fields of {field.related_model.__name__}")
+        return ('-' if order.startswith('-') else '') + field.attname, field
+
+    def order_by(self, reverse):
+        """Ordering of a page; NULLs come after every value going forward, so before them going back."""
+        expressions = []
+        for order in (_reverse_ordering(self.ordering) if reverse else self.ordering):
+            name = order.lstrip('-')
+            if not self.fields[name].null:
+                expressions.append(order)
+                continue
+            expression = F(name).desc if order.startswith('-') else F(name).asc
+            expressions.append(expression(nulls_first=True) if reverse else expression(nulls_last=True))
+        return expressions
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            name = order.lstrip('-')
+            if isinstance(instance, dict):
+                value = instance[name] if name in instance else instance[self.fields[name].name]
+            else:
+                value = getattr(instance, name)
+            # Strings, numbers and NULL as JSON; anything else as text its field parses back
+            values.append(value if value is None or isinstance(value, (bool, int, float, str)) else str(value))
+        return json.dumps(values)
+
+    def seek(self, queryset, position, reverse):
+        """Rows strictly after ``position`` in the (optionally reversed) ordering."""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        equal = Q()
+        for order, value in zip(self.ordering, values):
+            name = order.lstrip('-')
+            field = self.fields[name]
+            if value is None:
+                if not field.null:
+                    raise NotFound(self.invalid_cursor_message)
+                # NULLs come last going forward: only values follow them going back
+                after = Q(**{f"{name}__isnull": False}) if reverse else None
+                same = Q(**{f"{name}__isnull": True})
+            else:
+                try:
+                    value = field.to_python(value)
+                except ValidationError:
+                    raise NotFound(self.invalid_cursor_message)
+                descending = order.startswith('-') != reverse
+                after = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+                if field.null and not reverse:
+                    after |= Q(**{f"{name}__isnull": True})
+                same = Q(**{name: value})
+            if after is not None:
+                condition |= equal & after
+            equal &= same
+        return queryset.filter(condition)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.count = queryset.count() if self.wants_count(request) else None
+
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        current_position = self.cursor.position if self.cursor else None
+
+        queryset = queryset.order_by(*self.order_by(reverse))
+        if current_position is not None:
+            queryset = self.seek(queryset, current_position, reverse)
+
+        # Positions are unique, so no offset is ever needed; one extra row tells whether more follow
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = current_position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, current_position is not None
+        # Links seek from the edges of this page; an empty page falls back to where it started
+        self.next_position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else current_position
+        self.previous_position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """
+    Page-number pagination shared by every app, with a keyset (cursor) mode for
+    deep or append-only lists. Cursor mode is selected per endpoint with
+    ``pagination_mode = 'cursor'`` on the view, or per request with
+    ?pagination=cursor (following a ?cursor= link keeps it). Endpoints that
+    have always returned their whole list set ``pagination_mode = None``: they
+    stay unpaginated unless a client sends ?pagination= or ?page=.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    mode_query_param = 'pagination'
+    cursor_class = KeysetPagination
+
+    def get_mode(self, request, view=None):
+        mode = request.query_params.get(self.mode_query_param)
+        if mode in ('page', 'cursor'):
+            return mode
+        if self.cursor_class.cursor_query_param in request.query_params:
+            return 'cursor'
+        if self.page_query_param in request.query_params:
+            return 'page'
+        return getattr(view, 'pagination_mode', 'page')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        mode = self.get_mode(request, view)
+        if mode is None:
+            return None
+        if mode == 'cursor':
+            self.cursor_paginator = self.cursor_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
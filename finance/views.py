@@ -8,12 +8,7 @@ from django.db.models import Q
 from .models import FinanceCategory, FinanceTransaction
 from .serializers import FinanceCategorySerializer, FinanceTransactionSerializer
 from accounts.permissions import DynamicPermission
-from rest_framework.pagination import PageNumberPagination
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+from core.pagination import StandardResultsSetPagination
 
 class FinanceCategoryViewSet(ModelViewSet):
     queryset = FinanceCategory.objects.all()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import StorageBin, ExpiryTrackedItem, Item, StockRecord, LocationEvent
+from .models import StorageBin, ExpiryTrackedItem, Item, StockRecord, LocationEvent, PendingIoTEvent, CustomFieldKey
 
 @admin.register(StorageBin)
 class StorageBinAdmin(admin.ModelAdmin):
@@ -31,4 +31,20 @@ class LocationEventAdmin(admin.ModelAdmin):
     list_display = ('storage_bin', 'item', 'event', 'quantity', 'timestamp', 'processed', 'created_at')
     list_filter = ('event', 'processed')
     search_fields = ('storage_bin__bin_id', 'item__name')
-    date_hierarchy = 'timestamp'
\ No newline at end of file
+    date_hierarchy = 'timestamp'
+
+@admin.register(PendingIoTEvent)
+class PendingIoTEventAdmin(admin.ModelAdmin):
+    list_display = ('storage_bin', 'item', 'event', 'quantity', 'timestamp', 'received_at')
+    list_filter = ('event',)
+    search_fields = ('storage_bin__bin_id', 'item__name')
+
+@admin.register(CustomFieldKey)
+class CustomFieldKeyAdmin(admin.ModelAdmin):
+    list_display = ('key', 'value_type', 'label', 'created_at')
+    list_filter = ('value_type',)
+    search_fields = ('key', 'label')
+
+    def get_readonly_fields(self, request, obj=None):
+        # The index of a declared key is built for its name and type
+        return ('key', 'value_type') if obj else ()
@@ -0,0 +1,198 @@
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import LocationEvent, StockLedgerEntry
+
+# Columns of an archived event; 'applied' and 'ledger_entries' keep what the ledger link carried
+ARCHIVE_COLUMNS = (
+    'id', 'storage_bin_id', 'bin_id', 'item_id', 'item_name', 'event', 'quantity', 'applied',
+    'timestamp', 'created_at', 'raw_location', 'client_event_id', 'ledger_entries',
+)
+
+
+def archive_root():
+    default = os.path.join(str(getattr(settings, 'BASE_DIR', '.')), 'archive', 'location_events')
+    return getattr(settings, 'LOCATION_EVENT_ARCHIVE_DIR', default)
+
+
+def retention_days():
+    return getattr(settings, 'LOCATION_EVENT_RETENTION_DAYS', 180)
+
+
+def archive_dir(day, root=None):
+    """Directory of one local day's archive files, e.g. <root>/2025/09/30"""
+    return os.path.join(root or archive_root(), f"{day:%Y}", f"{day:%m}", f"{day:%d}")
+
+
+def archive_files(day, root=None):
+    directory = archive_dir(day, root)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith('.ndjson.gz')
+    )
+
+
+def _write_file(path, lines):
+    """Write a gzipped NDJSON file through a temporary name, so readers never see it half written."""
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+            for line in lines:
+                archive.write((json.dumps(line, cls=DjangoJSONEncoder) + '\n').encode())
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(temporary, path)
+
+
+def retention_cutoff(days=None, now=None):
+    """Local midnight ``days`` days ago; only whole days are archived."""
+    days = retention_days() if days is None else days
+    local = timezone.localtime(now or timezone.now()) - timedelta(days=days)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _archive_batch(ids, root):
+    """Write the events to one new file per local day; returns {day: rows}."""
+    rows = (
+        LocationEvent.objects.filter(id__in=ids)
+        .values(
+            'id', 'storage_bin_id', 'item_id', 'event', 'quantity', 'timestamp', 'created_at',
+            'raw_location', 'client_event_id', bin_id=F('storage_bin__bin_id'), item_name=F('item__name'),
+        )
+        .order_by('id')
+    )
+    ledger = {}
+    for event_id, entry_id, delta in StockLedgerEntry.objects.filter(location_event_id__in=ids).values_list(
+        'location_event_id', 'id', 'delta'
+    ):
+        ledger.setdefault(event_id, []).append((entry_id, delta))
+
+    days = {}
+    for row in rows:
+        entries = ledger.get(row['id'], [])
+        row['applied'] = sum(abs(delta) for _, delta in entries)
+        row['ledger_entries'] = [entry_id for entry_id, _ in entries]
+        days.setdefault(timezone.localdate(row['timestamp']), []).append(row)
+
+    for day, day_rows in days.items():
+        directory = archive_dir(day, root)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"events-{day_rows[0]['id']}-{day_rows[-1]['id']}.ndjson.gz")
+        _write_file(path, ({column: row[column] for column in ARCHIVE_COLUMNS} for row in day_rows))
+    return days
+
+
+def archive_events(before=None, batch_size=1000, root=None):
+    """
+    Move processed events stamped before ``before`` (default: the retention
+    cutoff) into the archive, one batch of ids per transaction: the batch is
+    written and fsynced before its rows are deleted, so a crash can leave an
+    event both archived and stored (read_archived_events skips it, and the next
+    run archives it again) but never lost.
+    Each batch adds one file per day it covers; compact_day() merges them.
+    Yields the set of days and the number of events of each batch.
+    """
+    before = before or retention_cutoff()
+    root = root or archive_root()
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                LocationEvent.objects.filter(id__gt=last_id, processed=True, timestamp__lt=before)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return
+            days = _archive_batch(ids, root)
+            LocationEvent.objects.filter(id__in=ids).delete()
+        last_id = ids[-1]
+        yield set(days), len(ids)
+
+
+def _archived_rows(paths, seen=None):
+    """Rows of the given archive files, skipping events repeated across files (or already in ``seen``)."""
+    seen = set() if seen is None else seen
+    for path in paths:
+        with gzip.open(path, 'rt') as archive:
+            for line in archive:
+                row = json.loads(line)
+                if row['id'] not in seen:
+                    seen.add(row['id'])
+                    yield row
+
+
+def _id_range(path):
+    """(first id, last id) from an 'events-<first>-<last>.ndjson.gz' file name."""
+    first, last = os.path.basename(path)[len('events-'):-len('.ndjson.gz')].split('-')
+    return int(first), int(last)
+
+
+def compact_day(day, root=None):
+    """Merge the files of one archived day into one, streaming them. Returns the number of files merged."""
+    paths = archive_files(day, root)
+    if len(paths) <= 1:
+        return 0
+    ranges = [_id_range(path) for path in paths]
+    path = os.path.join(
+        archive_dir(day, root),
+        f"events-{min(first for first, _ in ranges)}-{max(last for _, last in ranges)}.ndjson.gz",
+    )
+    _write_file(path, _archived_rows(paths))
+    for old in paths:
+        if old != path:
+            os.remove(old)
+    return len(paths)
+
+
+def _days(start, end):
+    day = timezone.localdate(start)
+    last = timezone.localdate(end - timedelta(microseconds=1))
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+def _without_stored(rows):
+    """Drop the rows of events still stored, whose stored copy is the one counted."""
+    stored = set(LocationEvent.objects.filter(id__in=[row['id'] for row in rows]).values_list('id', flat=True))
+    return [row for row in rows if row['id'] not in stored]
+
+
+def read_archived_events(start, end, storage_bin=None, item=None, event=None, root=None, batch_size=1000):
+    """
+    Archived events stamped in [start, end), optionally of one bin, item and
+    event type, as dicts of ARCHIVE_COLUMNS with 'timestamp' parsed. Reads only
+    the files of the days overlapping the range, one line at a time. Each event
+    is yielded once, however many files hold it, and not at all while it is
+    still stored (archive_events stopped between writing and deleting it); the
+    stored ids are looked up per ``batch_size`` rows.
+    """
+    seen = set()
+    batch = []
+    for day in _days(start, end):
+        for row in _archived_rows(archive_files(day, root), seen):
+            if storage_bin is not None and row['storage_bin_id'] != storage_bin:
+                continue
+            if item is not None and row['item_id'] != item:
+                continue
+            if event is not None and row['event'] != event:
+                continue
+            row['timestamp'] = parse_datetime(row['timestamp'])
+            if start <= row['timestamp'] < end:
+                batch.append(row)
+            if len(batch) >= batch_size:
+                yield from _without_stored(batch)
+                batch = []
+    yield from _without_stored(batch)
@@ -0,0 +1,141 @@
+import threading
+import time
+
+from django.conf import settings
+
+
+class ResolutionCache:
+    """
+    In-process, thread-safe TTL cache mapping normalized lookup keys to model
+    instances. Entries are dropped by primary key when the row is saved or
+    deleted (see inventory.signals); the TTL bounds staleness for changes made
+    by other worker processes. Only identity fields of cached instances should
+    be trusted - quantities are always updated in the database.
+    """
+
+    def __init__(self, ttl_setting='IOT_RESOLUTION_CACHE_TTL', size_setting='IOT_RESOLUTION_CACHE_SIZE'):
+        self.ttl_setting = ttl_setting
+        self.size_setting = size_setting
+        self._entries = {}  # key -> (expires_at, instance)
+        self._keys_by_pk = {}  # pk -> {key, ...}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, self.ttl_setting, 60)
+
+    @property
+    def max_size(self):
+        return getattr(settings, self.size_setting, 10000)
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires_at, instance = entry
+                if expires_at < now:
+                    self._discard(key)
+                    continue
+                found[key] = instance
+        return found
+
+    def set(self, key, instance):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                self._entries.clear()
+                self._keys_by_pk.clear()
+            self._discard(key)
+            self._entries[key] = (time.monotonic() + self.ttl, instance)
+            self._keys_by_pk.setdefault(instance.pk, set()).add(key)
+
+    def invalidate(self, pk):
+        with self._lock:
+            for key in self._keys_by_pk.pop(pk, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_pk.clear()
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys_by_pk.get(entry[1].pk)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_pk[entry[1].pk]
+
+
+class EventDebouncer:
+    """
+    In-process suppression of repeated IoT reads. An event is admitted unless
+    the same (bin, item, event) key was admitted less than IOT_DEBOUNCE_WINDOW
+    seconds earlier (by event timestamp), so a reader reporting one tag many
+    times per second produces a single event. A window of 0 disables it.
+    """
+
+    def __init__(self, window_setting='IOT_DEBOUNCE_WINDOW', size_setting='IOT_DEBOUNCE_SIZE'):
+        self.window_setting = window_setting
+        self.size_setting = size_setting
+        self._last_seen = {}  # key -> (event timestamp, monotonic expiry)
+        self._lock = threading.Lock()
+
+    @property
+    def window(self):
+        return getattr(settings, self.window_setting, 0)
+
+    @property
+    def max_size(self):
+        return getattr(settings, self.size_setting, 10000)
+
+    def admit(self, key, timestamp, pending=None):
+        """
+        Whether an event is admitted. With a ``pending`` dict the key is only
+        noted there (so later reads of the same batch are still suppressed)
+        and becomes visible to other requests once record(pending) is called,
+        after the event was applied; a failed apply then leaves no trace.
+        """
+        window = self.window
+        if window <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            for entry in (self._last_seen.get(key), pending.get(key) if pending is not None else None):
+                if entry is not None and entry[1] >= now and abs((timestamp - entry[0]).total_seconds()) < window:
+                    return False
+            if pending is not None:
+                pending[key] = (timestamp, now + window)
+            else:
+                self._store(key, (timestamp, now + window), now)
+            return True
+
+    def record(self, pending):
+        """Make the keys admitted into ``pending`` suppress repeated reads."""
+        now = time.monotonic()
+        with self._lock:
+            for key, entry in pending.items():
+                self._store(key, entry, now)
+
+    def _store(self, key, entry, now):
+        if len(self._last_seen) >= self.max_size:
+            self._last_seen = {k: v for k, v in self._last_seen.items() if v[1] >= now}
+            if len(self._last_seen) >= self.max_size:
+                self._last_seen.clear()
+        self._last_seen[key] = entry
+
+    def clear(self):
+        with self._lock:
+            self._last_seen.clear()
+
+
+storage_bin_cache = ResolutionCache()
+item_cache = ResolutionCache()
+iot_debouncer = EventDebouncer()
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from accounts.api_keys import authenticate_api_key
+from accounts.throttling import BatchExceedsBurst, charge_events
+from .ingest import ingest_iot_batch
+
+logger = logging.getLogger(__name__)
+
+
+class IoTEventConsumer(AsyncWebsocketConsumer):
+    """
+    Persistent ingestion channel for IoT gateways (ws/iot/?api_key=...).
+
+    The API key is checked when the connection opens and again for every
+    frame, whose events are taken from the key's token bucket like an HTTP
+    batch. A frame over the key's rate is not applied and gets
+    {"type": "throttled", "seq": <seq>, "retry_after": <seconds>}, so the gateway
+    resends it later; a revoked key closes the connection. Each frame carries
+    an increasing sequence number and one event, or a list of events:
+    {"seq": 1, "location": "A1-R02", "item_name": "Widget", "event": "item_added", "quantity": 5}
+    {"seq": 2, "events": [{...}, {...}]}
+
+    Frames are applied in micro-batches (IOT_WS_BATCH_SIZE events, or whatever
+    arrived within IOT_WS_BATCH_WINDOW seconds) by a single writer task. Each
+    batch is acknowledged with {"type": "ack", "seq": <last frame applied>},
+    together with the errors of invalid events by seq and index. A failed batch
+    gets a "nack" covering its seq range, so the gateway can resend it.
+
+    Once IOT_WS_MAX_PENDING events are waiting for the writer, the consumer stops
+    reading the socket until the writer catches up, and it announces this with
+    {"type": "backpressure", "paused": true/false}. Frames that were not
+    acknowledged before a disconnect are dropped, except the batch already being
+    written. Gateways should send client_event_id when they resend.
+    """
+
+    async def connect(self):
+        self.writer = None
+        self.raw_key = self.api_key_from_scope()
+        api_key = await self.get_api_key(self.raw_key)
+        if api_key is None:
+            logger.warning("[IoTEventConsumer] Rejected connection without a valid API key")
+            await self.close(code=4401)
+            return
+
+        self.batch_size = getattr(settings, 'IOT_WS_BATCH_SIZE', 500)
+        self.batch_window = getattr(settings, 'IOT_WS_BATCH_WINDOW', 0.05)
+        self.max_pending = getattr(settings, 'IOT_WS_MAX_PENDING', 5000)
+        self.max_frame_events = getattr(settings, 'IOT_BATCH_MAX_EVENTS', 1000)
+        self.frames = asyncio.Queue()  # (seq, events), None to stop
+        self.pending = 0  # Events received but not written yet
+        self.capacity = asyncio.Condition()
+        self.last_seq = None
+        self.closing = False
+        await self.accept()
+        self.writer = asyncio.create_task(self.write_batches())
+        logger.info(f"[IoTEventConsumer] Gateway connected with key {api_key.prefix}... of {api_key.user_email}")
+        await self.send_message({
+            "type": "connected",
+            "batch_size": self.batch_size,
+            "max_pending": self.max_pending,
+        })
+
+    def api_key_from_scope(self):
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        if query.get('api_key'):
+            return query['api_key'][0]
+        return dict(self.scope.get('headers', [])).get(b'x-api-key', b'').decode() or None
+
+    @database_sync_to_async
+    def get_api_key(self, key):
+        return authenticate_api_key(key)
+
+    @database_sync_to_async
+    def charge_frame(self, cost):
+        """
+        Re-verify the key and take ``cost`` events from its bucket: (key, seconds
+        to wait or None), the key being None once it was revoked.
+        """
+        api_key = authenticate_api_key(self.raw_key)
+        if api_key is None:
+            return None, None
+        return api_key, charge_events(api_key, cost)
+
+    async def send_message(self, message):
+        if not self.closing:
+            await self.send(text_data=json.dumps(message, default=str))
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            frame = json.loads(text_data if text_data is not None else bytes_data)
+        except (TypeError, ValueError):
+            await self.send_message({"type": "error", "error": "Frames must be JSON objects"})
+            return
+        seq = frame.get('seq') if isinstance(frame, dict) else None
+        if not isinstance(seq, int) or isinstance(seq, bool):
+            await self.send_message({"type": "error", "error": "Frame needs an integer seq"})
+            return
+        if self.last_seq is not None and seq <= self.last_seq:
+            await self.send_message({"type": "error", "seq": seq, "error": f"seq must be greater than {self.last_seq}"})
+            return
+        events = frame['events'] if 'events' in frame else [{key: value for key, value in frame.items() if key != 'seq'}]
+        if not isinstance(events, list) or not events or len(events) > self.max_frame_events:
+            await self.send_message({
+                "type": "error", "seq": seq,
+                "error": f"events must be a list of 1 to {self.max_frame_events} events",
+            })
+            return
+        try:
+            api_key, retry_after = await self.charge_frame(len(events))
+        except BatchExceedsBurst as e:
+            await self.send_message({"type": "error", "seq": seq, "error": str(e.detail)})
+            return
+        if api_key is None:
+            logger.warning("[IoTEventConsumer] Closing connection: its API key is no longer valid")
+            await self.send_message({"type": "error", "seq": seq, "error": "API key is no longer valid"})
+            await self.close(code=4401)
+            return
+        if retry_after is not None:
+            await self.send_message({"type": "throttled", "seq": seq, "retry_after": retry_after})
+            return
+        self.last_seq = seq
+
+        # Not returning from receive() stops reading the socket: that is the backpressure
+        async with self.capacity:
+            if self.pending and self.pending + len(events) > self.max_pending:
+                await self.send_message({"type": "backpressure", "paused": True, "pending": self.pending})
+                await self.capacity.wait_for(lambda: not self.pending or self.pending + len(events) <= self.max_pending)
+                await self.send_message({"type": "backpressure", "paused": False, "pending": self.pending})
+            self.pending += len(events)
+        self.frames.put_nowait((seq, events))
+
+    async def write_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            frame = await self.frames.get()
+            if frame is None or self.closing:
+                return
+            frames = [frame]
+            count = len(frame[1])
+            deadline = loop.time() + self.batch_window
+            stop = False
+            while count < self.batch_size:
+                try:
+                    frame = await asyncio.wait_for(self.frames.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    break
+                if frame is None:
+                    stop = True
+                    break
+                frames.append(frame)
+                count += len(frame[1])
+            if self.closing:
+                return
+            await self.write_batch(frames, count)
+            if stop:
+                return
+
+    async def write_batch(self, frames, count):
+        payloads = []
+        positions = []  # (seq, index within the frame) of each payload
+        for seq, events in frames:
+            payloads.extend(events)
+            positions.extend((seq, index) for index in range(len(events)))
+        try:
+            # Off the thread-sensitive executor, which also serves receive(): frames keep being read while a batch is written
+            results, suppressed = await database_sync_to_async(ingest_iot_batch, thread_sensitive=False)(payloads)
+        except Exception as e:
+            logger.error(f"[IoTEventConsumer] Error processing IoT batch: {str(e)}")
+            await self.send_message({"type": "nack", "from_seq": frames[0][0], "seq": frames[-1][0], "error": str(e)})
+        else:
+            errors = [
+                {"seq": seq, "index": index, "errors": result['errors']}
+                for (seq, index), result in zip(positions, results)
+                if result['status'] == 'invalid'
+            ]
+            await self.send_message({
+                "type": "ack",
+                "seq": frames[-1][0],
+                "processed": len(payloads) - len(errors),
+                "suppressed": suppressed,
+                "failed": len(errors),
+                "errors": errors,
+            })
+        finally:
+            async with self.capacity:
+                self.pending -= count
+                self.capacity.notify_all()
+
+    async def disconnect(self, close_code):
+        if self.writer is None:
+            return
+        self.closing = True
+        self.frames.put_nowait(None)
+        await self.writer  # Lets a batch that is being written finish
+        logger.info(f"[IoTEventConsumer] Gateway disconnected, code: {close_code}")
@@ -0,0 +1,153 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import InventoryCounter, InventoryCounterSnapshot, Item, StockRecord, StorageBin, lock_order
+
+ITEMS = 'items'
+STORAGE_BINS = 'storage_bins'
+STOCK_RECORDS = 'stock_records'
+ACTIVE_STOCK_RECORDS = 'active_stock_records'  # Stock records holding a positive quantity
+EXPIRED_ITEMS = 'expired_items'  # Items whose expiry date is on or before InventoryCounter.as_of
+COUNTERS = (ITEMS, STORAGE_BINS, STOCK_RECORDS, ACTIVE_STOCK_RECORDS, EXPIRED_ITEMS)
+GRID_VERSION = 'grid_version'  # Last version handed to changed aisle/rack grid cells (see inventory.grid)
+
+
+def count_exact(name, today=None):
+    """The true value of a counter, computed from the tables (used for seeding and repairs)."""
+    if name == ITEMS:
+        return Item.objects.count()
+    if name == STORAGE_BINS:
+        return StorageBin.objects.count()
+    if name == STOCK_RECORDS:
+        return StockRecord.objects.count()
+    if name == ACTIVE_STOCK_RECORDS:
+        return StockRecord.objects.filter(quantity__gt=0).count()
+    if name == EXPIRED_ITEMS:
+        return Item.objects.filter(expiry_date__lte=today or timezone.localdate()).count()
+    if name == GRID_VERSION:
+        return (StorageBin.objects.aggregate(last=Max('grid_version'))['last'] or 0) + 1
+    raise ValueError(f"Unknown inventory counter: {name}")
+
+
+def seed_counter(name):
+    """Create a missing counter row from an exact count."""
+    today = timezone.localdate()
+    try:
+        with transaction.atomic():
+            InventoryCounter.objects.create(
+                name=name, value=count_exact(name, today), as_of=today if name == EXPIRED_ITEMS else None
+            )
+    except IntegrityError:
+        pass  # Seeded concurrently
+
+
+def bump_counters(deltas):
+    """Add ``{counter name: delta}`` to the counters with one F() UPDATE each."""
+    for name, delta in lock_order(deltas.items()):
+        if delta and not InventoryCounter.objects.filter(name=name).update(value=F('value') + delta):
+            # A freshly seeded counter already includes this change
+            seed_counter(name)
+
+
+def roll_expired_items(today=None):
+    """
+    Bring the expired-items counter forward to ``today`` by adding the items
+    that expired since the day it was last valid for (one indexed range count).
+    """
+    today = today or timezone.localdate()
+    counter = InventoryCounter.objects.filter(name=EXPIRED_ITEMS).first()
+    if counter is None:
+        seed_counter(EXPIRED_ITEMS)
+        return
+    if counter.as_of == today:
+        return
+    if counter.as_of is None or counter.as_of > today:  # Clock went back (e.g. another time zone): recount
+        changes = {'value': count_exact(EXPIRED_ITEMS, today)}
+    else:
+        newly_expired = Item.objects.filter(expiry_date__gt=counter.as_of, expiry_date__lte=today).count()
+        changes = {'value': F('value') + newly_expired}
+    # Only the first concurrent roller of the day applies its count
+    InventoryCounter.objects.filter(pk=counter.pk, as_of=counter.as_of).update(as_of=today, **changes)
+
+
+def bump_expired_items(old_expiry, new_expiry):
+    """Move the expired-items counter when an item is created, deleted or gets a new expiry date."""
+    bump_expired_items_many([(old_expiry, new_expiry)])
+
+
+def bump_expired_items_many(changes):
+    """
+    Move the expired-items counter for a list of (old expiry, new expiry)
+    changes, None meaning the item did not exist before / no longer exists.
+    Changes are measured against the day the counter is valid for; expiries
+    after that day are picked up by roll_expired_items.
+    """
+    while True:
+        counter = InventoryCounter.objects.filter(name=EXPIRED_ITEMS).values_list('pk', 'as_of').first()
+        if counter is None:
+            seed_counter(EXPIRED_ITEMS)  # Counted from the table, so it already includes these changes
+            return
+        pk, as_of = counter
+        if as_of is None:
+            return  # Recounted on the next read
+        delta = sum(
+            (new is not None and new <= as_of) - (old is not None and old <= as_of)
+            for old, new in changes
+        )
+        # Retried if the counter was rolled to another day in between
+        if not delta or InventoryCounter.objects.filter(pk=pk, as_of=as_of).update(value=F('value') + delta):
+            return
+
+
+def read_counters():
+    """All counters as {name: InventoryCounter} in one query (plus a daily roll of the expired-items counter)."""
+    counters = {counter.name: counter for counter in InventoryCounter.objects.filter(name__in=COUNTERS)}
+    expired = counters.get(EXPIRED_ITEMS)
+    missing = set(COUNTERS) - counters.keys()
+    if missing or expired.as_of != timezone.localdate():
+        for name in missing:
+            seed_counter(name)
+        roll_expired_items()
+        counters = {counter.name: counter for counter in InventoryCounter.objects.filter(name__in=COUNTERS)}
+    return counters
+
+
+def refresh_counters():
+    """Recompute every counter exactly, repairing drift from writes that bypass the model layer."""
+    today = timezone.localdate()
+    values = {}
+    for name in COUNTERS:
+        values[name] = count_exact(name, today)
+        InventoryCounter.objects.update_or_create(
+            name=name, defaults={'value': values[name], 'as_of': today if name == EXPIRED_ITEMS else None}
+        )
+    return values
+
+
+def snapshot_counters(day=None):
+    """Record today's counter values and make them the baseline of the dashboard change/trend figures."""
+    day = day or timezone.localdate()
+    counters = read_counters()
+    with transaction.atomic():
+        for name, counter in counters.items():
+            InventoryCounterSnapshot.objects.update_or_create(day=day, name=name, defaults={'value': counter.value})
+            InventoryCounter.objects.filter(pk=counter.pk).update(previous_value=counter.value, previous_date=day)
+    return {name: counter.value for name, counter in counters.items()}
+
+
+def describe_change(value, previous):
+    """Dashboard 'change' and 'trend' of a value against its last snapshot, e.g. ('+12%', 'up')."""
+    if previous is None:
+        return "+0%", "neutral"  # No snapshot taken yet
+    if not previous:
+        percent = 100 if value else 0
+    else:
+        percent = round((value - previous) * 100 / previous)
+    if percent > 0:
+        trend = "up"
+    elif percent < 0:
+        trend = "down"
+    else:
+        trend = "neutral"
+    return f"{percent:+d}%", trend
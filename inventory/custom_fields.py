@@ -0,0 +1,203 @@
+import datetime
+import re
+
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.fields.json import KeyTransform
+
+from .models import CustomFieldKey, Item, ItemCustomFieldValue
+
+# Query string prefix of custom field filters and orderings, e.g. ?cf__weight__gte=5&ordering=-cf__weight
+QUERY_PREFIX = 'cf__'
+FILTER_LOOKUPS = ('exact', 'gt', 'gte', 'lt', 'lte')
+ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+VALUE_COLUMNS = {
+    'string': 'text_value',
+    'number': 'number_value',
+    'date': 'date_value',
+    'boolean': 'number_value',
+}
+
+
+def uses_value_table():
+    """PostgreSQL filters on expression indexes over the JSON column; other databases use ItemCustomFieldValue."""
+    return connection.vendor != 'postgresql'
+
+
+def indexed_keys():
+    return {field.key: field for field in CustomFieldKey.objects.all()}
+
+
+def check_value(value, value_type):
+    """Whether a JSON value of custom_fields has the declared type (null is always allowed)."""
+    if value is None:
+        return True
+    if value_type == 'number':
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if value_type == 'boolean':
+        return isinstance(value, bool)
+    if value_type == 'date':
+        return isinstance(value, str) and _parse_date(value) is not None
+    return isinstance(value, str)
+
+
+def _parse_date(value):
+    """The date of an ISO YYYY-MM-DD string, None otherwise (JSON dates compare as strings, so '2024-1-5' is refused)."""
+    if not ISO_DATE.fullmatch(value):
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def invalid_custom_fields(custom_fields, keys=None):
+    """{key: message} for values of indexed keys that don't match the key's type."""
+    if not isinstance(custom_fields, dict):
+        return {}
+    keys = indexed_keys() if keys is None else keys
+    return {
+        key: f"Expected a {keys[key].value_type}{' (YYYY-MM-DD)' if keys[key].value_type == 'date' else ''}"
+        for key, value in custom_fields.items()
+        if key in keys and not check_value(value, keys[key].value_type)
+    }
+
+
+def parse_query_value(raw, value_type):
+    """The JSON value a query string value stands for; ValueError if it can't be one of ``value_type``."""
+    if value_type == 'number':
+        number = float(raw)
+        return int(number) if number.is_integer() else number
+    if value_type == 'boolean':
+        if raw.lower() in ('true', '1', 'yes'):
+            return True
+        if raw.lower() in ('false', '0', 'no'):
+            return False
+        raise ValueError(f"Invalid boolean: {raw}")
+    if value_type == 'date':
+        if _parse_date(raw) is None:
+            raise ValueError(f"Invalid date (YYYY-MM-DD): {raw}")
+    return raw
+
+
+def _stored_value(value, value_type):
+    """The side table column value of a JSON value."""
+    if value_type == 'date':
+        return _parse_date(value)
+    if value_type in ('number', 'boolean'):
+        return float(value)
+    return value[:255]
+
+
+def index_custom_fields(items, keys=None):
+    """(Re)build the ItemCustomFieldValue rows of the given items, for all or the given indexed keys."""
+    if not uses_value_table():
+        return
+    keys = list(indexed_keys().values()) if keys is None else keys
+    items = [item for item in items if item.pk is not None]
+    if not items or not keys:
+        return
+    with transaction.atomic():
+        ItemCustomFieldValue.objects.filter(item__in=[item.pk for item in items], key__in=keys).delete()
+        values = []
+        for item in items:
+            custom_fields = item.custom_fields if isinstance(item.custom_fields, dict) else {}
+            for field in keys:
+                value = custom_fields.get(field.key)
+                if value is None or not check_value(value, field.value_type):
+                    continue
+                values.append(ItemCustomFieldValue(
+                    item_id=item.pk, key=field, **{VALUE_COLUMNS[field.value_type]: _stored_value(value, field.value_type)}
+                ))
+        ItemCustomFieldValue.objects.bulk_create(values, batch_size=5000)
+
+
+def expression_index_name(key):
+    return f"inventory_item_cf_{key}"
+
+
+def create_key_index(field, chunk_size=2000):
+    """
+    Index a newly declared key: a btree expression index on (custom_fields -> key)
+    on PostgreSQL, built concurrently once the declaring transaction commits;
+    a backfill of the side table elsewhere.
+    """
+    if not uses_value_table():
+        # The key is validated by CustomFieldKey, so it is safe to inline
+        sql = (
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {expression_index_name(field.key)} "
+            f"ON {Item._meta.db_table} ((custom_fields -> '{field.key}'))"
+        )
+        transaction.on_commit(lambda: _execute(sql))
+        return
+    chunk = []
+    for item in Item.objects.only('id', 'custom_fields').iterator(chunk_size=chunk_size):
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            index_custom_fields(chunk, [field])
+            chunk = []
+    index_custom_fields(chunk, [field])
+
+
+def _execute(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+
+
+def drop_key_index(field):
+    """Drop the expression index of an undeclared key (side table rows go with the key)."""
+    if not uses_value_table():
+        _execute(f"DROP INDEX IF EXISTS {expression_index_name(field.key)}")
+
+
+def _split_param(name, keys):
+    """'weight__gte' -> (CustomFieldKey, 'gte'); ValueError for undeclared keys and unknown lookups."""
+    key, _, lookup = name.partition('__')
+    lookup = lookup or 'exact'
+    if key not in keys:
+        raise ValueError(f"'{key}' is not an indexed custom field")
+    if lookup not in FILTER_LOOKUPS:
+        raise ValueError(f"Unsupported custom field lookup '{lookup}'")
+    return keys[key], lookup
+
+
+def filter_custom_fields(queryset, params, keys=None):
+    """
+    Narrow an Item queryset by the ?cf__<key>[__<lookup>]=value parameters
+    among ``params``. Only indexed keys can be filtered on. On PostgreSQL,
+    equality is a containment test on the GIN index of custom_fields and ranges
+    use the key's expression index; elsewhere the ItemCustomFieldValue indexes.
+    Raises ValueError on unknown keys or values of the wrong type.
+    """
+    names = [name for name in params if name.startswith(QUERY_PREFIX)]
+    if not names:
+        return queryset
+    keys = indexed_keys() if keys is None else keys
+    for name in names:
+        field, lookup = _split_param(name[len(QUERY_PREFIX):], keys)
+        value = parse_query_value(params[name], field.value_type)
+        if uses_value_table():
+            column = VALUE_COLUMNS[field.value_type]
+            matches = ItemCustomFieldValue.objects.filter(
+                key=field, **{f"{column}__{lookup}": _stored_value(value, field.value_type)}
+            )
+            queryset = queryset.filter(pk__in=matches.values('item_id'))
+        elif lookup == 'exact':
+            queryset = queryset.filter(custom_fields__contains={field.key: value})  # Served by the GIN index
+        else:
+            queryset = queryset.filter(**{f"custom_fields__{field.key}__{lookup}": value})
+    return queryset
+
+
+def order_by_custom_field(queryset, ordering, keys=None):
+    """Order an Item queryset by '[-]cf__<key>' (newest first among equal values)."""
+    descending = ordering.startswith('-')
+    keys = indexed_keys() if keys is None else keys
+    field, _ = _split_param(ordering.lstrip('-')[len(QUERY_PREFIX):], keys)
+    if uses_value_table():
+        expression = Subquery(
+            ItemCustomFieldValue.objects.filter(item=OuterRef('pk'), key=field).values(VALUE_COLUMNS[field.value_type])[:1]
+        )
+    else:
+        expression = KeyTransform(field.key, 'custom_fields')
+    return queryset.order_by(expression.desc() if descending else expression.asc(), '-id')
@@ -0,0 +1,112 @@
+from datetime import timedelta
+
+from django.db.models import Case, CharField, Count, IntegerField, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from alerts.models import Alert
+from .models import ExpiryTrackedItem, Item
+
+# (bucket, last day of the bucket relative to today); buckets are disjoint
+EXPIRY_BUCKETS = (
+    ('expired', 0),
+    ('7_days', 7),
+    ('30_days', 30),
+    ('90_days', 90),
+)
+EXPIRY_SOURCES = (
+    ('items', Item),
+    ('expiry_tracked_items', ExpiryTrackedItem),
+)
+
+
+def _bucketed(model, source, today):
+    """Per-bucket count and quantity of one model, limited to the horizon by the expiry_date index."""
+    whens = [
+        When(expiry_date__lte=today + timedelta(days=days), then=Value(bucket))
+        for bucket, days in EXPIRY_BUCKETS
+    ]
+    return (
+        model.objects.filter(expiry_date__lte=today + timedelta(days=EXPIRY_BUCKETS[-1][1]))
+        .annotate(source=Value(source, output_field=CharField()), bucket=Case(*whens, output_field=CharField()))
+        .values('source', 'bucket')
+        .annotate(count=Count('id'), quantity=Coalesce(Sum('quantity'), 0, output_field=IntegerField()))
+        .order_by()
+    )
+
+
+def expiry_horizon(today=None):
+    """
+    Counts and quantities of Items and ExpiryTrackedItems by expiry bucket:
+    expired (on or before today), then within 7, 30 and 90 days. Both models
+    are grouped in a single UNION ALL query. Returns one dict per bucket.
+    """
+    today = today or timezone.localdate()
+    (first_source, first_model), *others = EXPIRY_SOURCES
+    queryset = _bucketed(first_model, first_source, today)
+    queryset = queryset.union(*(_bucketed(model, source, today) for source, model in others), all=True)
+
+    empty = {'count': 0, 'quantity': 0}
+    buckets = {
+        bucket: {'bucket': bucket, 'count': 0, 'quantity': 0, **{source: dict(empty) for source, _ in EXPIRY_SOURCES}}
+        for bucket, _ in EXPIRY_BUCKETS
+    }
+    for row in queryset:
+        bucket = buckets[row['bucket']]
+        bucket[row['source']] = {'count': row['count'], 'quantity': row['quantity']}
+        bucket['count'] += row['count']
+        bucket['quantity'] += row['quantity']
+    return [buckets[bucket] for bucket, _ in EXPIRY_BUCKETS]
+
+
+def expiry_alert_key(source, pk, expiry_date, stage):
+    return f"expiry:{source}:{pk}:{expiry_date.isoformat()}:{stage}"
+
+
+def sweep_expiry_alerts(today=None, warning_days=7, lookback_days=30, batch_size=1000):
+    """
+    Create 'Expiry Warning' alerts for items that expire within ``warning_days``
+    or have expired, one per item, expiry date and stage, for the item's owner.
+    Alerts are bulk-inserted with a unique dedupe_key, so items already alerted
+    on are skipped by the database rather than checked one by one. Items that
+    expired more than ``lookback_days`` ago are left alone. Returns the number
+    of candidate items and of alerts actually created.
+    """
+    today = today or timezone.localdate()
+    candidates = 0
+    created = 0
+    for source, model in EXPIRY_SOURCES:
+        rows = (
+            model.objects.filter(
+                expiry_date__gt=today - timedelta(days=lookback_days),
+                expiry_date__lte=today + timedelta(days=warning_days),
+            )
+            .values_list('id', 'user_id', 'name', 'batch', 'expiry_date')
+            .iterator(chunk_size=batch_size)
+        )
+        alerts = []
+        for pk, user_id, name, batch, expiry_date in rows:
+            candidates += 1
+            if expiry_date <= today:
+                stage, message = 'expired', f"{name} (batch {batch}) expired on {expiry_date.isoformat()}"
+            else:
+                stage, message = 'expiring', f"{name} (batch {batch}) expires on {expiry_date.isoformat()}"
+            alerts.append(Alert(
+                user_id=user_id, type='Expiry Warning', message=message,
+                dedupe_key=expiry_alert_key(source, pk, expiry_date, stage),
+            ))
+            if len(alerts) >= batch_size:
+                created += _insert_new_alerts(alerts)
+                alerts = []
+        created += _insert_new_alerts(alerts)
+    return candidates, created
+
+
+def _insert_new_alerts(alerts):
+    """Bulk-insert alerts whose dedupe_key is not taken yet; returns how many were new."""
+    if not alerts:
+        return 0
+    keys = [alert.dedupe_key for alert in alerts]
+    existing = Alert.objects.filter(dedupe_key__in=keys).count()
+    Alert.objects.bulk_create(alerts, ignore_conflicts=True)
+    return Alert.objects.filter(dedupe_key__in=keys).count() - existing
@@ -0,0 +1,122 @@
+import threading
+
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from .counters import GRID_VERSION, bump_counters, seed_counter
+from .models import PENDING_GRID_VERSION, InventoryCounter, StorageBin
+
+# One cell per bin ((row, rack) is unique), sent as arrays in this column order
+GRID_COLUMNS = ('id', 'bin_id', 'row', 'rack', 'capacity', 'used', 'utilization', 'item_count')
+
+
+def grid_version():
+    """
+    Current version of the grid: every committed change of a bin is stamped
+    with it or a lower version, so cells stamped higher changed after it.
+    Writers only mark a changed bin pending (make_grid_version); the bins found
+    pending here get the next value of the 'grid_version' counter. Stamps and
+    counter move in one transaction that holds the counter row, so versions
+    follow commit order however long the writers' transactions ran. Bins still
+    locked by a writer stay pending for the next call.
+    """
+    counter = InventoryCounter.objects.filter(name=GRID_VERSION).values_list('value', flat=True)
+    pending = StorageBin.objects.filter(grid_version=PENDING_GRID_VERSION)
+    if pending.exists():
+        with transaction.atomic():
+            bump_counters({GRID_VERSION: 1})
+            version = counter.get()
+            stamped = list(pending.select_for_update(skip_locked=True).values_list('pk', flat=True))
+            StorageBin.objects.filter(pk__in=stamped).update(grid_version=version)
+        return version
+    version = counter.first()
+    if version is None:
+        seed_counter(GRID_VERSION)
+        version = counter.get()
+    return version
+
+
+def grid_layout():
+    """Signature of the set of bins; it changes when bins are created or deleted (ids only grow)."""
+    layout = StorageBin.objects.aggregate(bins=Count('id'), last_id=Max('id'))
+    return f"{layout['bins']}:{layout['last_id'] or 0}"
+
+
+def grid_cells(since=None):
+    """{bin pk: (grid_version, cell)} from one grouped query, optionally only cells changed after ``since``."""
+    queryset = StorageBin.objects.all()
+    if since is not None:
+        queryset = queryset.filter(grid_version__gt=since)
+    rows = (
+        queryset.values('id', 'bin_id', 'row', 'rack', 'capacity', 'used', 'grid_version')
+        .annotate(item_count=Count('stock_records__item', filter=Q(stock_records__quantity__gt=0), distinct=True))
+        .order_by()
+    )
+    cells = {}
+    for row in rows:
+        utilization = round(row['used'] * 100 / row['capacity'], 1) if row['capacity'] else 0
+        cells[row['id']] = (row['grid_version'], [
+            row['id'], row['bin_id'], row['row'], row['rack'], row['capacity'], row['used'], utilization, row['item_count'],
+        ])
+    return cells
+
+
+class OccupancyGrid:
+    """
+    In-process copy of the aisle/rack occupancy grid. Each read patches it with
+    the cells whose grid_version moved since the last read (an indexed range
+    scan) instead of regrouping every bin; it is rebuilt when bins are added or
+    removed. Versions follow commit order (see grid_version), so a change that
+    committed late still gets a version above the last read.
+    """
+
+    def __init__(self):
+        self.layout = None
+        self.version = None  # grid_version() taken before the last refresh
+        self.cells = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        started = grid_version()
+        layout = grid_layout()
+        with self._lock:
+            if layout != self.layout or self.version is None:
+                self.cells = grid_cells()
+            else:
+                self.cells.update(grid_cells(since=self.version))
+            self.layout = layout
+            self.version = started
+
+    def read(self, since=None, layout=None):
+        """
+        The whole grid, or only the cells changed since ``since`` when the
+        client's ``layout`` still matches. Changed cells are sent whole, so a
+        cell may be repeated across deltas.
+        """
+        self.refresh()
+        with self._lock:
+            full = since is None or layout != self.layout
+            cells = [
+                cell for version, cell in self.cells.values()
+                if full or version > since
+            ]
+            capacity = sum(cell[4] for _, cell in self.cells.values())
+            used = sum(cell[5] for _, cell in self.cells.values())
+            return {
+                "version": self.version,
+                "layout": self.layout,
+                "full": full,
+                "columns": GRID_COLUMNS,
+                "rows": sorted({cell[2] for _, cell in self.cells.values()}),
+                "racks": sorted({cell[3] for _, cell in self.cells.values()}),
+                "totals": {
+                    "bins": len(self.cells),
+                    "capacity": capacity,
+                    "used": used,
+                    "utilization": round(used * 100 / capacity, 1) if capacity else 0,
+                },
+                "cells": sorted(cells, key=lambda cell: (cell[2], cell[3])),
+            }
+
+
+occupancy_grid = OccupancyGrid()
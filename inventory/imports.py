@@ -0,0 +1,457 @@
+import csv
+import io
+import json
+import os
+from collections import defaultdict, namedtuple
+from datetime import date, datetime
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+try:
+    import openpyxl
+except ImportError:  # XLSX imports are optional
+    openpyxl = None
+
+from .cache import item_cache, storage_bin_cache
+from .custom_fields import index_custom_fields, indexed_keys, invalid_custom_fields
+from .counters import ACTIVE_STOCK_RECORDS, ITEMS, STOCK_RECORDS, STORAGE_BINS, bump_counters, bump_expired_items_many
+from .models import Item, StockLedgerEntry, StockRecord, StorageBin, make_grid_version, make_location_key, make_name_key
+from .search import index_items
+from .services import adjust_bin_usage, record_stock_ledger, resolve_items, spawn_worker_pool
+
+
+class ImportFileError(Exception):
+    """The uploaded file as a whole cannot be imported (unknown format, missing columns, ...)."""
+
+
+Column = namedtuple('Column', ['name', 'type', 'required', 'max_length', 'default'], defaults=[True, None, None])
+
+IMPORT_COLUMNS = {
+    'items': (
+        Column('name', 'str', max_length=255),
+        Column('part_number', 'str', max_length=255),
+        Column('manufacturer', 'str', max_length=255),
+        Column('contact', 'str', max_length=255),
+        Column('batch', 'str', max_length=255),
+        Column('expiry_date', 'date'),
+        Column('quantity', 'int', required=False, default=0),
+        Column('custom_fields', 'json', required=False),
+    ),
+    'bins': (
+        Column('bin_id', 'str', max_length=50),
+        Column('row', 'str', max_length=20),
+        Column('rack', 'str', max_length=20),
+        Column('shelf', 'str', max_length=20),
+        Column('type', 'str', max_length=100),
+        Column('capacity', 'int'),
+        Column('description', 'str', required=False, default=''),
+    ),
+    'stock_records': (
+        Column('item_name', 'str', max_length=255),
+        Column('bin_id', 'str', max_length=50),
+        Column('quantity', 'int'),
+        Column('critical', 'bool', required=False, default=False),
+    ),
+}
+IMPORT_KINDS = tuple(IMPORT_COLUMNS)
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', ''}
+
+
+def _clean_value(column, value):
+    """Coerce one cell; raises ValueError with a user-facing message."""
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == '':
+        if column.required:
+            raise ValueError("This field is required.")
+        return column.default
+    if column.type == 'str':
+        value = str(value)
+        if column.max_length and len(value) > column.max_length:
+            raise ValueError(f"Ensure this field has no more than {column.max_length} characters.")
+        return value
+    if column.type == 'int':
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValueError("A valid integer is required.")
+        if value < 0:
+            raise ValueError("Ensure this value is greater than or equal to 0.")
+        return value
+    if column.type == 'date':
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        parsed = parse_date(str(value)[:10])
+        if parsed is None:
+            raise ValueError("Date has wrong format. Use YYYY-MM-DD.")
+        return parsed
+    if column.type == 'bool':
+        text = str(value).strip().lower()
+        if text in TRUE_VALUES:
+            return True
+        if text in FALSE_VALUES:
+            return False
+        raise ValueError("Must be a valid boolean.")
+    if column.type == 'json':
+        if isinstance(value, dict):
+            return value
+        try:
+            value = json.loads(value)
+        except (TypeError, ValueError):
+            raise ValueError("Value must be valid JSON.")
+        if not isinstance(value, dict):
+            raise ValueError("Value must be a JSON object.")
+        return value
+    raise ValueError(f"Unsupported column type {column.type}")
+
+
+def validate_chunk(kind, rows):
+    """
+    Coerce and validate a chunk of (row number, raw dict) pairs without touching
+    the database, so it can run in a worker process. Returns (valid rows with
+    their '_row' number, [{"row": n, "errors": {...}}]).
+    """
+    valid = []
+    errors = []
+    for row_number, raw in rows:
+        cleaned = {'_row': row_number}
+        row_errors = {}
+        for column in IMPORT_COLUMNS[kind]:
+            try:
+                cleaned[column.name] = _clean_value(column, raw.get(column.name))
+            except ValueError as e:
+                row_errors[column.name] = [str(e)]
+        if row_errors:
+            errors.append({"row": row_number, "errors": row_errors})
+        else:
+            valid.append(cleaned)
+    return valid, errors
+
+
+def _normalize_header(header):
+    return str(header or '').strip().lower().replace(' ', '_')
+
+
+def _check_header(kind, header):
+    missing = [column.name for column in IMPORT_COLUMNS[kind] if column.required and column.name not in header]
+    if missing:
+        raise ImportFileError(f"Missing required columns: {', '.join(missing)}")
+
+
+def iter_rows(kind, fileobj, filename):
+    """Stream (row number, raw dict) pairs from a CSV or XLSX file; row numbers match the spreadsheet."""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.xlsx':
+        if openpyxl is None:
+            raise ImportFileError("XLSX import requires the openpyxl package; upload a CSV file instead")
+        workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [_normalize_header(cell) for cell in next(rows, ())]
+            _check_header(kind, header)
+            for row_number, values in enumerate(rows, start=2):
+                if any(value not in (None, '') for value in values):
+                    yield row_number, dict(zip(header, values))
+        finally:
+            workbook.close()
+    elif extension in ('.csv', ''):
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='') if isinstance(fileobj.read(0), bytes) else fileobj
+        reader = csv.reader(text)
+        header = [_normalize_header(cell) for cell in next(reader, [])]
+        _check_header(kind, header)
+        for values in reader:
+            if any(value.strip() for value in values):
+                yield reader.line_num, dict(zip(header, values))
+    else:
+        raise ImportFileError(f"Unsupported file type '{extension}'; upload a .csv or .xlsx file")
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _validated_chunks(kind, chunks, workers):
+    """
+    Validate chunks in order. The first chunk is validated inline; if more
+    follow (a large file) and ``workers`` > 1, the rest go through a process
+    pool with a bounded number of chunks in flight.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return
+    yield validate_chunk(kind, first)
+    second = next(chunks, None)
+    if second is None:
+        return
+    if workers <= 1:
+        yield validate_chunk(kind, second)
+        for chunk in chunks:
+            yield validate_chunk(kind, chunk)
+        return
+
+    with spawn_worker_pool(workers) as pool:
+        pending = [pool.submit(validate_chunk, kind, second)]
+        for chunk in chunks:
+            pending.append(pool.submit(validate_chunk, kind, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+class InventoryImporter:
+    """
+    Bulk import of items, storage bins or stock records from CSV/XLSX.
+
+    Rows are streamed in chunks, validated in bulk (in a process pool for
+    large files) and written with bulk_create/bulk_update, one transaction
+    per chunk. Items are matched on their name and bins on bin_id, so
+    re-importing a file updates instead of duplicating. Stock record rows set
+    the on-hand quantity of an (item, bin) pair; the difference goes through
+    the ledger and bin usage as StockRecord.save() would move them.
+    """
+
+    def __init__(self, kind, user, chunk_size=2000, workers=1):
+        if kind not in IMPORT_COLUMNS:
+            raise ImportFileError(f"Unknown import type '{kind}', expected one of: {', '.join(IMPORT_KINDS)}")
+        self.kind = kind
+        self.user = user
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.seen = set()  # Keys already imported from this file
+        self.chunk_seen = set()  # Keys and errors of the chunk being written, kept once it commits
+        self.chunk_errors = []
+        self.result = {"kind": kind, "rows": 0, "created": 0, "updated": 0, "failed": 0, "errors": []}
+
+    def run(self, fileobj, filename):
+        rows = iter_rows(self.kind, fileobj, filename)
+        for valid, errors in _validated_chunks(self.kind, _chunks(rows, self.chunk_size), self.workers):
+            self.result['rows'] += len(valid) + len(errors)
+            self.fail_rows(errors)
+            if valid:
+                self.write_chunk(valid)
+        self.result['errors'].sort(key=lambda error: error['row'])
+        return self.result
+
+    def fail_rows(self, errors):
+        self.result['failed'] += len(errors)
+        self.result['errors'].extend(errors)
+
+    def row_error(self, row, field, message):
+        return {"row": row['_row'], "errors": {field: [message]}}
+
+    def reject_rows(self, errors):
+        """Fail rows of the chunk being written; reported once its transaction is over."""
+        self.chunk_errors.extend(errors)
+
+    def is_seen(self, key):
+        return key in self.seen or key in self.chunk_seen
+
+    def unique_rows(self, rows, key, field, label):
+        """Drop rows repeating a key of an earlier row of the file (reported as errors)."""
+        unique = []
+        errors = []
+        for row in rows:
+            row_key = key(row)
+            if self.is_seen(row_key):
+                errors.append(self.row_error(row, field, f"Duplicate {label} in this file"))
+            else:
+                self.chunk_seen.add(row_key)
+                unique.append(row)
+        self.reject_rows(errors)
+        return unique
+
+    def write_chunk(self, rows):
+        write = getattr(self, f"write_{self.kind}")
+        self.chunk_seen = set()
+        self.chunk_errors = []
+        try:
+            with transaction.atomic():
+                created, updated = write(rows)
+        except IntegrityError as e:
+            # A concurrent writer took one of the keys; nothing of this chunk was written, so its keys stay free
+            rejected = {error['row'] for error in self.chunk_errors}
+            self.fail_rows(self.chunk_errors + [
+                {"row": row['_row'], "errors": {"non_field_errors": [f"Not imported: {e}"]}}
+                for row in rows if row['_row'] not in rejected
+            ])
+            return
+        self.seen |= self.chunk_seen
+        self.fail_rows(self.chunk_errors)
+        self.result['created'] += created
+        self.result['updated'] += updated
+
+    def write_items(self, rows):
+        rows = self.unique_rows(rows, lambda row: make_name_key(row['name']), 'name', "item name")
+        keys = indexed_keys()
+        typed_rows = []
+        for row in rows:
+            errors = invalid_custom_fields(row['custom_fields'], keys)
+            if errors:
+                message = "; ".join(f"{key}: {message}" for key, message in errors.items())
+                self.reject_rows([self.row_error(row, 'custom_fields', message)])
+            else:
+                typed_rows.append(row)
+        rows = typed_rows
+        existing = {}
+        for item in Item.objects.filter(name_key__in={make_name_key(row['name']) for row in rows}).order_by('-id'):
+            existing[item.name_key] = item  # The oldest item wins, as in IoT name resolution
+
+        to_create = []
+        to_update = []
+        expiry_changes = []
+        for row in rows:
+            fields = {name: row[name] for name in ('name', 'part_number', 'manufacturer', 'contact', 'batch', 'expiry_date')}
+            fields['custom_fields'] = row['custom_fields'] or {}
+            item = existing.get(make_name_key(row['name']))
+            if item is None:
+                # bulk_create skips save(), so the lookup key is set here
+                to_create.append(Item(user=self.user, quantity=row['quantity'], name_key=make_name_key(row['name']), **fields))
+                expiry_changes.append((None, row['expiry_date']))
+            else:
+                # Item.quantity follows stock movements, so only descriptive fields are updated
+                expiry_changes.append((item.expiry_date, row['expiry_date']))
+                for name, value in fields.items():
+                    setattr(item, name, value)
+                item.name_key = make_name_key(item.name)
+                to_update.append(item)
+
+        created = Item.objects.bulk_create(to_create, batch_size=self.chunk_size)
+        Item.objects.bulk_update(
+            to_update,
+            ['name', 'name_key', 'part_number', 'manufacturer', 'contact', 'batch', 'expiry_date', 'custom_fields'],
+            batch_size=self.chunk_size,
+        )
+        index_items(created + to_update)
+        index_custom_fields(created + to_update, list(keys.values()))
+        bump_counters({ITEMS: len(created)})
+        bump_expired_items_many(expiry_changes)
+        transaction.on_commit(lambda: [item_cache.invalidate(item.pk) for item in to_update])
+        return len(created), len(to_update)
+
+    def write_bins(self, rows):
+        rows = self.unique_rows(rows, lambda row: ('bin', row['bin_id']), 'bin_id', "bin_id")
+        location_rows = []
+        for row in rows:
+            # A location may only appear once per file as well
+            location_key = make_location_key(row['row'], row['rack'])
+            if self.is_seen(('location', location_key)):
+                self.reject_rows([self.row_error(row, 'rack', f"Duplicate location {location_key} in this file")])
+            else:
+                self.chunk_seen.add(('location', location_key))
+                location_rows.append(row)
+        rows = location_rows
+
+        existing = StorageBin.objects.in_bulk([row['bin_id'] for row in rows], field_name='bin_id')
+        taken = dict(
+            StorageBin.objects.filter(location_key__in={make_location_key(row['row'], row['rack']) for row in rows})
+            .values_list('location_key', 'bin_id')
+        )
+
+        to_create = []
+        to_update = []
+        for row in rows:
+            location_key = make_location_key(row['row'], row['rack'])
+            if taken.get(location_key, row['bin_id']) != row['bin_id']:
+                self.reject_rows([self.row_error(row, 'rack', f"Location {location_key} is already used by bin {taken[location_key]}")])
+                continue
+            fields = {name: row[name] for name in ('row', 'rack', 'shelf', 'type', 'capacity', 'description')}
+            storage_bin = existing.get(row['bin_id'])
+            if storage_bin is None:
+                to_create.append(StorageBin(user=self.user, bin_id=row['bin_id'], location_key=location_key, **fields))
+            else:
+                for name, value in fields.items():
+                    setattr(storage_bin, name, value)
+                storage_bin.location_key = location_key
+                storage_bin.grid_version = make_grid_version()
+                to_update.append(storage_bin)
+
+        created = StorageBin.objects.bulk_create(to_create, batch_size=self.chunk_size)
+        StorageBin.objects.bulk_update(
+            to_update, ['row', 'rack', 'location_key', 'shelf', 'type', 'capacity', 'description', 'grid_version'],
+            batch_size=self.chunk_size,
+        )
+        bump_counters({STORAGE_BINS: len(created)})
+        transaction.on_commit(lambda: [storage_bin_cache.invalidate(storage_bin.pk) for storage_bin in to_update])
+        return len(created), len(to_update)
+
+    def write_stock_records(self, rows):
+        items = resolve_items({row['item_name'] for row in rows})
+        bins = StorageBin.objects.in_bulk({row['bin_id'] for row in rows}, field_name='bin_id')
+        resolved = []
+        for row in rows:
+            item = items.get(make_name_key(row['item_name']))
+            storage_bin = bins.get(row['bin_id'])
+            if item is None:
+                self.reject_rows([self.row_error(row, 'item_name', f"No Item found with name: {row['item_name']}")])
+            elif storage_bin is None:
+                self.reject_rows([self.row_error(row, 'bin_id', f"No StorageBin found with bin_id: {row['bin_id']}")])
+            else:
+                resolved.append((row, item, storage_bin))
+        unique = []
+        for row, item, storage_bin in resolved:
+            if self.is_seen(('stock', item.pk, storage_bin.pk)):
+                self.reject_rows([self.row_error(row, 'bin_id', "Duplicate item and bin pair in this file")])
+            else:
+                self.chunk_seen.add(('stock', item.pk, storage_bin.pk))
+                unique.append((row, item, storage_bin))
+        resolved = unique
+
+        # Lock the records being overwritten so concurrent stock movements wait instead of being lost
+        existing = {
+            (record.item_id, record.storage_bin_id): record
+            for record in StockRecord.objects.select_for_update().filter(
+                item__in={item.pk for _, item, _ in resolved}, storage_bin__in={storage_bin.pk for _, _, storage_bin in resolved}
+            )
+        }
+
+        to_create = []
+        to_update = []
+        deltas = []
+        active = 0
+        for row, item, storage_bin in resolved:
+            record = existing.get((item.pk, storage_bin.pk))
+            previous = record.quantity if record else 0
+            if record is None:
+                to_create.append(StockRecord(
+                    user=self.user, item=item, storage_bin=storage_bin, quantity=row['quantity'],
+                    critical=row['critical'], location=f"{storage_bin.row}-{storage_bin.rack}",
+                ))
+            else:
+                record.quantity = row['quantity']
+                record.critical = row['critical']
+                to_update.append(record)
+            deltas.append((item.pk, storage_bin.pk, row['quantity'] - previous))
+            active += (row['quantity'] > 0) - (previous > 0)
+
+        StockRecord.objects.bulk_create(to_create, batch_size=self.chunk_size)
+        StockRecord.objects.bulk_update(to_update, ['quantity', 'critical'], batch_size=self.chunk_size)
+
+        # bulk writes skip StockRecord.save(), so bin usage and the ledger are moved here as it would
+        now = timezone.now()
+        bin_deltas = defaultdict(int)
+        for _, storage_bin_id, delta in deltas:
+            bin_deltas[storage_bin_id] += delta
+        for storage_bin_id, delta in sorted(bin_deltas.items()):
+            adjust_bin_usage(storage_bin_id, delta)
+        record_stock_ledger([
+            StockLedgerEntry(item_id=item_id, storage_bin_id=storage_bin_id, reason='adjustment', delta=delta, occurred_at=now)
+            for item_id, storage_bin_id, delta in deltas
+        ])
+        bump_counters({STOCK_RECORDS: len(to_create), ACTIVE_STOCK_RECORDS: active})
+        return len(to_create), len(to_update)
@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import iot_debouncer
+from .serializers import LocationEventSerializer
+from .services import apply_iot_events, enqueue_iot_events, resolve_iot_references
+
+
+def accepted_result(pending):
+    return {
+        "message": "Event accepted for processing",
+        "pending_id": pending.id,
+        "location": f"{pending.storage_bin.row}-{pending.storage_bin.rack}",
+        "item": pending.item.name,
+        "quantity": pending.quantity,
+    }
+
+
+def debounced_result(validated):
+    storage_bin = validated['storage_bin']
+    return {
+        "message": "Repeated read suppressed",
+        "location": f"{storage_bin.row}-{storage_bin.rack}",
+        "item": validated['item'].name,
+        "quantity": 0,
+        "debounced": True,
+    }
+
+
+def duplicate_result(validated):
+    storage_bin = validated['storage_bin']
+    return {
+        "message": "Duplicate event ignored",
+        "client_event_id": validated['client_event_id'],
+        "location": f"{storage_bin.row}-{storage_bin.rack}",
+        "item": validated['item'].name,
+        "quantity": 0,
+        "duplicate": True,
+    }
+
+
+def is_repeated_read(validated, pending):
+    """
+    Collapse repeated (bin, item, event) reads inside the debounce window before
+    touching the database. Admitted keys wait in ``pending`` until
+    record_admitted_reads() runs, so a read whose apply fails can be retried.
+    """
+    key = (validated['storage_bin'].pk, validated['item'].pk, validated['event'])
+    return not iot_debouncer.admit(key, validated['timestamp'], pending)
+
+
+def record_admitted_reads(pending):
+    """Start suppressing the admitted reads once the transaction applying them commits (at once outside one)."""
+    if pending:
+        transaction.on_commit(lambda: iot_debouncer.record(pending))
+
+
+def ingest_iot_batch(payloads, async_mode=False):
+    """
+    Validate a batch of raw IoT event payloads, apply (or buffer, in async mode)
+    the valid ones together and report per event. Shared by the HTTP endpoint
+    and the WebSocket consumer. Returns (results, suppressed), results holding
+    one dict per payload with its index and status (processed, accepted,
+    duplicate, debounced or invalid). Errors while applying are raised.
+    """
+    resolved_bins, resolved_items = resolve_iot_references(payloads)
+    context = {'resolved_bins': resolved_bins, 'resolved_items': resolved_items}
+
+    results = [None] * len(payloads)
+    valid_indexes = []
+    valid_events = []
+    suppressed = 0  # debounced reads and duplicate client event ids
+    pending = {}
+    for index, payload in enumerate(payloads):
+        if not isinstance(payload, dict):
+            results[index] = {"index": index, "status": "invalid", "errors": {"non_field_errors": ["Event must be a JSON object"]}}
+            continue
+        serializer = LocationEventSerializer(data=payload, context=context)
+        if not serializer.is_valid():
+            results[index] = {"index": index, "status": "invalid", "errors": serializer.errors}
+            continue
+        validated = dict(serializer.validated_data)
+        validated.setdefault('timestamp', timezone.now())
+        if is_repeated_read(validated, pending):
+            results[index] = {"index": index, "status": "debounced", **debounced_result(validated)}
+            suppressed += 1
+            continue
+        valid_indexes.append(index)
+        valid_events.append(validated)
+
+    if valid_events:
+        if async_mode:
+            applied = [
+                accepted_result(pending) if pending else duplicate_result(validated)
+                for pending, validated in zip(enqueue_iot_events(valid_events), valid_events)
+            ]
+        else:
+            applied = apply_iot_events(valid_events)
+        record_admitted_reads(pending)
+        event_status = "accepted" if async_mode else "processed"
+        for index, result in zip(valid_indexes, applied):
+            if result.get('duplicate'):
+                suppressed += 1
+            results[index] = {"index": index, "status": "duplicate" if result.get('duplicate') else event_status, **result}
+    return results, suppressed
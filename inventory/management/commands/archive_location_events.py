@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from inventory.archive import archive_events, archive_root, compact_day, retention_cutoff, retention_days
+from inventory.models import LocationEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Move processed location events older than the retention period into gzipped NDJSON files, "
+        "one directory per day, in bounded batches. Safe to run while events are being ingested."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Retention in days (default: LOCATION_EVENT_RETENTION_DAYS).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Events archived and deleted per transaction.")
+        parser.add_argument('--no-compact', action='store_true', help="Leave one archive file per batch and day.")
+        parser.add_argument('--vacuum', action='store_true', help="VACUUM ANALYZE the event table afterwards (PostgreSQL).")
+
+    def handle(self, *args, **options):
+        days = retention_days() if options['days'] is None else options['days']
+        if days < 1:
+            raise CommandError("--days must be at least 1")
+        before = retention_cutoff(days)
+        self.stdout.write(f"Archiving events before {before.isoformat()} to {archive_root()}")
+
+        archived = 0
+        touched = set()
+        for batch_days, count in archive_events(before, batch_size=max(options['batch_size'], 1)):
+            archived += count
+            touched |= batch_days
+            self.stdout.write(f"Archived {archived} events")
+
+        if not options['no_compact']:
+            for day in sorted(touched):
+                merged = compact_day(day)
+                if merged:
+                    self.stdout.write(f"Compacted {merged} files of {day}")
+
+        if options['vacuum']:
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(f"VACUUM ANALYZE {LocationEvent._meta.db_table}")
+            else:
+                self.stdout.write("--vacuum is only supported on PostgreSQL, skipped")
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} events from {len(touched)} days"))
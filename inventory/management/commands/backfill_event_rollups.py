@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from inventory.models import LocationEvent
+from inventory.rollups import rebuild_rollups
+from inventory.services import spawn_worker_pool
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the hourly and daily LocationEvent rollups from the stored events, in chunks of days "
+        "processed in parallel. Each chunk replaces its rollups in one transaction, so the command can be rerun."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day (YYYY-MM-DD), defaults to the day of the oldest event.")
+        parser.add_argument('--end', help="Last day, inclusive (YYYY-MM-DD), defaults to the newest event.")
+        parser.add_argument('--chunk-days', type=int, default=7, help="Days rebuilt per transaction.")
+        parser.add_argument('--workers', type=int, default=4, help="Worker processes; 1 rebuilds in this process.")
+
+    def parse_day(self, value, name):
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"--{name} must be a date (YYYY-MM-DD)")
+        return day
+
+    def handle(self, *args, **options):
+        bounds = LocationEvent.objects.aggregate(first=Min('timestamp'), last=Max('timestamp'))
+        if bounds['first'] is None and not (options['start'] and options['end']):
+            self.stdout.write("No location events to roll up")
+            return
+        first = self.parse_day(options['start'], 'start') if options['start'] else timezone.localdate(bounds['first'])
+        last = self.parse_day(options['end'], 'end') if options['end'] else timezone.localdate(bounds['last'])
+        if first > last:
+            raise CommandError("--start must not be after --end")
+        chunk_days = max(options['chunk_days'], 1)
+        workers = max(options['workers'], 1)
+
+        chunks = []
+        day = first
+        while day <= last:
+            chunk_end = min(day + timedelta(days=chunk_days), last + timedelta(days=1))
+            chunks.append((day, chunk_end))
+            day = chunk_end
+
+        if workers == 1 or len(chunks) == 1:
+            hourly, daily = self.report(chunks, map(rebuild_rollups, *zip(*chunks)))
+        else:
+            with spawn_worker_pool(workers) as pool:
+                hourly, daily = self.report(chunks, pool.map(rebuild_rollups, *zip(*chunks)))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups for {first} to {last} in {len(chunks)} chunks: {hourly} hourly, {daily} daily rows"
+        ))
+
+    def report(self, chunks, results):
+        hourly = daily = 0
+        for (first, end), (hours, days) in zip(chunks, results):
+            hourly, daily = hourly + hours, daily + days
+            self.stdout.write(f"Rolled up {first} to {end - timedelta(days=1)}: {hours} hourly, {days} daily rows")
+        return hourly, daily
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.services import drain_pending_iot_events
+
+
+class Command(BaseCommand):
+    help = "Drain IoT events accepted in async mode into LocationEvent, StockRecord and Item."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Maximum events applied per transaction.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep when the buffer is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain what is buffered now and exit.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        while True:
+            drained = drain_pending_iot_events(batch_size=batch_size)
+            total += drained
+            if drained:
+                self.stdout.write(f"Drained {drained} IoT events")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"Done, {total} IoT events drained"))
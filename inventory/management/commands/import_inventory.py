@@ -0,0 +1,36 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.imports import IMPORT_KINDS, ImportFileError, InventoryImporter
+
+
+class Command(BaseCommand):
+    help = "Bulk import items, storage bins or stock records from a CSV or XLSX file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=IMPORT_KINDS, help="What the file contains.")
+        parser.add_argument('path', help="CSV or XLSX file to import.")
+        parser.add_argument('--user', required=True, help="Email of the user the imported rows belong to.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Rows validated and written per batch.")
+        parser.add_argument('--workers', type=int, default=4, help="Validation processes for large files (1 disables the pool).")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['user']}")
+
+        importer = InventoryImporter(options['kind'], user, chunk_size=options['chunk_size'], workers=options['workers'])
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                result = importer.run(fileobj, options['path'])
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['rows']} rows: {result['created']} created, {result['updated']} updated, {result['failed']} failed"
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from inventory.custom_fields import create_key_index, index_custom_fields, indexed_keys, uses_value_table
+from inventory.models import Item
+
+
+class Command(BaseCommand):
+    help = "Rebuild the indexes of declared custom field keys (needed after bulk writes that bypass Item.save())."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Items re-indexed per transaction.")
+
+    def handle(self, *args, **options):
+        keys = list(indexed_keys().values())
+        if not uses_value_table():
+            for field in keys:
+                create_key_index(field)
+            self.stdout.write(self.style.SUCCESS(f"Ensured expression indexes for {len(keys)} custom field keys"))
+            return
+
+        chunk = []
+        indexed = 0
+        for item in Item.objects.only('id', 'custom_fields').iterator(chunk_size=options['chunk_size']):
+            chunk.append(item)
+            if len(chunk) >= options['chunk_size']:
+                index_custom_fields(chunk, keys)
+                indexed += len(chunk)
+                chunk = []
+        index_custom_fields(chunk, keys)
+        indexed += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Re-indexed {len(keys)} custom field keys on {indexed} items"))
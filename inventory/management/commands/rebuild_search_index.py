@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import Item
+from inventory.search import index_items, uses_token_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the item n-gram search tokens (needed after bulk writes that bypass Item.save())."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Items re-indexed per transaction.")
+
+    def handle(self, *args, **options):
+        if not uses_token_index():
+            self.stdout.write("PostgreSQL serves item search from pg_trgm indexes; nothing to rebuild")
+            return
+
+        chunk = []
+        indexed = 0
+        for item in Item.objects.only('id', 'name', 'part_number').iterator(chunk_size=options['chunk_size']):
+            chunk.append(item)
+            if len(chunk) >= options['chunk_size']:
+                index_items(chunk)
+                indexed += len(chunk)
+                chunk = []
+        index_items(chunk)
+        indexed += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Re-indexed {indexed} items"))
@@ -0,0 +1,65 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.models import ProjectionCheckpoint, StockLedgerEntry, StockOnHand
+from inventory.services import bump_on_hand
+
+CHECKPOINT_NAME = 'stock_on_hand'
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the StockOnHand projection from the stock ledger, streaming entries in id order "
+        "and checkpointing after every chunk. Pause IoT ingestion and the drain worker while it runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help="Ledger entries folded per transaction.")
+        parser.add_argument('--resume', action='store_true', help="Continue an interrupted rebuild from its checkpoint.")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        checkpoint, _ = ProjectionCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+
+        if options['resume'] and not checkpoint.completed:
+            self.stdout.write(f"Resuming after ledger entry {checkpoint.last_entry_id}")
+        else:
+            with transaction.atomic():
+                StockOnHand.objects.all().delete()
+                checkpoint.last_entry_id = 0
+                checkpoint.completed = False
+                checkpoint.save()
+
+        entries = (
+            StockLedgerEntry.objects.filter(id__gt=checkpoint.last_entry_id)
+            .order_by('id')
+            .values_list('id', 'item_id', 'storage_bin_id', 'delta')
+            .iterator(chunk_size=chunk_size)
+        )
+
+        folded = 0
+        pending = defaultdict(int)
+        last_entry_id = checkpoint.last_entry_id
+        for entry_id, item_id, storage_bin_id, delta in entries:
+            pending[(item_id, storage_bin_id)] += delta
+            last_entry_id = entry_id
+            folded += 1
+            if folded % chunk_size == 0:
+                self.flush(checkpoint, pending, last_entry_id)
+                pending = defaultdict(int)
+                self.stdout.write(f"Folded {folded} ledger entries (checkpoint {last_entry_id})")
+
+        self.flush(checkpoint, pending, last_entry_id, completed=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"Projection rebuilt from {folded} ledger entries, up to entry {last_entry_id}"
+        ))
+
+    def flush(self, checkpoint, pending, last_entry_id, completed=False):
+        """Fold one chunk into the projection and advance the checkpoint atomically."""
+        with transaction.atomic():
+            bump_on_hand({key: (delta, last_entry_id) for key, delta in pending.items()})
+            checkpoint.last_entry_id = last_entry_id
+            checkpoint.completed = completed
+            checkpoint.save(update_fields=['last_entry_id', 'completed', 'updated_at'])
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from inventory.models import StockRecord, StorageBin, make_grid_version
+
+
+class Command(BaseCommand):
+    help = "Recompute StorageBin.used from stock records in one grouped query and report (and fix) drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drift, do not correct it.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Bins locked and corrected per transaction.")
+
+    def usage_totals(self, bin_pks=None):
+        records = StockRecord.objects.filter(storage_bin__isnull=False)
+        if bin_pks is not None:
+            records = records.filter(storage_bin_id__in=bin_pks)
+        return dict(records.values_list('storage_bin_id').annotate(total=Sum('quantity')).order_by())
+
+    def handle(self, *args, **options):
+        totals = self.usage_totals()
+
+        suspects = []
+        checked = 0
+        for bin_pk, bin_id, used in StorageBin.objects.values_list('pk', 'bin_id', 'used').iterator(chunk_size=2000):
+            checked += 1
+            expected = max(0, totals.get(bin_pk) or 0)
+            if used != expected:
+                suspects.append(bin_pk)
+                if options['dry_run']:
+                    self.stdout.write(f"{bin_id}: used={used}, stock records sum to {expected} (drift {used - expected:+d})")
+
+        corrected = 0
+        if not options['dry_run']:
+            for start in range(0, len(suspects), options['batch_size']):
+                corrected += self.correct(suspects[start:start + options['batch_size']])
+
+        action = "found" if options['dry_run'] else "corrected"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} bins, {action} drift on {len(suspects) if options['dry_run'] else corrected}"))
+
+    def correct(self, bin_pks):
+        """
+        Recompute and fix a batch of bins while holding their row locks. A
+        movement changes its stock record before bumping the bin's used with
+        F(), so one that is still open when the lock is taken lands on top of
+        the corrected value, and one that committed is in the recomputed sum.
+        """
+        drifted = []
+        with transaction.atomic():
+            bins = list(
+                StorageBin.objects.select_for_update().filter(pk__in=bin_pks).order_by('pk').values_list('pk', 'bin_id', 'used')
+            )
+            totals = self.usage_totals(bin_pks)
+            for bin_pk, bin_id, used in bins:
+                expected = max(0, totals.get(bin_pk) or 0)
+                if used != expected:
+                    drifted.append(StorageBin(pk=bin_pk, used=expected, grid_version=make_grid_version()))
+                    self.stdout.write(f"{bin_id}: used={used}, stock records sum to {expected} (drift {used - expected:+d})")
+            StorageBin.objects.bulk_update(drifted, ['used', 'grid_version'])
+        return len(drifted)
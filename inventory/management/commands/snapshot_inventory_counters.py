@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from inventory.counters import refresh_counters, snapshot_counters
+
+
+class Command(BaseCommand):
+    help = "Record today's dashboard counters (run daily); the snapshot is the baseline of the metrics change/trend."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refresh', action='store_true', help="Recompute every counter exactly before the snapshot.")
+
+    def handle(self, *args, **options):
+        if options['refresh']:
+            refresh_counters()
+        values = snapshot_counters()
+        summary = ", ".join(f"{name}={value}" for name, value in sorted(values.items()))
+        self.stdout.write(self.style.SUCCESS(f"Snapshot of inventory counters: {summary}"))
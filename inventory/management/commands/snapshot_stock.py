@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from inventory.history import take_stock_snapshot
+
+
+class Command(BaseCommand):
+    help = "Checkpoint on-hand stock per item and bin so point-in-time queries only replay recent ledger entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', help="ISO 8601 timestamp to snapshot (default: now), e.g. 2025-09-30T23:59:59Z.")
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['as_of']:
+            as_of = parse_datetime(options['as_of'])
+            if as_of is None:
+                raise CommandError(f"Invalid --as-of timestamp: {options['as_of']}")
+            if timezone.is_naive(as_of):
+                as_of = timezone.make_aware(as_of)
+        snapshot, lines = take_stock_snapshot(as_of)
+        self.stdout.write(self.style.SUCCESS(f"Snapshot as of {snapshot.as_of.isoformat()} with {lines} balances"))
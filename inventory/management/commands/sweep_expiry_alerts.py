@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from inventory.expiry import sweep_expiry_alerts
+
+
+class Command(BaseCommand):
+    help = "Raise deduplicated 'Expiry Warning' alerts for expiring and expired items (schedule daily, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--warning-days', type=int, default=7, help="Warn this many days before expiry.")
+        parser.add_argument('--lookback-days', type=int, default=30, help="Ignore items that expired longer ago than this.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Alerts inserted per bulk INSERT.")
+
+    def handle(self, *args, **options):
+        candidates, created = sweep_expiry_alerts(
+            warning_days=options['warning_days'],
+            lookback_days=options['lookback_days'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Checked {candidates} expiring items, raised {created} new alerts"))
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+def populate_lookup_keys(apps, schema_editor):
+    StorageBin = apps.get_model('inventory', 'StorageBin')
+    Item = apps.get_model('inventory', 'Item')
+    bins = list(StorageBin.objects.only('id', 'row', 'rack'))
+    for storage_bin in bins:
+        storage_bin.location_key = f"{storage_bin.row.strip().upper()}-{storage_bin.rack.strip().upper()}"
+    StorageBin.objects.bulk_update(bins, ['location_key'], batch_size=1000)
+    items = list(Item.objects.only('id', 'name'))
+    for item in items:
+        item.name_key = item.name.strip().lower()
+    Item.objects.bulk_update(items, ['name_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_merge_20250917_0712'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storagebin',
+            name='location_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=41),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='name_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_lookup_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_storagebin_location_key_item_name_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingIoTEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('item_added', 'Item Added'), ('item_removed', 'Item Removed')], max_length=20)),
+                ('quantity', models.IntegerField(default=1)),
+                ('timestamp', models.DateTimeField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_iot_events', to='inventory.item')),
+                ('storage_bin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_iot_events', to='inventory.storagebin')),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:47
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_stock_records(apps, schema_editor):
+    """Fold duplicate (item, bin) stock records into the oldest one before adding the constraint."""
+    StockRecord = apps.get_model('inventory', 'StockRecord')
+    duplicates = (
+        StockRecord.objects.filter(storage_bin__isnull=False)
+        .values('item_id', 'storage_bin_id')
+        .annotate(records=Count('id'), keep_id=Min('id'), total=Sum('quantity'))
+        .filter(records__gt=1)
+    )
+    for row in duplicates:
+        StockRecord.objects.filter(pk=row['keep_id']).update(quantity=row['total'])
+        StockRecord.objects.filter(
+            item_id=row['item_id'], storage_bin_id=row['storage_bin_id']
+        ).exclude(pk=row['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0017_pendingiotevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_stock_records, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='stockrecord',
+            constraint=models.UniqueConstraint(condition=models.Q(('storage_bin__isnull', False)), fields=('item', 'storage_bin'), name='unique_stock_record_item_bin'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def seed_opening_balances(apps, schema_editor):
+    """Open the ledger with one adjustment per existing stock record and project it."""
+    StockRecord = apps.get_model('inventory', 'StockRecord')
+    StockLedgerEntry = apps.get_model('inventory', 'StockLedgerEntry')
+    StockOnHand = apps.get_model('inventory', 'StockOnHand')
+    opened_at = timezone.now()
+    records = (
+        StockRecord.objects.filter(storage_bin__isnull=False)
+        .exclude(quantity=0)
+        .values_list('item_id', 'storage_bin_id', 'quantity')
+        .order_by('id')
+    )
+    entries = [
+        StockLedgerEntry(
+            item_id=item_id, storage_bin_id=storage_bin_id, reason='adjustment',
+            delta=quantity, occurred_at=opened_at,
+        )
+        for item_id, storage_bin_id, quantity in records
+    ]
+    entries = StockLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+    StockOnHand.objects.bulk_create([
+        StockOnHand(
+            item_id=entry.item_id, storage_bin_id=entry.storage_bin_id,
+            quantity=entry.delta, last_entry_id=entry.id or 0,
+        )
+        for entry in entries
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0018_stockrecord_unique_item_bin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_entry_id', models.BigIntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('item_added', 'Item Added'), ('item_removed', 'Item Removed'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('delta', models.IntegerField()),
+                ('occurred_at', models.DateTimeField(db_index=True)),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='inventory.item')),
+                ('location_event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='inventory.locationevent')),
+                ('storage_bin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='inventory.storagebin')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'storage_bin'], name='inventory_s_item_id_db8ec0_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockOnHand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('last_entry_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='on_hand', to='inventory.item')),
+                ('storage_bin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='on_hand', to='inventory.storagebin')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('item', 'storage_bin'), name='unique_stock_on_hand_item_bin')],
+            },
+        ),
+        migrations.RunPython(seed_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0020_stock_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='locationevent',
+            name='client_event_id',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='pendingiotevent',
+            name='client_event_id',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+TRIGRAM_INDEXES = {
+    'inventory_item_name_trgm': 'name',
+    'inventory_item_part_number_trgm': 'part_number',
+}
+
+
+def create_search_index(apps, schema_editor):
+    """pg_trgm GIN indexes on PostgreSQL (they serve icontains directly), n-gram tokens elsewhere."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for index_name, column in TRIGRAM_INDEXES.items():
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {index_name} ON inventory_item USING gin (UPPER({column}) gin_trgm_ops)'
+            )
+        return
+
+    Item = apps.get_model('inventory', 'Item')
+    ItemSearchToken = apps.get_model('inventory', 'ItemSearchToken')
+    pad = '\u0003\u0003'
+    tokens = []
+    for item_id, name, part_number in Item.objects.values_list('id', 'name', 'part_number').iterator(chunk_size=2000):
+        grams = set()
+        for value in (name, part_number):
+            value = (value or '').lower() + pad
+            grams.update(value[start:start + 3] for start in range(len(value) - 2))
+        tokens.extend(ItemSearchToken(item_id=item_id, token=gram) for gram in grams)
+        if len(tokens) >= 10000:
+            ItemSearchToken.objects.bulk_create(tokens)
+            tokens = []
+    ItemSearchToken.objects.bulk_create(tokens)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for index_name in TRIGRAM_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {index_name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0021_locationevent_client_event_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=3)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='inventory.item')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('token', 'item'), name='unique_item_search_token')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 17:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0022_item_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['created_at', 'id'], name='inventory_i_created_2b3b57_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockrecord',
+            index=models.Index(fields=['created_at', 'id'], name='inventory_s_created_3021c9_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:00
+
+import datetime
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    InventoryCounter = apps.get_model('inventory', 'InventoryCounter')
+    Item = apps.get_model('inventory', 'Item')
+    StockRecord = apps.get_model('inventory', 'StockRecord')
+    StorageBin = apps.get_model('inventory', 'StorageBin')
+    today = datetime.date.today()
+    counts = {
+        'items': Item.objects.count(),
+        'storage_bins': StorageBin.objects.count(),
+        'stock_records': StockRecord.objects.count(),
+        'active_stock_records': StockRecord.objects.filter(quantity__gt=0).count(),
+        'expired_items': Item.objects.filter(expiry_date__lte=today).count(),
+    }
+    InventoryCounter.objects.bulk_create([
+        InventoryCounter(name=name, value=value, as_of=today if name == 'expired_items' else None)
+        for name, value in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0023_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('as_of', models.DateField(blank=True, null=True)),
+                ('previous_value', models.BigIntegerField(blank=True, null=True)),
+                ('previous_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='expiry_date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.CreateModel(
+            name='InventoryCounterSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('name', models.CharField(max_length=50)),
+                ('value', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'name'), name='unique_inventory_counter_snapshot')],
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
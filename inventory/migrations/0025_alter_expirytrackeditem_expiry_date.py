@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0024_inventory_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='expirytrackeditem',
+            name='expiry_date',
+            field=models.DateField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:09
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_custom_fields_gin_index(apps, schema_editor):
+    """GIN index serving custom_fields containment (key = value) filters on PostgreSQL."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS inventory_item_custom_fields_gin ON inventory_item USING gin (custom_fields jsonb_path_ops)'
+        )
+
+
+def drop_custom_fields_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS inventory_item_custom_fields_gin')
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0025_alter_expirytrackeditem_expiry_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomFieldKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True, validators=[django.core.validators.RegexValidator('^[a-z][a-z0-9]*(_[a-z0-9]+)*$', 'Use lower-case letters, digits and single underscores.')])),
+                ('value_type', models.CharField(choices=[('string', 'String'), ('number', 'Number'), ('date', 'Date'), ('boolean', 'Boolean')], default='string', max_length=10)),
+                ('label', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ItemCustomFieldValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text_value', models.CharField(blank=True, max_length=255, null=True)),
+                ('number_value', models.FloatField(blank=True, null=True)),
+                ('date_value', models.DateField(blank=True, null=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='custom_field_values', to='inventory.item')),
+                ('key', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_values', to='inventory.customfieldkey')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'text_value'], name='inventory_i_key_id_c20e62_idx'), models.Index(fields=['key', 'number_value'], name='inventory_i_key_id_c44de1_idx'), models.Index(fields=['key', 'date_value'], name='inventory_i_key_id_7f4678_idx')],
+                'constraints': [models.UniqueConstraint(fields=('item', 'key'), name='unique_item_custom_field_value')],
+            },
+        ),
+        migrations.RunPython(create_custom_fields_gin_index, drop_custom_fields_gin_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:11
+
+import inventory.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0026_item_custom_field_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storagebin',
+            name='grid_version',
+            field=models.BigIntegerField(db_index=True, default=inventory.models.make_grid_version, editable=False),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0027_storagebin_grid_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationEventDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('event', models.CharField(choices=[('item_added', 'Item Added'), ('item_removed', 'Item Removed')], max_length=20)),
+                ('events', models.PositiveIntegerField(default=0)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('applied', models.BigIntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventory.item')),
+                ('storage_bin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventory.storagebin')),
+            ],
+            options={
+                'abstract': False,
+                'indexes': [models.Index(fields=['storage_bin', 'bucket'], name='inventory_l_storage_a43400_idx'), models.Index(fields=['item', 'bucket'], name='inventory_l_item_id_76e141_idx')],
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'storage_bin', 'item', 'event'), name='unique_locationeventdaily_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationEventHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('event', models.CharField(choices=[('item_added', 'Item Added'), ('item_removed', 'Item Removed')], max_length=20)),
+                ('events', models.PositiveIntegerField(default=0)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('applied', models.BigIntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventory.item')),
+                ('storage_bin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventory.storagebin')),
+            ],
+            options={
+                'abstract': False,
+                'indexes': [models.Index(fields=['storage_bin', 'bucket'], name='inventory_l_storage_6f8e7a_idx'), models.Index(fields=['item', 'bucket'], name='inventory_l_item_id_0c5c26_idx')],
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'storage_bin', 'item', 'event'), name='unique_locationeventhourly_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0028_location_event_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='locationevent',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
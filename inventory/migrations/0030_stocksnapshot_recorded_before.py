@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0029_locationevent_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='stocksnapshot',
+            old_name='taken_at',
+            new_name='recorded_before',
+        ),
+    ]
@@ -1,7 +1,39 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.core.validators import RegexValidator
 from django.db.models import JSONField, Sum
 
+
+def make_location_key(row, rack):
+    """Normalized, case-insensitive lookup key for a bin location, e.g. ('a1 ', 'r02') -> 'A1-R02'."""
+    return f"{row.strip().upper()}-{rack.strip().upper()}"
+
+
+def make_name_key(name):
+    """Normalized, case-insensitive lookup key for an item name."""
+    return name.strip().lower()
+
+
+def lock_order(keys):
+    """
+    The keys of the rows a batch writes, sorted. Batches that update several
+    rows visit them in this order, so two concurrent batches lock shared rows
+    in the same order and cannot deadlock.
+    """
+    return sorted(keys)
+
+
+PENDING_GRID_VERSION = 0
+
+
+def make_grid_version():
+    """
+    Stamp written with every change of a bin's aisle/rack grid cell: pending,
+    until inventory.grid hands the committed change its grid version.
+    """
+    return PENDING_GRID_VERSION
+
+
 class StorageBin(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     bin_id = models.CharField(max_length=50, unique=True)
@@ -12,6 +44,9 @@ class StorageBin(models.Model):
     capacity = models.PositiveIntegerField()
     used = models.PositiveIntegerField(default=0)  # Updated via stock records
     description = models.TextField(blank=True)
+    location_key = models.CharField(max_length=41, db_index=True, editable=False, default='')  # Maintained in save()
+    # Stamped on every change of the bin's grid cell, including usage updates (see inventory.grid)
+    grid_version = models.BigIntegerField(default=make_grid_version, db_index=True, editable=False)
 
     class Meta:
         unique_together = ('row', 'rack')
@@ -22,8 +57,21 @@ class StorageBin(models.Model):
     def __str__(self):
         return f"{self.bin_id} ({self.row}-{self.rack})"
 
+    def save(self, *args, **kwargs):
+        self.location_key = make_location_key(self.row, self.rack)
+        self.grid_version = make_grid_version()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            extra = {'location_key'} if {'row', 'rack'} & set(update_fields) else set()
+            kwargs['update_fields'] = {*update_fields, *extra, 'grid_version'}
+        super().save(*args, **kwargs)
+
     def update_used(self):
-        """Update the 'used' field by summing quantities from related StockRecord entries."""
+        """
+        Recompute the 'used' field by summing quantities from related StockRecord entries.
+        Stock movements keep 'used' current incrementally; this is for repairs
+        (see the reconcile_bin_usage command).
+        """
         total_used = self.stock_records.aggregate(total=Sum('quantity'))['total'] or 0
         if total_used != self.used:
             self.used = max(0, total_used)  # Ensure it doesn't go negative
@@ -34,7 +82,7 @@ class ExpiryTrackedItem(models.Model):
     name = models.CharField(max_length=100)
     batch = models.CharField(max_length=50)
     quantity = models.PositiveIntegerField()
-    expiry_date = models.DateField()
+    expiry_date = models.DateField(db_index=True)
 
     def __str__(self):
         return f"{self.name} ({self.batch})"
@@ -48,12 +96,96 @@ class Item(models.Model):
     contact = models.CharField(max_length=255)
     batch = models.CharField(max_length=255)
     custom_fields = models.JSONField(default=dict)
-    expiry_date = models.DateField()
+    expiry_date = models.DateField(db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    name_key = models.CharField(max_length=255, db_index=True, editable=False, default='')  # Maintained in save()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),  # Keyset pagination of the expired item list
+        ]
 
     def __str__(self):
         return self.name or self.part_number
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_expiry_date = instance.__dict__.get('expiry_date')
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.name_key = make_name_key(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_key'}
+        super().save(*args, **kwargs)
+
+class ItemSearchToken(models.Model):
+    """
+    N-gram of an item's name or part number, used as a substring search index
+    on databases without pg_trgm (see inventory.search). Maintained on save.
+    """
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['token', 'item'], name='unique_item_search_token'),
+        ]
+
+    def __str__(self):
+        return f"{self.token!r} -> item {self.item_id}"
+
+class CustomFieldKey(models.Model):
+    """
+    A key of Item.custom_fields declared as indexed, so items can be filtered
+    and ordered on it (see inventory.custom_fields). Values of indexed keys
+    must match the declared type.
+    """
+    TYPE_CHOICES = [
+        ('string', 'String'),
+        ('number', 'Number'),
+        ('date', 'Date'),
+        ('boolean', 'Boolean'),
+    ]
+
+    key = models.CharField(
+        max_length=40,  # Keeps the PostgreSQL index name within 63 characters
+        unique=True,
+        validators=[RegexValidator(r'^[a-z][a-z0-9]*(_[a-z0-9]+)*$', "Use lower-case letters, digits and single underscores.")],
+    )
+    value_type = models.CharField(max_length=10, choices=TYPE_CHOICES, default='string')
+    label = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.value_type})"
+
+class ItemCustomFieldValue(models.Model):
+    """
+    Typed copy of one indexed custom field of an item, used to filter and order
+    on databases without JSON expression indexes. Maintained on save.
+    """
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='custom_field_values')
+    key = models.ForeignKey(CustomFieldKey, on_delete=models.CASCADE, related_name='item_values')
+    text_value = models.CharField(max_length=255, null=True, blank=True)
+    number_value = models.FloatField(null=True, blank=True)  # Numbers and booleans
+    date_value = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key', 'text_value']),
+            models.Index(fields=['key', 'number_value']),
+            models.Index(fields=['key', 'date_value']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'key'], name='unique_item_custom_field_value'),
+        ]
+
+    def __str__(self):
+        return f"Item {self.item_id} {self.key_id}"
+
 class StockRecord(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='stock_records')
@@ -63,14 +195,52 @@ class StockRecord(models.Model):
     critical = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),  # Keyset pagination of the stock record list
+        ]
+        constraints = [
+            # One record per (item, bin) so concurrent stock movements can't fork the balance
+            models.UniqueConstraint(
+                fields=['item', 'storage_bin'],
+                condition=models.Q(storage_bin__isnull=False),
+                name='unique_stock_record_item_bin',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.item.name} at {self.storage_bin or self.location} ({self.quantity})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_stored_state()
+        return instance
+
+    def _remember_stored_state(self):
+        self._stored_quantity = self.__dict__.get('quantity')
+        self._stored_storage_bin_id = self.__dict__.get('storage_bin_id')
+
     def save(self, *args, **kwargs):
-        """Override save to update the related StorageBin's 'used' field."""
-        super().save(*args, **kwargs)
-        if self.storage_bin:
-            self.storage_bin.update_used()
+        """Override save to move the related StorageBin's 'used' field, the stock ledger and the active-stock counter by the quantity change."""
+        from .counters import ACTIVE_STOCK_RECORDS, bump_counters
+        from .services import adjust_bin_usage, record_stock_adjustment
+        update_fields = kwargs.get('update_fields')
+        tracked = update_fields is None or {'quantity', 'storage_bin'} & set(update_fields)
+        stored_quantity = getattr(self, '_stored_quantity', None) or 0
+        stored_bin_id = getattr(self, '_stored_storage_bin_id', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if tracked:
+                if stored_bin_id == self.storage_bin_id:
+                    changes = [(self.storage_bin_id, self.quantity - stored_quantity)]
+                else:
+                    changes = [(stored_bin_id, -stored_quantity), (self.storage_bin_id, self.quantity)]
+                for storage_bin_id, delta in changes:
+                    adjust_bin_usage(storage_bin_id, delta)
+                    record_stock_adjustment(self.item_id, storage_bin_id, delta)
+                bump_counters({ACTIVE_STOCK_RECORDS: (self.quantity > 0) - (stored_quantity > 0)})
+        self._remember_stored_state()
 
 class LocationEvent(models.Model):
     EVENT_CHOICES = [
@@ -80,38 +250,186 @@ class LocationEvent(models.Model):
     storage_bin = models.ForeignKey(StorageBin, on_delete=models.CASCADE, related_name='events')
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='events')
     event = models.CharField(max_length=20, choices=EVENT_CHOICES)
-    timestamp = models.DateTimeField()
+    timestamp = models.DateTimeField(db_index=True)  # Range scans of the rollup backfill and the archiver
     processed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     quantity = models.IntegerField(default=1)
     raw_location = models.CharField(max_length=100, blank=True, null=True)
+    client_event_id = models.CharField(max_length=100, unique=True, null=True, blank=True)  # Idempotency key sent by the gateway
 
     def __str__(self):
         return f"{self.storage_bin.bin_id} - {self.item.name} - {self.event} at {self.timestamp}"
 
     def save(self, *args, **kwargs):
-        """Override save to process the event and update StockRecord/StorageBin."""
-        super().save(*args, **kwargs)
-        if not self.processed:
-            try:
-                stock_record, created = StockRecord.objects.get_or_create(
-                    item=self.item,
-                    storage_bin=self.storage_bin,
-                    defaults={'quantity': 0, 'user': self.storage_bin.user if self.storage_bin else None}
+        """Override save to apply the event to StockRecord/Item/StorageBin in the same transaction."""
+        if self.processed:
+            super().save(*args, **kwargs)
+            return
+        from .rollups import bump_rollups
+        from .services import apply_stock_movements, record_stock_ledger
+        with transaction.atomic():
+            self.processed = True
+            super().save(*args, **kwargs)
+            applied, delta = apply_stock_movements(
+                self.item,
+                self.storage_bin,
+                [(self.event, self.quantity)],
+                defaults={'user': self.storage_bin.user},
+            )
+            record_stock_ledger([
+                StockLedgerEntry(
+                    item=self.item, storage_bin=self.storage_bin, location_event=self,
+                    reason=self.event, delta=delta, occurred_at=self.timestamp,
                 )
-                if self.event == 'item_added':
-                    stock_record.quantity += self.quantity
-                elif self.event == 'item_removed' and stock_record.quantity >= self.quantity:
-                    stock_record.quantity -= self.quantity
-                if stock_record.quantity < 0:
-                    stock_record.quantity = 0
-                stock_record.save()
-                self.processed = True
-                self.save(update_fields=['processed'])
-            except Exception as e:
-                print(f"Error processing event: {e}")
+            ])
+            timestamp = self._meta.get_field('timestamp').to_python(self.timestamp)
+            bump_rollups([(self.storage_bin_id, self.item_id, self.event, timestamp, self.quantity, applied[0])])
+
+class LocationEventRollup(models.Model):
+    """
+    Totals of the LocationEvents of one (bin, item, event type) within a time
+    bucket, maintained as events are applied (see inventory.rollups).
+    """
+    bucket = models.DateTimeField()  # Start of the hour/day, in the project time zone
+    storage_bin = models.ForeignKey(StorageBin, on_delete=models.CASCADE, related_name='+')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='+')
+    event = models.CharField(max_length=20, choices=LocationEvent.EVENT_CHOICES)
+    events = models.PositiveIntegerField(default=0)
+    quantity = models.BigIntegerField(default=0)  # Units reported by the gateways
+    applied = models.BigIntegerField(default=0)  # Units actually moved (removals are capped at the stock)
+
+    class Meta:
+        abstract = True
+        indexes = [
+            models.Index(fields=['storage_bin', 'bucket']),
+            models.Index(fields=['item', 'bucket']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['bucket', 'storage_bin', 'item', 'event'], name='unique_%(class)s_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket:%Y-%m-%d %H:%M} bin {self.storage_bin_id} item {self.item_id} {self.event}: {self.applied}"
+
+class LocationEventHourly(LocationEventRollup):
+    class Meta(LocationEventRollup.Meta):
+        pass
+
+class LocationEventDaily(LocationEventRollup):
+    class Meta(LocationEventRollup.Meta):
+        pass
+
+class PendingIoTEvent(models.Model):
+    """Validated IoT event accepted in async mode and waiting for the drain worker."""
+    storage_bin = models.ForeignKey(StorageBin, on_delete=models.CASCADE, related_name='pending_iot_events')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='pending_iot_events')
+    event = models.CharField(max_length=20, choices=LocationEvent.EVENT_CHOICES)
+    quantity = models.IntegerField(default=1)
+    timestamp = models.DateTimeField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    client_event_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
+
+    def __str__(self):
+        return f"Pending {self.event} of {self.quantity} at {self.storage_bin_id} (item {self.item_id})"
+
+class StockLedgerEntry(models.Model):
+    """Append-only ledger of every applied stock movement; the source of truth for on-hand quantities."""
+    REASON_CHOICES = LocationEvent.EVENT_CHOICES + [
+        ('adjustment', 'Adjustment'),
+    ]
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='ledger_entries')
+    storage_bin = models.ForeignKey(StorageBin, on_delete=models.CASCADE, related_name='ledger_entries')
+    location_event = models.ForeignKey(LocationEvent, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries')
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    delta = models.IntegerField()  # Signed quantity actually applied
+    occurred_at = models.DateTimeField(db_index=True)
+    recorded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['item', 'storage_bin']),
+        ]
+
+    def __str__(self):
+        return f"{self.reason} {self.delta:+d} of item {self.item_id} at bin {self.storage_bin_id}"
 
+class StockOnHand(models.Model):
+    """Materialized on-hand projection of the stock ledger, one row per (item, bin)."""
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='on_hand')
+    storage_bin = models.ForeignKey(StorageBin, on_delete=models.CASCADE, related_name='on_hand')
+    quantity = models.IntegerField(default=0)
+    last_entry_id = models.BigIntegerField(default=0)  # Highest ledger entry folded into quantity
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'storage_bin'], name='unique_stock_on_hand_item_bin'),
+        ]
+
+    def __str__(self):
+        return f"Item {self.item_id} at bin {self.storage_bin_id}: {self.quantity}"
 
+class ProjectionCheckpoint(models.Model):
+    """Progress marker of a streaming projection rebuild, so it can resume after interruption."""
+    name = models.CharField(max_length=100, unique=True)
+    last_entry_id = models.BigIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    def __str__(self):
+        return f"{self.name} @ {self.last_entry_id}"
+
+class StockSnapshot(models.Model):
+    """Checkpoint of on-hand quantities as of a point in time, used to answer 'stock as of T' queries."""
+    as_of = models.DateTimeField(unique=True)
+    recorded_before = models.DateTimeField()  # Lines fold in entries recorded before this; later ones are replayed on top
+    created_at = models.DateTimeField(auto_now_add=True)
 
+    def __str__(self):
+        return f"Stock snapshot as of {self.as_of}"
+
+class StockSnapshotLine(models.Model):
+    snapshot = models.ForeignKey(StockSnapshot, on_delete=models.CASCADE, related_name='lines')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='snapshot_lines')
+    storage_bin = models.ForeignKey(StorageBin, on_delete=models.CASCADE, related_name='snapshot_lines')
+    quantity = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['snapshot', 'item', 'storage_bin'], name='unique_snapshot_line'),
+        ]
+
+    def __str__(self):
+        return f"Item {self.item_id} at bin {self.storage_bin_id}: {self.quantity}"
+
+class InventoryCounter(models.Model):
+    """
+    Running total behind one dashboard metric (see inventory.counters), moved
+    by the write paths so the dashboard never counts whole tables.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    as_of = models.DateField(null=True, blank=True)  # Day a date-dependent counter (expired items) is valid for
+    previous_value = models.BigIntegerField(null=True, blank=True)  # Value at the last daily snapshot
+    previous_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+class InventoryCounterSnapshot(models.Model):
+    """Daily copy of every InventoryCounter, the history behind the dashboard change/trend figures."""
+    day = models.DateField()
+    name = models.CharField(max_length=50)
+    value = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'name'], name='unique_inventory_counter_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} on {self.day}: {self.value}"
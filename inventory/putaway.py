@@ -0,0 +1,158 @@
+import threading
+
+from sortedcontainers import SortedList
+
+from .grid import grid_layout, grid_version
+from .models import StockRecord, StorageBin
+
+
+def _group_keys(bin_type, row):
+    """Sorted lists a bin is filed under: all bins, its type, its row, and its type within its row."""
+    bin_type = (bin_type or '').strip().lower()
+    row = (row or '').strip().upper()
+    return (None, ('type', bin_type), ('row', row), ('type_row', bin_type, row))
+
+
+def _group_key(bin_type=None, row=None):
+    bin_type = (bin_type or '').strip().lower()
+    row = (row or '').strip().upper()
+    if bin_type and row:
+        return ('type_row', bin_type, row)
+    if bin_type:
+        return ('type', bin_type)
+    if row:
+        return ('row', row)
+    return None
+
+
+class FreeCapacityIndex:
+    """
+    In-process index of the free capacity (capacity - used) of every bin, kept
+    as sorted (free, pk) lists, overall and per type and row. The best fitting
+    bin for N units is found by binary search, and moving a bin costs O(log n). Like the aisle/rack grid
+    it is patched from the bins whose grid_version moved since the last refresh
+    and rebuilt when bins are added or removed.
+    """
+
+    def __init__(self):
+        self.layout = None
+        self.version = None
+        self.bins = {}  # pk -> (free, bin_id, row, rack, type)
+        self.sorted = {}  # group key -> SortedList of (free, pk)
+        self._lock = threading.Lock()
+
+    def _load(self, since=None):
+        queryset = StorageBin.objects.all()
+        if since is not None:
+            queryset = queryset.filter(grid_version__gt=since)
+        return queryset.values_list('id', 'bin_id', 'row', 'rack', 'type', 'capacity', 'used')
+
+    def _add(self, pk, bin_id, row, rack, bin_type, capacity, used):
+        free = max(capacity - used, 0)
+        self.bins[pk] = (free, bin_id, row, rack, bin_type)
+        for key in _group_keys(bin_type, row):
+            self.sorted.setdefault(key, SortedList()).add((free, pk))
+
+    def _remove(self, pk):
+        free, _, row, _, bin_type = self.bins.pop(pk)
+        for key in _group_keys(bin_type, row):
+            self.sorted[key].remove((free, pk))
+
+    def refresh(self):
+        started = grid_version()
+        layout = grid_layout()
+        with self._lock:
+            if layout != self.layout or self.version is None:
+                self.bins = {}
+                self.sorted = {}
+                for row in self._load():
+                    self._add(*row)
+            else:
+                for row in self._load(since=self.version):
+                    if row[0] in self.bins:
+                        self._remove(row[0])
+                    self._add(*row)
+            self.layout = layout
+            self.version = started
+
+    def allocate(self, lines, bin_type=None, row=None):
+        """
+        Suggest bins for a whole inbound shipment. ``lines`` are (item_id,
+        quantity) pairs. Bins that already hold the item are preferred. Otherwise
+        the bin with the least free capacity that still takes the remaining
+        quantity is used. When no single bin is big enough, the largest free
+        bins are filled in turn. Capacity given to one line is not offered to the
+        next. Returns, per line, its allocations (bin, free capacity, quantity)
+        and the quantity that could not be placed.
+        """
+        self.refresh()
+        group = _group_key(bin_type, row)
+        holding = {}
+        for item_id, storage_bin_id in StockRecord.objects.filter(
+            item__in={item_id for item_id, _ in lines}, quantity__gt=0, storage_bin__isnull=False
+        ).values_list('item_id', 'storage_bin_id'):
+            holding.setdefault(item_id, set()).add(storage_bin_id)
+
+        reserved = {}
+        results = []
+        with self._lock:
+            entries = self.sorted.get(group, SortedList())
+            for item_id, quantity in lines:
+                allocations = []
+                remaining = quantity
+                held = [
+                    pk for pk in holding.get(item_id, ())
+                    if pk in self.bins and group in _group_keys(self.bins[pk][4], self.bins[pk][2])
+                ]
+                remaining = self._fill(held, remaining, reserved, allocations)
+                while remaining > 0:
+                    pk = self._best_fit(entries, remaining, reserved)
+                    if pk is None:
+                        break
+                    take = min(remaining, self._free(pk, reserved))
+                    allocations.append((pk, take))
+                    reserved[pk] = reserved.get(pk, 0) + take
+                    remaining -= take
+                results.append(([self._describe(pk, take) for pk, take in allocations], remaining))
+        return results
+
+    def _free(self, pk, reserved):
+        return self.bins[pk][0] - reserved.get(pk, 0)
+
+    def _fill(self, candidates, remaining, reserved, allocations):
+        """Place ``remaining`` in the given bins: the tightest one that fits it all, else the largest first."""
+        candidates = [pk for pk in candidates if self._free(pk, reserved) > 0]
+        fitting = [pk for pk in candidates if self._free(pk, reserved) >= remaining]
+        if fitting:
+            candidates = [min(fitting, key=lambda pk: (self._free(pk, reserved), pk))]
+        else:
+            candidates.sort(key=lambda pk: (-self._free(pk, reserved), pk))
+        for pk in candidates:
+            if remaining <= 0:
+                break
+            take = min(remaining, self._free(pk, reserved))
+            allocations.append((pk, take))
+            reserved[pk] = reserved.get(pk, 0) + take
+            remaining -= take
+        return remaining
+
+    def _best_fit(self, entries, quantity, reserved):
+        """The tightest bin taking ``quantity``, else the bin with the most free capacity (None when all are full)."""
+        # Reservations only shrink free capacity, so bins passed over here stay too small for this line
+        for _, pk in entries.irange((quantity, -1)):
+            if self._free(pk, reserved) >= quantity:
+                return pk
+        for _, pk in reversed(entries):
+            if self._free(pk, reserved) > 0:
+                return pk
+        return None
+
+    def _describe(self, pk, quantity):
+        free, bin_id, row, rack, bin_type = self.bins[pk]
+        return {
+            "storage_bin": pk, "bin_id": bin_id, "location": f"{row}-{rack}", "type": bin_type,
+            "free": free, "quantity": quantity,
+        }
+
+
+free_capacity_index = FreeCapacityIndex()
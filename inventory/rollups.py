@@ -0,0 +1,206 @@
+from collections import defaultdict
+from itertools import chain
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Abs, Coalesce, Trunc
+from django.utils import timezone
+
+from .archive import read_archived_events
+from .models import LocationEvent, LocationEventDaily, LocationEventHourly, lock_order
+
+# Finest first; buckets start on local hours and local midnights of the project time zone
+ROLLUPS = (('hour', LocationEventHourly), ('day', LocationEventDaily))
+TOTALS = ('events', 'quantity', 'applied')
+ROLLUP_GROUP_FIELDS = ('storage_bin', 'item', 'event')
+
+
+def truncate(moment, granularity):
+    """Start of the local hour or day holding ``moment``."""
+    local = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        local = local.replace(hour=0)
+    return local
+
+
+def next_boundary(moment, granularity):
+    """Start of the hour or day after the one holding ``moment`` (days may be 23 or 25 hours long)."""
+    step = timedelta(hours=1) if granularity == 'hour' else timedelta(hours=26)
+    return truncate(truncate(moment, granularity).astimezone(dt_timezone.utc) + step, granularity)
+
+
+def ceil(moment, granularity):
+    start = truncate(moment, granularity)
+    return start if start == moment else next_boundary(moment, granularity)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def bump_rollups(movements):
+    """
+    Add applied events to the hourly and daily rollups. ``movements`` are
+    (storage_bin_id, item_id, event, timestamp, quantity, applied) tuples; they
+    are summed per bucket first, so a batch costs one F() UPDATE per touched
+    rollup row. Runs in the transaction that applies the events.
+    """
+    movements = list(movements)
+    for granularity, model in ROLLUPS:
+        totals = defaultdict(lambda: [0, 0, 0])
+        for storage_bin_id, item_id, event, timestamp, quantity, applied in movements:
+            row = totals[(truncate(timestamp, granularity), storage_bin_id, item_id, event)]
+            row[0] += 1
+            row[1] += quantity
+            row[2] += applied
+        for (bucket, storage_bin_id, item_id, event), values in lock_order(totals.items()):
+            rows = model.objects.filter(bucket=bucket, storage_bin_id=storage_bin_id, item_id=item_id, event=event)
+            changes = {name: F(name) + value for name, value in zip(TOTALS, values)}
+            if rows.update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    model.objects.create(
+                        bucket=bucket, storage_bin_id=storage_bin_id, item_id=item_id, event=event,
+                        **dict(zip(TOTALS, values)),
+                    )
+            except IntegrityError:
+                rows.update(**changes)
+
+
+def _archived_totals(start, end, granularity, **filters):
+    """{(bucket, storage_bin_id, item_id, event): [events, quantity, applied]} of the archived events in [start, end)."""
+    totals = defaultdict(lambda: [0, 0, 0])
+    for row in read_archived_events(start, end, **filters):
+        key = (truncate(row['timestamp'], granularity), row['storage_bin_id'], row['item_id'], row['event'])
+        totals[key][0] += 1
+        totals[key][1] += row['quantity']
+        totals[key][2] += row['applied']
+    return totals
+
+
+def rebuild_rollups(first_day, last_day, batch_size=2000):
+    """
+    Recompute both rollups for the local days [first_day, last_day) from the
+    stored and the archived events, in one transaction. Returns the number of
+    (hourly, daily) rows written. Used by the backfill_event_rollups command,
+    one chunk of days per call.
+    """
+    start, end = day_start(first_day), day_start(last_day)
+    events = LocationEvent.objects.filter(timestamp__gte=start, timestamp__lt=end, processed=True)
+    written = []
+    with transaction.atomic():
+        for granularity, model in ROLLUPS:
+            archived = _archived_totals(start, end, granularity)
+            model.objects.filter(bucket__gte=start, bucket__lt=end).delete()
+            rows = (
+                events.annotate(period=Trunc('timestamp', granularity, tzinfo=timezone.get_current_timezone()))
+                .values('period', 'storage_bin_id', 'item_id', 'event')
+                .annotate(
+                    count=Count('id', distinct=True),
+                    total=Sum('quantity'),
+                    moved=Coalesce(Sum(Abs('ledger_entries__delta')), 0),
+                )
+                .order_by()
+            )
+            stored = (
+                ((row['period'], row['storage_bin_id'], row['item_id'], row['event']), [row['count'], row['total'], row['moved']])
+                for row in rows.iterator(chunk_size=batch_size)
+            )
+            batch = []
+            count = 0
+            for key, values in chain(stored, archived.items()):
+                if key in archived and values is not archived[key]:
+                    # Partly archived bucket: folded in here, not written again below
+                    values = [total + extra for total, extra in zip(values, archived.pop(key))]
+                batch.append(model(
+                    bucket=key[0], storage_bin_id=key[1], item_id=key[2], event=key[3], **dict(zip(TOTALS, values)),
+                ))
+                if len(batch) >= batch_size:
+                    model.objects.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+            model.objects.bulk_create(batch)
+            written.append(count + len(batch))
+    return tuple(written)
+
+
+def plan_sources(start, end):
+    """
+    Split [start, end) into (source, start, end) segments read from the
+    coarsest data covering them: daily rollups for whole days, hourly rollups
+    for the whole hours around them and raw events for the minutes at the edges.
+    """
+    if start >= end:
+        return []
+    hours_start, hours_end = ceil(start, 'hour'), truncate(end, 'hour')
+    if hours_start >= hours_end:
+        return [('raw', start, end)]
+    days_start, days_end = ceil(hours_start, 'day'), truncate(hours_end, 'day')
+    segments = [('raw', start, hours_start)]
+    if days_start < days_end:
+        segments += [('hour', hours_start, days_start), ('day', days_start, days_end), ('hour', days_end, hours_end)]
+    else:
+        segments.append(('hour', hours_start, hours_end))
+    segments.append(('raw', hours_end, end))
+    return [segment for segment in segments if segment[1] < segment[2]]
+
+
+def movement_totals(start, end, storage_bin=None, item=None, event=None, group_by=(), interval=None):
+    """
+    Event counts, reported and applied units of the events in [start, end),
+    optionally per storage_bin/item/event and per hour or day ``interval``
+    (an interval can't be finer than the rollups it is read from, so hourly
+    series read hourly rollups instead of daily ones). Raw edges past the
+    retention period are read from the event archive. Returns (rows, segments).
+    """
+    segments = plan_sources(start, end)
+    if interval == 'hour':
+        segments = [('hour' if source == 'day' else source, low, high) for source, low, high in segments]
+    tzinfo = timezone.get_current_timezone()
+    filters = {
+        name: value for name, value in (('storage_bin', storage_bin), ('item', item), ('event', event))
+        if value is not None
+    }
+    combined = defaultdict(lambda: [0, 0, 0])
+    for source, low, high in segments:
+        if source == 'raw':
+            queryset = LocationEvent.objects.filter(timestamp__gte=low, timestamp__lt=high, processed=True, **filters)
+            time_field = 'timestamp'
+            aggregates = {
+                'count': Count('id', distinct=True),
+                'total': Sum('quantity'),
+                'moved': Coalesce(Sum(Abs('ledger_entries__delta')), 0),
+            }
+        else:
+            model = dict(ROLLUPS)[source]
+            queryset = model.objects.filter(bucket__gte=low, bucket__lt=high, **filters)
+            time_field = 'bucket'
+            aggregates = {'count': Sum('events'), 'total': Sum('quantity'), 'moved': Sum('applied')}
+        fields = list(group_by)
+        if interval:
+            queryset = queryset.annotate(period=Trunc(time_field, interval, tzinfo=tzinfo))
+            fields.append('period')
+        for row in queryset.values(*fields).annotate(**aggregates).order_by():
+            key = tuple(row[field] for field in fields)
+            totals = combined[key]
+            totals[0] += row['count'] or 0
+            totals[1] += row['total'] or 0
+            totals[2] += row['moved'] or 0
+        if source == 'raw':
+            # Events past the retention period only remain in the archive
+            for row in read_archived_events(low, high, **filters):
+                row.update(storage_bin=row['storage_bin_id'], item=row['item_id'])
+                if interval:
+                    row['period'] = truncate(row['timestamp'], interval)
+                totals = combined[tuple(row[field] for field in fields)]
+                totals[0] += 1
+                totals[1] += row['quantity']
+                totals[2] += row['applied']
+    fields = list(group_by) + (['period'] if interval else [])
+    rows = [
+        {**dict(zip(fields, key)), **dict(zip(TOTALS, values))}
+        for key, values in sorted(combined.items())
+    ]
+    return rows, segments
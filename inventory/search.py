@@ -0,0 +1,77 @@
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from .models import ItemSearchToken
+
+TOKEN_SIZE = 3
+# Pads the end of every field so 1- and 2-character searches are token prefixes too
+TOKEN_PAD = '\u0003' * (TOKEN_SIZE - 1)
+SEARCH_FIELDS = ('name', 'part_number')
+
+
+def uses_token_index():
+    """PostgreSQL serves icontains from pg_trgm GIN indexes; other databases use the ItemSearchToken table."""
+    return connection.vendor != 'postgresql'
+
+
+def search_tokens(*values):
+    """Distinct lower-cased n-grams of every value, each padded at its end."""
+    tokens = set()
+    for value in values:
+        value = (value or '').lower() + TOKEN_PAD
+        for start in range(len(value) - TOKEN_SIZE + 1):
+            tokens.add(value[start:start + TOKEN_SIZE])
+    return tokens
+
+
+def index_items(items):
+    """(Re)build the search tokens of the given items."""
+    if not uses_token_index():
+        return
+    items = [item for item in items if item.pk is not None]
+    if not items:
+        return
+    with transaction.atomic():
+        ItemSearchToken.objects.filter(item__in=[item.pk for item in items]).delete()
+        ItemSearchToken.objects.bulk_create(
+            [
+                ItemSearchToken(item_id=item.pk, token=token)
+                for item in items
+                for token in search_tokens(*(getattr(item, field) for field in SEARCH_FIELDS))
+            ],
+            batch_size=5000,
+        )
+
+
+def _matching_item_ids(term):
+    """Ids of items holding every n-gram of ``term`` - a superset of the real matches."""
+    term = term.lower()
+    if len(term) < TOKEN_SIZE:
+        tokens = ItemSearchToken.objects.filter(token__startswith=term)
+        return tokens.values('item_id').distinct()
+    grams = {term[start:start + TOKEN_SIZE] for start in range(len(term) - TOKEN_SIZE + 1)}
+    return (
+        ItemSearchToken.objects.filter(token__in=grams)
+        .values('item_id')
+        .annotate(matched=Count('token'))
+        .filter(matched=len(grams))
+        .values('item_id')
+    )
+
+
+def search_items(queryset, term, fields=SEARCH_FIELDS, prefix=''):
+    """
+    Narrow ``queryset`` to rows whose item has ``term`` as a case-insensitive
+    substring of one of ``fields``. ``prefix`` is the lookup path to the item
+    ('item__' for stock records). Candidates come from an index (pg_trgm or the
+    n-gram table); the icontains re-check only runs on those candidates.
+    """
+    term = term.strip()
+    if not term:
+        return queryset
+    matches = Q()
+    for field in fields:
+        matches |= Q(**{f"{prefix}{field}__icontains": term})
+    if uses_token_index():
+        queryset = queryset.filter(**{f"{prefix}pk__in": _matching_item_ids(term)})
+    return queryset.filter(matches)
@@ -1,7 +1,9 @@
 from datetime import datetime
 from django.utils import timezone
 from rest_framework import serializers
-from .models import StorageBin, Item, StockRecord, LocationEvent, ExpiryTrackedItem
+from .custom_fields import invalid_custom_fields
+from .models import CustomFieldKey, StorageBin, Item, StockRecord, LocationEvent, ExpiryTrackedItem, make_location_key, make_name_key
+from .services import resolve_items, resolve_storage_bins
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,6 +20,26 @@ class ItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'quantity', 'part_number', 'manufacturer', 'contact', 'batch', 'expiry_date', 'custom_fields', 'user', 'created_at']
         read_only_fields = ['user']
 
+    def validate_custom_fields(self, value):
+        errors = invalid_custom_fields(value)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return value
+
+class CustomFieldKeySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CustomFieldKey
+        fields = ['id', 'key', 'value_type', 'label', 'created_at']
+        read_only_fields = ['created_at']
+
+    def validate(self, data):
+        # Renaming or retyping a key would orphan its index; declare a new key instead
+        if self.instance is not None:
+            for field in ('key', 'value_type'):
+                if field in data and data[field] != getattr(self.instance, field):
+                    raise serializers.ValidationError({field: "Cannot be changed once declared."})
+        return data
+
 class StockRecordSerializer(serializers.ModelSerializer):
     item_name = serializers.CharField(source='item.name', read_only=True)
     storage_bin_id = serializers.CharField(source='storage_bin.bin_id', read_only=True, allow_null=True)
@@ -33,22 +55,29 @@ class LocationEventSerializer(serializers.ModelSerializer):
     item_name = serializers.CharField(write_only=True)
     quantity = serializers.IntegerField(min_value=1, required=True)
     timestamp = serializers.CharField(required=False)
+    # Declared explicitly so duplicates are reported per event instead of failing validation
+    client_event_id = serializers.CharField(max_length=100, required=False, allow_null=True, allow_blank=True)
 
     class Meta:
         model = LocationEvent
-        fields = ['location', 'item_name', 'event', 'quantity', 'timestamp']
+        fields = ['location', 'item_name', 'event', 'quantity', 'timestamp', 'client_event_id']
         extra_kwargs = {
             'timestamp': {'required': False},
         }
 
     def validate_item_name(self, value):
         logger.debug(f"[LocationEventSerializer] Validating item_name: {value}")
-        try:
-            item = Item.objects.get(name__iexact=value)
-            logger.debug(f"[LocationEventSerializer] Found Item: {item.name}")
-            return item
-        except Item.DoesNotExist:
+        if isinstance(value, Item):
+            return value
+        # Batch ingestion pre-resolves every referenced item in one query
+        resolved_items = self.context.get('resolved_items')
+        if resolved_items is None:
+            resolved_items = resolve_items([value])
+        item = resolved_items.get(make_name_key(value))
+        if item is None:
             raise serializers.ValidationError(f"No Item found with name: {value}")
+        logger.debug(f"[LocationEventSerializer] Found Item: {item.name}")
+        return item
 
     def validate_location(self, value):
         logger.debug(f"[LocationEventSerializer] Validating location: value={value}, type={type(value)}")
@@ -74,9 +103,14 @@ class LocationEventSerializer(serializers.ModelSerializer):
             row, rack = parts
             row, rack = row.strip(), rack.strip()
             logger.debug(f"[LocationEventSerializer] Split location: row={row}, rack={rack}")
-            
-            # Find the storage bin by row and rack
-            storage_bin = StorageBin.objects.get(row__iexact=row, rack__iexact=rack)
+
+            # Find the storage bin by row and rack (batch ingestion pre-resolves every referenced bin)
+            resolved_bins = self.context.get('resolved_bins')
+            if resolved_bins is None:
+                resolved_bins = resolve_storage_bins([(row, rack)])
+            storage_bin = resolved_bins.get(make_location_key(row, rack))
+            if storage_bin is None:
+                raise StorageBin.DoesNotExist
             logger.debug(f"[LocationEventSerializer] Found StorageBin: {storage_bin.bin_id}")
             return storage_bin
         except ValueError as e:
@@ -108,6 +142,10 @@ class LocationEventSerializer(serializers.ModelSerializer):
                     "Timestamp must be in 'DD/MM/YYYY HH:MM:SS' or ISO 8601 format"
                 )
 
+    def validate_client_event_id(self, value):
+        value = (value or '').strip()
+        return value or None
+
     def validate(self, data):
         logger.debug(f"[LocationEventSerializer] Validating data: {data}")
         data['item'] = self.validate_item_name(data.get('item_name'))
@@ -119,4 +157,13 @@ class ExpiryTrackedItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = ExpiryTrackedItem
         fields = ['id', 'name', 'batch', 'quantity', 'expiry_date', 'user']
-        read_only_fields = ['user']
\ No newline at end of file
+        read_only_fields = ['user']
+
+class PutawayLineSerializer(serializers.Serializer):
+    item = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+class PutawayRequestSerializer(serializers.Serializer):
+    lines = PutawayLineSerializer(many=True, allow_empty=False)
+    type = serializers.CharField(required=False, allow_blank=True)
+    row = serializers.CharField(required=False, allow_blank=True)
@@ -0,0 +1,415 @@
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .cache import item_cache, storage_bin_cache
+from .counters import ACTIVE_STOCK_RECORDS, bump_counters
+from .models import (
+    LocationEvent, Item, PendingIoTEvent, StockLedgerEntry, StockOnHand, StockRecord, StorageBin,
+    lock_order, make_grid_version, make_location_key, make_name_key,
+)
+from .rollups import bump_rollups
+
+
+def normalize_location(value):
+    """Split an 'Aisle-Rack' location (e.g. 'a1 – r02') into an upper-cased (row, rack) pair."""
+    if not isinstance(value, str):
+        return None
+    value = value.replace('–', '-').replace('—', '-').strip().upper()
+    if '-' not in value:
+        return None
+    row, rack = value.split('-', 1)
+    return row.strip(), rack.strip()
+
+
+def resolve_storage_bins(locations):
+    """
+    Map (row, rack) pairs to StorageBins through the resolution cache, fetching
+    all misses with a single indexed location_key query. Keys of the result are
+    location keys (make_location_key).
+    """
+    keys = {make_location_key(row, rack) for row, rack in locations}
+    found = storage_bin_cache.get_many(keys)
+    missing = keys - found.keys()
+    if missing:
+        for storage_bin in StorageBin.objects.filter(location_key__in=missing).order_by('id'):
+            if storage_bin.location_key not in found:
+                found[storage_bin.location_key] = storage_bin
+                storage_bin_cache.set(storage_bin.location_key, storage_bin)
+    return found
+
+
+def resolve_items(names):
+    """
+    Map item names to Items through the resolution cache, fetching all misses
+    with a single indexed name_key query. Keys of the result are name keys
+    (make_name_key).
+    """
+    keys = {make_name_key(name) for name in names}
+    found = item_cache.get_many(keys)
+    missing = keys - found.keys()
+    if missing:
+        for item in Item.objects.filter(name_key__in=missing).order_by('id'):
+            if item.name_key not in found:
+                found[item.name_key] = item
+                item_cache.set(item.name_key, item)
+    return found
+
+
+def resolve_iot_references(payloads):
+    """
+    Resolve every StorageBin and Item referenced by a batch of raw IoT payloads.
+    Returns (bins, items) keyed by location key and name key, the way
+    LocationEventSerializer looks them up.
+    """
+    locations = set()
+    names = set()
+    for payload in payloads:
+        if not isinstance(payload, dict):
+            continue
+        location = normalize_location(payload.get('location'))
+        if location:
+            locations.add(location)
+        name = payload.get('item_name')
+        if isinstance(name, str):
+            names.add(name)
+    return resolve_storage_bins(locations), resolve_items(names)
+
+
+def replay_stock_movements(quantity, movements):
+    """
+    Apply (event, quantity) movements one by one to an on-hand quantity.
+    Removals are capped by what is on hand, so stock never goes below zero.
+    Returns the resulting quantity and the quantity actually applied per movement.
+    """
+    applied = []
+    for event, amount in movements:
+        if event == 'item_removed':
+            amount = min(amount, max(quantity, 0))
+            quantity -= amount
+        else:
+            quantity += amount
+        applied.append(amount)
+    return quantity, applied
+
+
+def _no_clamp_threshold(movements):
+    """
+    Smallest starting quantity for which no removal in ``movements`` gets capped
+    (None when there are no removals), together with the net signed delta.
+    """
+    net = 0
+    threshold = None
+    for event, amount in movements:
+        if event == 'item_removed':
+            net -= amount
+            threshold = max(threshold or 0, -net)
+        else:
+            net += amount
+    return threshold, net
+
+
+def apply_stock_movements(item, storage_bin, movements, defaults=None):
+    """
+    Apply a sequence of (event, quantity) movements for one (item, bin) pair
+    without read-modify-write in Python and without row locks held by us.
+
+    The common case is a single conditional UPDATE that adds the net delta
+    with an F() expression, guarded so it only matches when no removal would
+    be capped and the quantity stays positive. Otherwise the current quantity is read and written back with a
+    compare-and-swap UPDATE, retried until no concurrent writer interfered.
+    Only the quantity columns are written, and the bin's 'used' moves by the
+    same delta. Returns the applied quantity per movement and the net change
+    of the stock record.
+    """
+    threshold, net = _no_clamp_threshold(movements)
+    records = StockRecord.objects.filter(item=item, storage_bin=storage_bin)
+    # Stock that starts or ends at zero goes through the CAS path, which sees both
+    # values, so the fast path never changes the active-stock counter
+    fast_path = records.filter(quantity__gte=max(threshold or 0, 1 - net, 1))
+
+    with transaction.atomic():
+        if fast_path.update(quantity=F('quantity') + net):
+            applied = [amount for _, amount in movements]
+            delta = net
+        else:
+            record, _ = StockRecord.objects.get_or_create(
+                item=item, storage_bin=storage_bin, defaults={'quantity': 0, **(defaults or {})}
+            )
+            current = record.quantity
+            while True:
+                quantity, applied = replay_stock_movements(current, movements)
+                if quantity == current or records.filter(quantity=current).update(quantity=quantity):
+                    break
+                current = records.values_list('quantity', flat=True).get()
+            delta = quantity - current
+            bump_counters({ACTIVE_STOCK_RECORDS: (quantity > 0) - (current > 0)})
+
+        if delta:
+            Item.objects.filter(pk=item.pk).update(quantity=Greatest(F('quantity') + delta, 0))
+            adjust_bin_usage(storage_bin.pk, delta)
+    return applied, delta
+
+
+def adjust_bin_usage(storage_bin_id, delta):
+    """Move StorageBin.used by ``delta`` in a single UPDATE (clamped at zero) instead of re-summing the bin."""
+    if storage_bin_id is not None and delta:
+        StorageBin.objects.filter(pk=storage_bin_id).update(
+            used=Greatest(F('used') + delta, 0), grid_version=make_grid_version()
+        )
+
+
+def record_stock_ledger(entries):
+    """
+    Append unsaved StockLedgerEntry instances (zero deltas are dropped) and fold
+    them into the StockOnHand projection. Returns the saved entries.
+    """
+    entries = StockLedgerEntry.objects.bulk_create([entry for entry in entries if entry.delta])
+    deltas = {}
+    for entry in entries:
+        key = (entry.item_id, entry.storage_bin_id)
+        delta, last_entry_id = deltas.get(key, (0, 0))
+        deltas[key] = (delta + entry.delta, max(last_entry_id, entry.id or 0))
+    bump_on_hand(deltas)
+    return entries
+
+
+def record_stock_adjustment(item_id, storage_bin_id, delta):
+    """Ledger a stock change that did not come from a location event (manual edits, deletions)."""
+    if storage_bin_id is None or not delta:
+        return
+    record_stock_ledger([
+        StockLedgerEntry(
+            item_id=item_id, storage_bin_id=storage_bin_id, reason='adjustment',
+            delta=delta, occurred_at=timezone.now(),
+        )
+    ])
+
+
+def bump_on_hand(deltas):
+    """
+    Add ``{(item_id, bin_id): (delta, last_entry_id)}`` to the StockOnHand
+    projection with one F() UPDATE per pair, creating missing rows.
+    """
+    for (item_id, storage_bin_id), (delta, last_entry_id) in lock_order(deltas.items()):
+        rows = StockOnHand.objects.filter(item_id=item_id, storage_bin_id=storage_bin_id)
+        changes = {'quantity': F('quantity') + delta, 'last_entry_id': Greatest(F('last_entry_id'), last_entry_id)}
+        if rows.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                StockOnHand.objects.create(
+                    item_id=item_id, storage_bin_id=storage_bin_id, quantity=delta, last_entry_id=last_entry_id
+                )
+        except IntegrityError:
+            rows.update(**changes)
+
+
+def _known_client_event_ids(model, events):
+    """Map the client event ids carried by ``events`` that ``model`` already stores to the stored row ids."""
+    client_ids = {data['client_event_id'] for data in events if data.get('client_event_id')}
+    if not client_ids:
+        return {}
+    return dict(model.objects.filter(client_event_id__in=client_ids).values_list('client_event_id', 'id'))
+
+
+def _retry_on_client_id_race(apply, events):
+    """
+    Run ``apply(events)`` and retry it once if a concurrent request stored one of
+    the same client event ids first - the retry then reports it as a duplicate.
+    """
+    try:
+        return apply(events)
+    except IntegrityError:
+        if not any(data.get('client_event_id') for data in events):
+            raise
+        return apply(events)
+
+
+def apply_iot_events(events):
+    """
+    Apply a batch of validated IoT events in a single transaction.
+
+    ``events`` is a list of LocationEventSerializer.validated_data dicts. Every
+    event is stored as an already-processed LocationEvent, the movements of
+    each (item, bin) pair are applied together through apply_stock_movements
+    and what was actually applied is appended to the stock ledger. Events whose
+    client_event_id was already stored (or repeats an earlier event of the
+    batch) are not applied again and come back with ``duplicate`` set.
+    Returns one result dict per event, in input order.
+    """
+    if not events:
+        return []
+    return _retry_on_client_id_race(_apply_iot_events, events)
+
+
+def _apply_iot_events(events):
+    with transaction.atomic():
+        event_ids = {}  # client_event_id -> LocationEvent id
+        event_ids.update(_known_client_event_ids(LocationEvent, events))
+        fresh = []
+        duplicates = []
+        for index, data in enumerate(events):
+            client_event_id = data.get('client_event_id')
+            if client_event_id and client_event_id in event_ids:
+                duplicates.append(index)
+                continue
+            if client_event_id:
+                event_ids[client_event_id] = None  # filled in once the first occurrence is stored
+            fresh.append(index)
+
+        event_objs = LocationEvent.objects.bulk_create([
+            LocationEvent(
+                storage_bin=events[index]['storage_bin'],
+                item=events[index]['item'],
+                event=events[index]['event'],
+                quantity=events[index]['quantity'],
+                timestamp=events[index]['timestamp'],
+                client_event_id=events[index].get('client_event_id'),
+                processed=True,
+            )
+            for index in fresh
+        ])
+        for event_obj in event_objs:
+            if event_obj.client_event_id:
+                event_ids[event_obj.client_event_id] = event_obj.id
+
+        movements_by_pair = defaultdict(list)
+        for index in fresh:
+            data = events[index]
+            movements_by_pair[(data['item'].pk, data['storage_bin'].pk)].append(index)
+
+        applied = [0] * len(events)
+        for pair in lock_order(movements_by_pair):
+            indexes = movements_by_pair[pair]
+            first = events[indexes[0]]
+            storage_bin = first['storage_bin']
+            pair_applied, _ = apply_stock_movements(
+                first['item'],
+                storage_bin,
+                [(events[index]['event'], events[index]['quantity']) for index in indexes],
+                defaults={'location': f"{storage_bin.row}-{storage_bin.rack}", 'user': None},
+            )
+            for index, amount in zip(indexes, pair_applied):
+                applied[index] = amount
+
+        record_stock_ledger([
+            StockLedgerEntry(
+                item_id=events[index]['item'].pk,
+                storage_bin_id=events[index]['storage_bin'].pk,
+                location_event=event_obj,
+                reason=events[index]['event'],
+                delta=applied[index] if events[index]['event'] == 'item_added' else -applied[index],
+                occurred_at=events[index]['timestamp'],
+            )
+            for index, event_obj in zip(fresh, event_objs)
+        ])
+        bump_rollups(
+            (
+                events[index]['storage_bin'].pk, events[index]['item'].pk, events[index]['event'],
+                events[index]['timestamp'], events[index]['quantity'], applied[index],
+            )
+            for index in fresh
+        )
+
+        # Bins may come from the resolution cache, so their 'used' is read back
+        used = dict(
+            StorageBin.objects.filter(pk__in={data['storage_bin'].pk for data in events}).values_list('pk', 'used')
+        )
+
+    stored_ids = dict(zip(fresh, (event_obj.id for event_obj in event_objs)))
+    results = []
+    for index, data in enumerate(events):
+        storage_bin = data['storage_bin']
+        result = {
+            "message": "Event processed successfully",
+            "event_id": stored_ids.get(index),
+            "location": f"{storage_bin.row}-{storage_bin.rack}",
+            "item": data['item'].name,
+            "quantity": applied[index],
+            "bin_used_capacity": used[storage_bin.pk],
+        }
+        if index not in stored_ids:
+            result.update(message="Duplicate event ignored", event_id=event_ids[data['client_event_id']], duplicate=True)
+        results.append(result)
+    return results
+
+
+def enqueue_iot_events(events):
+    """
+    Append validated IoT events to the durable write-behind buffer. Returns the
+    buffered row per event, or None where the client_event_id is already
+    buffered, already applied, or repeats an earlier event of the batch.
+    """
+    if not events:
+        return []
+    return _retry_on_client_id_race(_enqueue_iot_events, events)
+
+
+def _enqueue_iot_events(events):
+    with transaction.atomic():
+        seen = set(_known_client_event_ids(PendingIoTEvent, events))
+        seen.update(_known_client_event_ids(LocationEvent, events))
+        rows = []
+        for data in events:
+            client_event_id = data.get('client_event_id')
+            if client_event_id and client_event_id in seen:
+                rows.append(None)
+                continue
+            if client_event_id:
+                seen.add(client_event_id)
+            rows.append(PendingIoTEvent(
+                storage_bin=data['storage_bin'],
+                item=data['item'],
+                event=data['event'],
+                quantity=data['quantity'],
+                timestamp=data['timestamp'],
+                client_event_id=client_event_id,
+            ))
+        PendingIoTEvent.objects.bulk_create([row for row in rows if row is not None])
+    return rows
+
+
+def drain_pending_iot_events(batch_size=5000):
+    """
+    Move up to ``batch_size`` buffered IoT events into LocationEvent/StockRecord/Item
+    in one transaction. Events against the same (item, bin) are coalesced into a
+    single stock record write by apply_iot_events. Concurrent workers skip rows
+    another worker has already claimed. Returns the number of events drained.
+    """
+    with transaction.atomic():
+        pending = list(
+            PendingIoTEvent.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('storage_bin', 'item')
+            .order_by('id')[:batch_size]
+        )
+        if not pending:
+            return 0
+        apply_iot_events([
+            {
+                'storage_bin': row.storage_bin,
+                'item': row.item,
+                'event': row.event,
+                'quantity': row.quantity,
+                'timestamp': row.timestamp,
+                'client_event_id': row.client_event_id,
+            }
+            for row in pending
+        ])
+        PendingIoTEvent.objects.filter(pk__in=[row.pk for row in pending]).delete()
+    return len(pending)
+
+
+def spawn_worker_pool(workers):
+    """
+    Process pool for CPU-bound batch work (import validation, rollup rebuilds).
+    Workers are spawned rather than forked, so they start without the parent's
+    database connections, and each sets Django up before its first task.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup)
@@ -0,0 +1,96 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cache import item_cache, storage_bin_cache
+from .counters import ACTIVE_STOCK_RECORDS, ITEMS, STOCK_RECORDS, STORAGE_BINS, bump_counters, bump_expired_items
+from .custom_fields import create_key_index, drop_key_index, index_custom_fields
+from .models import CustomFieldKey, StorageBin, Item, StockRecord
+from .search import SEARCH_FIELDS, index_items
+from .services import adjust_bin_usage, record_stock_adjustment
+
+@receiver(post_save, sender=StorageBin)
+@receiver(post_delete, sender=StorageBin)
+def invalidate_storage_bin_cache(sender, instance, **kwargs):
+    # 'used' is not part of the cached identity, so usage refreshes keep the entry
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'used', 'grid_version'}:
+        return
+    storage_bin_cache.invalidate(instance.pk)
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_item_cache(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'quantity'}:
+        return
+    item_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Item)
+def index_item_search_tokens(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not set(SEARCH_FIELDS) & set(update_fields):
+        return
+    index_items([instance])
+
+
+@receiver(post_save, sender=Item)
+def index_item_custom_fields(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'custom_fields' not in update_fields:
+        return
+    index_custom_fields([instance])
+
+
+@receiver(post_save, sender=CustomFieldKey)
+def index_custom_field_key(sender, instance, created, **kwargs):
+    # Only a new key needs its index built; rebuild_custom_field_index redoes existing ones
+    if created:
+        create_key_index(instance)
+
+
+@receiver(post_delete, sender=CustomFieldKey)
+def unindex_custom_field_key(sender, instance, **kwargs):
+    drop_key_index(instance)
+
+
+@receiver(post_save, sender=StorageBin)
+@receiver(post_delete, sender=StorageBin)
+def count_storage_bins(sender, instance, created=False, **kwargs):
+    if created or kwargs['signal'] is post_delete:
+        bump_counters({STORAGE_BINS: 1 if created else -1})
+
+
+@receiver(post_save, sender=Item)
+def count_saved_item(sender, instance, created, **kwargs):
+    if created:
+        bump_counters({ITEMS: 1})
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or 'expiry_date' in update_fields:
+        expiry_date = Item._meta.get_field('expiry_date').to_python(instance.expiry_date)
+        bump_expired_items(getattr(instance, '_stored_expiry_date', None), expiry_date)
+        instance._stored_expiry_date = expiry_date
+
+
+@receiver(post_delete, sender=Item)
+def count_deleted_item(sender, instance, **kwargs):
+    bump_counters({ITEMS: -1})
+    expiry_date = Item._meta.get_field('expiry_date').to_python(instance.expiry_date)
+    bump_expired_items(expiry_date, None)
+
+
+@receiver(post_save, sender=StockRecord)
+def count_created_stock_record(sender, instance, created, **kwargs):
+    # Positive quantities are counted by StockRecord.save() and the stock movement paths
+    if created:
+        bump_counters({STOCK_RECORDS: 1})
+
+
+@receiver(post_delete, sender=StockRecord)
+def release_stock_record(sender, instance, **kwargs):
+    bump_counters({STOCK_RECORDS: -1, ACTIVE_STOCK_RECORDS: -1 if instance.quantity > 0 else 0})
+    adjust_bin_usage(instance.storage_bin_id, -instance.quantity)
+    # When the item itself is being deleted its ledger goes with it
+    origin = kwargs.get('origin')
+    if isinstance(origin, Item) or getattr(origin, 'model', None) is Item:
+        return
+    record_stock_adjustment(instance.item_id, instance.storage_bin_id, -instance.quantity)
@@ -1,3 +1,390 @@
-from django.test import TestCase
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest import mock, skipIf
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import ApiKey, User
+from . import archive
+from .cache import iot_debouncer, item_cache, storage_bin_cache
+from .consumers import IoTEventConsumer
+from .grid import OccupancyGrid
+from .models import Item, LocationEvent, LocationEventDaily, StockRecord, StorageBin
+from .rollups import movement_totals, rebuild_rollups
+from .services import adjust_bin_usage, apply_iot_events, apply_stock_movements, replay_stock_movements
+
+try:
+    from channels.testing import WebsocketCommunicator
+except ImportError:  # channels.testing needs daphne
+    WebsocketCommunicator = None
+
+
+def make_bin_and_item(user, quantity=0):
+    storage_bin = StorageBin.objects.create(
+        user=user, bin_id='BIN-A1-R02', row='A1', rack='R02', shelf='1', type='Pallet', capacity=1000000
+    )
+    item = Item.objects.create(
+        user=user, name='Widget', quantity=quantity, part_number='W-1', manufacturer='Acme',
+        contact='acme@example.com', batch='B1', expiry_date=date(2030, 1, 1)
+    )
+    return storage_bin, item
+
+
+class StockMovementTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('stock@example.com', 'pw', name='Stock')
+        self.storage_bin, self.item = make_bin_and_item(self.user)
+
+    def test_replay_caps_removals_at_zero(self):
+        quantity, applied = replay_stock_movements(3, [('item_removed', 5), ('item_added', 2), ('item_removed', 1)])
+        self.assertEqual(quantity, 1)
+        self.assertEqual(applied, [3, 2, 1])
+
+    def test_fast_path_is_a_single_update(self):
+        apply_stock_movements(self.item, self.storage_bin, [('item_added', 10)])
+        with self.assertNumQueries(5):  # savepoint, stock, item and bin updates, release
+            applied, delta = apply_stock_movements(self.item, self.storage_bin, [('item_removed', 4), ('item_added', 1)])
+        self.assertEqual((applied, delta), ([4, 1], -3))
+        self.assertEqual(StockRecord.objects.get().quantity, 7)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 7)
+        self.storage_bin.refresh_from_db()
+        self.assertEqual(self.storage_bin.used, 7)
+
+    def test_removal_beyond_stock_is_clamped(self):
+        apply_stock_movements(self.item, self.storage_bin, [('item_added', 2)])
+        applied, delta = apply_stock_movements(self.item, self.storage_bin, [('item_removed', 5)])
+        self.assertEqual((applied, delta), ([2], -2))
+        self.assertEqual(StockRecord.objects.get().quantity, 0)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 0)
+
+    def test_location_event_save_applies_once(self):
+        event = LocationEvent.objects.create(
+            storage_bin=self.storage_bin, item=self.item, event='item_added', quantity=3, timestamp='2025-01-01T00:00:00Z'
+        )
+        event.save()
+        self.assertTrue(event.processed)
+        self.assertEqual(StockRecord.objects.get().quantity, 3)
+        self.storage_bin.refresh_from_db()
+        self.assertEqual(self.storage_bin.used, 3)
+
+
+class BinUsageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('usage@example.com', 'pw', name='Usage')
+        self.storage_bin, self.item = make_bin_and_item(self.user)
+
+    def test_stock_record_changes_move_bin_usage(self):
+        other_bin = StorageBin.objects.create(
+            user=self.user, bin_id='BIN-A2-R01', row='A2', rack='R01', shelf='1', type='Pallet', capacity=100
+        )
+        record = StockRecord.objects.create(item=self.item, storage_bin=self.storage_bin, quantity=5)
+        record.quantity = 8
+        record.save()
+        self.storage_bin.refresh_from_db()
+        self.assertEqual(self.storage_bin.used, 8)
+
+        record.storage_bin = other_bin
+        record.save()
+        self.storage_bin.refresh_from_db()
+        other_bin.refresh_from_db()
+        self.assertEqual((self.storage_bin.used, other_bin.used), (0, 8))
+
+        record.delete()
+        other_bin.refresh_from_db()
+        self.assertEqual(other_bin.used, 0)
+
+    def test_reconcile_corrects_drift(self):
+        StockRecord.objects.create(item=self.item, storage_bin=self.storage_bin, quantity=5)
+        StorageBin.objects.filter(pk=self.storage_bin.pk).update(used=42)
+        call_command('reconcile_bin_usage', '--dry-run', stdout=StringIO())
+        self.storage_bin.refresh_from_db()
+        self.assertEqual(self.storage_bin.used, 42)
+        call_command('reconcile_bin_usage', stdout=StringIO())
+        self.storage_bin.refresh_from_db()
+        self.assertEqual(self.storage_bin.used, 5)
+
+
+class OccupancyGridTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('grid@example.com', 'pw', name='Grid')
+        self.storage_bin, self.item = make_bin_and_item(self.user)
+        self.grid = OccupancyGrid()
+
+    def test_delta_carries_changes_committed_after_the_last_read(self):
+        grid = self.grid.read()
+        self.assertEqual(self.grid.read(since=grid['version'], layout=grid['layout'])['cells'], [])
+
+        # Marked before the read below but, like a late commit, only versioned by it
+        adjust_bin_usage(self.storage_bin.pk, 7)
+        delta = self.grid.read(since=grid['version'], layout=grid['layout'])
+        self.assertGreater(delta['version'], grid['version'])
+        self.assertEqual([(cell[1], cell[5]) for cell in delta['cells']], [('BIN-A1-R02', 7)])
+        self.assertEqual(self.grid.read(since=delta['version'], layout=delta['layout'])['cells'], [])
+
+
+class EventArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('archive@example.com', 'pw', name='Archive')
+        self.storage_bin, self.item = make_bin_and_item(self.user)
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        self.day = timezone.localdate() - timedelta(days=40)
+        self.start = timezone.make_aware(datetime.combine(self.day, time.min)) + timedelta(minutes=5)
+        apply_iot_events([
+            {'storage_bin': self.storage_bin, 'item': self.item, 'event': 'item_added', 'quantity': 2,
+             'timestamp': self.start + timedelta(minutes=minute)}
+            for minute in range(5)
+        ])
+
+    def totals(self):
+        rows, segments = movement_totals(self.start, self.start + timedelta(minutes=30))
+        self.assertEqual([source for source, _, _ in segments], ['raw'])
+        return rows[0]['events'], rows[0]['quantity'], rows[0]['applied']
+
+    def archive(self, batch_size=1000):
+        return list(archive.archive_events(before=timezone.now(), batch_size=batch_size, root=self.root.name))
+
+    def test_crash_between_write_and_delete_counts_events_once(self):
+        write = archive._archive_batch
+
+        def write_then_crash(ids, root):
+            write(ids, root)
+            raise RuntimeError("worker killed")
+
+        with self.settings(LOCATION_EVENT_ARCHIVE_DIR=self.root.name):
+            with mock.patch('inventory.archive._archive_batch', write_then_crash), self.assertRaises(RuntimeError):
+                self.archive()
+            self.assertEqual(LocationEvent.objects.count(), 5)
+            self.assertEqual(len(archive.archive_files(self.day)), 1)
+            self.assertEqual(self.totals(), (5, 10, 10))
+            rebuild_rollups(self.day, self.day + timedelta(days=1))
+            self.assertEqual(LocationEventDaily.objects.get().events, 5)
+
+            # The next run archives the events again, here into files overlapping the first
+            self.archive(batch_size=3)
+            self.assertFalse(LocationEvent.objects.exists())
+            self.assertEqual(len(archive.archive_files(self.day)), 3)
+            end = self.start + timedelta(days=1)
+            self.assertEqual(len(list(archive.read_archived_events(self.start, end))), 5)
+            self.assertEqual(self.totals(), (5, 10, 10))
+            rebuild_rollups(self.day, self.day + timedelta(days=1))
+            self.assertEqual(LocationEventDaily.objects.get().events, 5)
+
+
+@override_settings(IOT_DEBOUNCE_WINDOW=60)
+class IoTDebounceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader@example.com', 'pw', name='Reader')
+        self.storage_bin, self.item = make_bin_and_item(self.user)
+        self.url = f"/api/inventory/iot-event/?api_key={ApiKey.objects.create(user=self.user, name='Reader').key}"
+        self.event = {'location': 'A1-R02', 'item_name': 'Widget', 'event': 'item_added', 'quantity': 2}
+        self.client = APIClient()
+        iot_debouncer.clear()
+
+    def post(self, body):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, body, format='json')
+
+    def test_retry_after_failed_apply_is_processed(self):
+        with mock.patch('inventory.views.apply_iot_events', side_effect=RuntimeError("database went away")):
+            self.assertEqual(self.post(self.event).status_code, 400)
+        self.assertEqual(self.post(self.event).json()['quantity'], 2)
+        self.assertTrue(self.post(self.event).json()['debounced'])
+        self.assertEqual(StockRecord.objects.get().quantity, 2)
+
+    def test_batch_retry_after_failed_apply_is_processed(self):
+        with mock.patch('inventory.ingest.apply_iot_events', side_effect=RuntimeError("database went away")):
+            self.assertEqual(self.post([self.event, self.event]).status_code, 400)
+        results = self.post([self.event, self.event]).json()['results']
+        self.assertEqual([result['status'] for result in results], ['processed', 'debounced'])
+        self.assertEqual(StockRecord.objects.get().quantity, 2)
+
+
+class StockMovementConcurrencyTests(TransactionTestCase):
+    threads = 8
+    rounds = 25
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Concurrent writers need a file-backed or server database")
+        self.user = User.objects.create_user('stress@example.com', 'pw', name='Stress')
+        self.storage_bin, self.item = make_bin_and_item(self.user)
+
+    def run_threads(self, target):
+        errors = []
+
+        def worker(thread_index):
+            try:
+                for round_index in range(self.rounds):
+                    target(thread_index, round_index)
+            except Exception as e:  # surfaced in the main thread below
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_deltas_are_exact(self):
+        apply_stock_movements(self.item, self.storage_bin, [('item_added', 10000)])
+
+        def move(thread_index, round_index):
+            apply_stock_movements(self.item, self.storage_bin, [('item_added', 3), ('item_removed', 1)])
+            LocationEvent.objects.create(
+                storage_bin=self.storage_bin, item=self.item, event='item_removed', quantity=1,
+                timestamp='2025-01-01T00:00:00Z'
+            )
+
+        self.run_threads(move)
+
+        expected = 10000 + self.threads * self.rounds * (3 - 1 - 1)
+        self.assertEqual(StockRecord.objects.get().quantity, expected)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, expected)
+        self.storage_bin.refresh_from_db()
+        self.assertEqual(self.storage_bin.used, expected)
+
+    def test_concurrent_removals_never_oversell(self):
+        apply_stock_movements(self.item, self.storage_bin, [('item_added', 100)])
+        removed = []
+
+        def remove(thread_index, round_index):
+            applied, _ = apply_stock_movements(self.item, self.storage_bin, [('item_removed', 1)])
+            removed.append(applied[0])
+
+        self.run_threads(remove)
+
+        self.assertEqual(sum(removed), 100)
+        self.assertEqual(StockRecord.objects.get().quantity, 0)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 0)
+
+
+@skipIf(WebsocketCommunicator is None, "channels.testing is not available")
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    IOT_WS_BATCH_SIZE=100,
+    IOT_WS_BATCH_WINDOW=0.01,
+    IOT_WS_MAX_PENDING=200,
+)
+class IoTWebSocketLoadTests(TransactionTestCase):
+    frames = 1000
+    events_per_frame = 3
+
+    def setUp(self):
+        self.user = User.objects.create_user('gateway@example.com', 'pw', name='Gateway')
+        self.storage_bin, self.item = make_bin_and_item(self.user)
+        # Sized so the whole stream fits in one burst; the load is what is tested here
+        self.api_key = ApiKey.objects.create(user=self.user, name='Gateway', burst_limit=self.frames * self.events_per_frame + 1)
+
+    def tearDown(self):
+        # The tables are flushed between tests, so resolved ids must not carry over
+        storage_bin_cache.clear()
+        item_cache.clear()
+
+    def communicator(self, api_key=None):
+        return WebsocketCommunicator(IoTEventConsumer.as_asgi(), f"/ws/iot/?api_key={api_key or self.api_key.key}")
+
+    def test_rejects_unknown_api_key(self):
+        async def run():
+            communicator = self.communicator(api_key='not-a-key')
+            connected, _ = await communicator.connect()
+            self.assertFalse(connected)
+
+        async_to_sync(run)()
+
+    def test_frames_over_the_rate_are_not_applied(self):
+        api_key = ApiKey.objects.create(user=self.user, name='Slow gateway', burst_limit=3, rate_limit=0.001)
+        event = {'location': 'A1-R02', 'item_name': 'Widget', 'event': 'item_added', 'quantity': 1}
+
+        async def run():
+            communicator = self.communicator(api_key=api_key.key)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.receive_json_from()
+            await communicator.send_json_to({'seq': 1, 'events': [event] * 3})
+            await communicator.send_json_to({'seq': 2, 'events': [event]})
+            messages = [await communicator.receive_json_from(timeout=5) for _ in range(2)]
+            await communicator.disconnect()
+            return messages
+
+        messages = {message['type']: message for message in async_to_sync(run)()}
+        self.assertEqual((messages['ack']['seq'], messages['throttled']['seq']), (1, 2))
+        self.assertGreater(messages['throttled']['retry_after'], 0)
+        self.assertEqual(StockRecord.objects.get().quantity, 3)
+
+    def test_revoked_key_closes_the_connection(self):
+        event = {'seq': 1, 'location': 'A1-R02', 'item_name': 'Widget', 'event': 'item_added', 'quantity': 1}
+
+        def revoke():
+            self.api_key.is_active = False
+            self.api_key.save()
+
+        async def run():
+            communicator = self.communicator()
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.receive_json_from()
+            await database_sync_to_async(revoke)()
+            await communicator.send_json_to(event)
+            message = await communicator.receive_json_from()
+            closed = await communicator.receive_output()
+            await communicator.disconnect()
+            return message, closed
+
+        message, closed = async_to_sync(run)()
+        self.assertEqual(message['error'], 'API key is no longer valid')
+        self.assertEqual(closed, {'type': 'websocket.close', 'code': 4401})
+        self.assertFalse(StockRecord.objects.exists())
+
+    def test_stream_is_applied_in_batches_and_acknowledged(self):
+        event = {'location': 'A1-R02', 'item_name': 'Widget', 'event': 'item_added', 'quantity': 1}
+
+        async def run():
+            communicator = self.communicator()
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            self.assertEqual((await communicator.receive_json_from())['type'], 'connected')
+
+            # The gateway writes without waiting for acks; the consumer has to push back
+            for seq in range(1, self.frames + 1):
+                await communicator.send_json_to({'seq': seq, 'events': [event] * self.events_per_frame})
+            await communicator.send_json_to({'seq': self.frames + 1, 'location': 'Z9-R99', 'item_name': 'Widget', 'event': 'item_added', 'quantity': 1})
+
+            acks = []
+            paused = False
+            while not acks or acks[-1]['seq'] < self.frames + 1:
+                message = await communicator.receive_json_from(timeout=30)
+                if message['type'] == 'backpressure':
+                    paused = paused or message['paused']
+                else:
+                    self.assertEqual(message['type'], 'ack', message)
+                    acks.append(message)
+            await communicator.disconnect()
+            return acks, paused
+
+        acks, paused = async_to_sync(run)()
+
+        self.assertTrue(paused)
+        self.assertEqual([ack['seq'] for ack in acks], sorted({ack['seq'] for ack in acks}))
+        self.assertLess(len(acks), self.frames)  # Frames were grouped into micro-batches
+        self.assertEqual(sum(ack['processed'] for ack in acks), self.frames * self.events_per_frame)
+        self.assertEqual([error['seq'] for ack in acks for error in ack['errors']], [self.frames + 1])
+        expected = self.frames * self.events_per_frame
+        self.assertEqual(StockRecord.objects.get().quantity, expected)
+        self.storage_bin.refresh_from_db()
+        self.assertEqual(self.storage_bin.used, expected)
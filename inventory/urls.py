@@ -1,24 +1,43 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
+from . import consumers
 from rest_framework.routers import DefaultRouter
 from .views import (
     StorageBinViewSet,
     ItemViewSet,
+    CustomFieldKeyViewSet,
     StockRecordViewSet,
     ExpiryTrackedItemViewSet,
     ExpiredItemListView,
+    ExpiryHorizonView,
+    AisleRackDashboardView,
+    PutawayView,
     InventoryMetricsView,
+    InventoryImportView,
     IoTEventView,
+    StockAsOfView,
+    MovementRollupView,
 )
 
 router = DefaultRouter()
 router.register('bins', StorageBinViewSet, basename='bins')
 router.register('items', ItemViewSet, basename='items')
+router.register('custom-field-keys', CustomFieldKeyViewSet, basename='custom-field-keys')
 router.register('stocks', StockRecordViewSet, basename='stocks')
 router.register('expiry-tracked-items', ExpiryTrackedItemViewSet, basename='expiry-tracked-items')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('expiries/', ExpiredItemListView.as_view()),
+    path('expiry-horizon/', ExpiryHorizonView.as_view(), name='expiry-horizon'),
+    path('aisle-rack-dashboard/', AisleRackDashboardView.as_view(), name='aisle-rack-dashboard'),
+    path('putaway/', PutawayView.as_view(), name='putaway'),
     path('metrics/', InventoryMetricsView.as_view(), name='inventory-metrics'),
     path('iot-event/', IoTEventView.as_view(), name='iot-event'),
-]
\ No newline at end of file
+    path('import/<str:kind>/', InventoryImportView.as_view(), name='inventory-import'),
+    path('stock-as-of/', StockAsOfView.as_view(), name='stock-as-of'),
+    path('movements/', MovementRollupView.as_view(), name='movements'),
+]
+
+websocket_urlpatterns = [
+    re_path(r'^ws/iot/$', consumers.IoTEventConsumer.as_asgi()),
+]
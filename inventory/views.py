@@ -1,83 +1,230 @@
-from datetime import date
+from datetime import date, datetime, time
 from django.shortcuts import render
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import FormParser, MultiPartParser
 from django.db.models import Q
-from rest_framework.pagination import PageNumberPagination
-from django.db import transaction
+from core.exports import export_format, stream_export
+from core.pagination import StandardResultsSetPagination
+from django.conf import settings
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.settings import api_settings
 import logging
 
-from .serializers import StorageBinSerializer, ItemSerializer, StockRecordSerializer, ExpiryTrackedItemSerializer, LocationEventSerializer
+from .serializers import StorageBinSerializer, ItemSerializer, StockRecordSerializer, ExpiryTrackedItemSerializer, LocationEventSerializer, CustomFieldKeySerializer, PutawayRequestSerializer
+from accounts.permission_engine import check_permission
 from accounts.permissions import APIKeyPermission
-from .models import LocationEvent, Item, StockRecord, StorageBin  # Import models directly
+from accounts.throttling import ApiKeyRateThrottle
+from .models import CustomFieldKey, LocationEvent, Item, StockRecord, StorageBin  # Import models directly
+from .parsers import NDJSONParser
+from .custom_fields import QUERY_PREFIX, filter_custom_fields, indexed_keys, order_by_custom_field
+from .counters import (
+    ACTIVE_STOCK_RECORDS, EXPIRED_ITEMS, ITEMS, STOCK_RECORDS, STORAGE_BINS, describe_change, read_counters,
+)
+from .expiry import expiry_horizon
+from .grid import occupancy_grid
+from .history import stock_as_of
+from .putaway import free_capacity_index
+from .rollups import ROLLUP_GROUP_FIELDS, movement_totals
+from .imports import IMPORT_KINDS, ImportFileError, InventoryImporter
+from .search import search_items
+from .ingest import accepted_result, debounced_result, duplicate_result, ingest_iot_batch, is_repeated_read, record_admitted_reads
+from .services import apply_iot_events, enqueue_iot_events
 
 logger = logging.getLogger(__name__)
 
-ROLE_LEVELS = {
-    'staff': 1,
-    'finance_manager': 2,
-    'operations_manager': 3,
-    'md': 4,
-    'admin': 99,
-}
-
-def get_user_role_level(user):
-    return ROLE_LEVELS.get(user.role, 0)
-
-def get_page_required_level(page):
-    from accounts.models import PagePermission
-    perm = PagePermission.objects.filter(page_name=page).first()
-    if not perm:
-        return 1
-    return ROLE_LEVELS.get(perm.min_role, 1)
-
-def get_action_required_level(action_name: str) -> int:
-    from accounts.models import ActionPermission
-    try:
-        perm = ActionPermission.objects.get(action_name=action_name)
-        return ROLE_LEVELS.get(perm.min_role, 1)
-    except ActionPermission.DoesNotExist:
-        return 1
-
-def check_permission(user, page=None, action=None):
-    user_level = get_user_role_level(user)
-    if page:
-        required = get_page_required_level(page)
-        if user_level < required:
-            raise PermissionDenied(f"Access denied: {page} requires role level {required}")
-    if action:
-        required = get_action_required_level(action)
-        if user_level < required:
-            raise PermissionDenied(f"Access denied: {action} requires role level {required}")
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
 class InventoryMetricsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         check_permission(request.user, page="inventory_metrics")
         search = request.query_params.get('search', '').strip()
-        total_items = Item.objects.filter(Q(name__icontains=search) | Q(part_number__icontains=search)).count() if search else Item.objects.count()
-        total_stocks = StockRecord.objects.filter(Q(item__name__icontains=search)).count() if search else StockRecord.objects.count()
-        total_bin_locations = StorageBin.objects.count()
-        total_active_rentals = StockRecord.objects.filter(quantity__gt=0).count()
-        total_expired_items = Item.objects.filter(expiry_date__lte=date.today()).count()
+        counters = read_counters()
+
+        def metric(metric_id, title, name):
+            counter = counters[name]
+            change, trend = describe_change(counter.value, counter.previous_value)
+            return {"id": metric_id, "title": title, "value": counter.value, "change": change, "trend": trend}
+
         data = [
-            {"id": 1, "title": "Total Items", "value": total_items, "change": "+0%", "trend": "neutral"},
-            {"id": 2, "title": "Total Bin Locations", "value": total_bin_locations, "change": "+0%", "trend": "neutral"},
-            {"id": 3, "title": "Total Active Rentals", "value": total_active_rentals, "change": "+0%", "trend": "neutral"},
-            {"id": 4, "title": "Total Expired Items", "value": total_expired_items, "change": "+0%", "trend": "neutral"},
-            {"id": 5, "title": "Total Stocks", "value": total_stocks, "change": "+0%", "trend": "neutral"},
+            metric(1, "Total Items", ITEMS),
+            metric(2, "Total Bin Locations", STORAGE_BINS),
+            metric(3, "Total Active Rentals", ACTIVE_STOCK_RECORDS),
+            metric(4, "Total Expired Items", EXPIRED_ITEMS),
+            metric(5, "Total Stocks", STOCK_RECORDS),
         ]
+        if search:
+            # Searched totals have no history, so they are counted live through the search index
+            data[0].update(value=search_items(Item.objects.all(), search).count(), change="+0%", trend="neutral")
+            data[4].update(
+                value=search_items(StockRecord.objects.all(), search, fields=('name',), prefix='item__').count(),
+                change="+0%", trend="neutral",
+            )
         return Response(data)
 
+class ExpiryHorizonView(APIView):
+    """Item and expiry-tracked item counts/quantities bucketed as expired, within 7, 30 and 90 days."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        check_permission(request.user, page="expired_items")
+        today = timezone.localdate()
+        return Response({"as_of": today, "buckets": expiry_horizon(today)})
+
+class AisleRackDashboardView(APIView):
+    """
+    Row x rack occupancy grid of the storage bins. Pass the returned version and
+    layout back (?since=<version>&layout=<layout>) to receive only changed cells.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        check_permission(request.user, page="aisle_rack_dashboard")
+        since = request.query_params.get('since')
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response({"error": "since must be a version number"}, status=400)
+        return Response(occupancy_grid.read(since=since, layout=request.query_params.get('layout')))
+
+class PutawayView(APIView):
+    """
+    Suggest bins for inbound stock: {"lines": [{"item": 1, "quantity": 40}, ...],
+    "type": optional bin type, "row": optional aisle}. Nothing is reserved.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        check_permission(request.user, page="storage_bins")
+        serializer = PutawayRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"error": serializer.errors}, status=400)
+        data = serializer.validated_data
+        lines = [(line['item'], line['quantity']) for line in data['lines']]
+        names = dict(Item.objects.filter(pk__in={item_id for item_id, _ in lines}).values_list('pk', 'name'))
+        unknown = sorted({item_id for item_id, _ in lines} - names.keys())
+        if unknown:
+            return Response({"error": f"Unknown items: {unknown}"}, status=400)
+
+        suggestions = free_capacity_index.allocate(lines, bin_type=data.get('type'), row=data.get('row'))
+        return Response({
+            "results": [
+                {
+                    "item": item_id,
+                    "item_name": names[item_id],
+                    "quantity": quantity,
+                    "allocations": allocations,
+                    "unallocated": unallocated,
+                }
+                for (item_id, quantity), (allocations, unallocated) in zip(lines, suggestions)
+            ]
+        })
+
+class StockAsOfView(APIView):
+    """On-hand quantity per item and bin at an arbitrary point in time (?at=2025-09-30 or ISO 8601 timestamp)."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def parse_at(self, value):
+        at = parse_datetime(value)
+        if at is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            # A bare date means the end of that day, e.g. month-end stock
+            at = datetime.combine(day, time.max)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        return at
+
+    def get(self, request):
+        check_permission(request.user, page="stock_records")
+        at = self.parse_at(request.query_params.get('at', '').strip())
+        if at is None:
+            return Response({"error": "Query parameter 'at' must be a date (YYYY-MM-DD) or an ISO 8601 timestamp"}, status=400)
+        try:
+            item_id = int(request.query_params['item']) if request.query_params.get('item') else None
+            storage_bin_id = int(request.query_params['bin']) if request.query_params.get('bin') else None
+        except ValueError:
+            return Response({"error": "'item' and 'bin' must be numeric ids"}, status=400)
+
+        quantities, snapshot, replayed = stock_as_of(at, item_id=item_id, storage_bin_id=storage_bin_id)
+        items = Item.objects.in_bulk({key[0] for key in quantities})
+        bins = StorageBin.objects.in_bulk({key[1] for key in quantities})
+        results = []
+        for (row_item_id, row_bin_id), quantity in sorted(quantities.items()):
+            item = items.get(row_item_id)
+            storage_bin = bins.get(row_bin_id)
+            results.append({
+                "item_id": row_item_id,
+                "item_name": item.name if item else None,
+                "storage_bin": row_bin_id,
+                "storage_bin_id": storage_bin.bin_id if storage_bin else None,
+                "location": f"{storage_bin.row}-{storage_bin.rack}" if storage_bin else None,
+                "quantity": quantity,
+            })
+        return Response({
+            "as_of": at,
+            "snapshot": snapshot.as_of if snapshot else None,
+            "replayed_entries": replayed,
+            "results": results,
+        })
+
+class MovementRollupView(APIView):
+    """
+    Movement analytics over [start, end) (?start=2025-09-01&end=2025-10-01, dates or ISO 8601 timestamps),
+    optionally narrowed by ?bin=, ?item= and ?event= and split by ?group_by=storage_bin,item,event and
+    ?interval=hour|day. Whole days are read from the daily rollups, whole hours from the hourly ones.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def parse_bound(self, value):
+        at = parse_datetime(value)
+        if at is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            at = datetime.combine(day, time.min)  # A bare date means the start of that day
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        return at
+
+    def get(self, request):
+        check_permission(request.user, page="stock_records")
+        start = self.parse_bound(request.query_params.get('start', '').strip())
+        end = self.parse_bound(request.query_params.get('end', '').strip())
+        if start is None or end is None or start >= end:
+            return Response({"error": "'start' and 'end' must be dates or ISO 8601 timestamps, start before end"}, status=400)
+        try:
+            item_id = int(request.query_params['item']) if request.query_params.get('item') else None
+            storage_bin_id = int(request.query_params['bin']) if request.query_params.get('bin') else None
+        except ValueError:
+            return Response({"error": "'item' and 'bin' must be numeric ids"}, status=400)
+        event = request.query_params.get('event') or None
+        if event is not None and event not in dict(LocationEvent.EVENT_CHOICES):
+            return Response({"error": f"'event' must be one of {', '.join(dict(LocationEvent.EVENT_CHOICES))}"}, status=400)
+        group_by = [field.strip() for field in request.query_params.get('group_by', '').split(',') if field.strip()]
+        if any(field not in ROLLUP_GROUP_FIELDS for field in group_by):
+            return Response({"error": f"'group_by' may only list {', '.join(ROLLUP_GROUP_FIELDS)}"}, status=400)
+        interval = request.query_params.get('interval') or None
+        if interval not in (None, 'hour', 'day'):
+            return Response({"error": "'interval' must be 'hour' or 'day'"}, status=400)
+
+        rows, segments = movement_totals(
+            start, end, storage_bin=storage_bin_id, item=item_id, event=event,
+            group_by=list(dict.fromkeys(group_by)), interval=interval,
+        )
+        return Response({
+            "start": start,
+            "end": end,
+            "sources": [{"source": source, "start": low, "end": high} for source, low, high in segments],
+            "results": rows,
+        })
+
 class StorageBinViewSet(viewsets.ModelViewSet):
     serializer_class = StorageBinSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -91,6 +238,16 @@ class StorageBinViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(Q(bin_id__icontains=search) | Q(description__icontains=search))
         return queryset
 
+    # Streams every matching row (same ?search= as the list) as CSV or NDJSON
+    export_columns = {
+        'id': 'id', 'bin_id': 'bin_id', 'row': 'row', 'rack': 'rack', 'shelf': 'shelf', 'type': 'type',
+        'capacity': 'capacity', 'used': 'used', 'description': 'description',
+    }
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        return stream_export(self.get_queryset(), self.export_columns, 'storage_bins', export_format(request))
+
     def perform_create(self, serializer):
         check_permission(self.request.user, action="create_storage_bin")
         serializer.save(user=self.request.user)
@@ -110,11 +267,9 @@ class ExpiredItemListView(APIView):
     def get(self, request):
         check_permission(request.user, page="expired_items")
         search = request.query_params.get('search', '').strip()
-        queryset = Item.objects.filter(expiry_date__lte=date.today()).order_by('-created_at')
-        if search:
-            queryset = queryset.filter(Q(name__icontains=search) | Q(part_number__icontains=search))
+        queryset = search_items(Item.objects.filter(expiry_date__lte=date.today()).order_by('-created_at'), search)
         paginator = self.pagination_class()
-        page = paginator.paginate_queryset(queryset, request)
+        page = paginator.paginate_queryset(queryset, request, view=self)
         serializer = ItemSerializer(page, many=True)
         return paginator.get_paginated_response(serializer.data)
 
@@ -128,9 +283,34 @@ class ItemViewSet(viewsets.ModelViewSet):
         queryset = Item.objects.all().order_by('-id')
         search = self.request.query_params.get('search', '').strip()
         if search:
-            queryset = queryset.filter(Q(name__icontains=search) | Q(part_number__icontains=search))
+            queryset = search_items(queryset, search)
+        return self.filter_custom_fields(queryset)
+
+    def filter_custom_fields(self, queryset):
+        # ?cf__<key>[__gt|gte|lt|lte]=value and ?ordering=[-]cf__<key>, on indexed keys only
+        params = self.request.query_params
+        ordering = params.get('ordering', '')
+        if not ordering.lstrip('-').startswith(QUERY_PREFIX) and not any(name.startswith(QUERY_PREFIX) for name in params):
+            return queryset
+        keys = indexed_keys()
+        try:
+            queryset = filter_custom_fields(queryset, params, keys)
+            if ordering.lstrip('-').startswith(QUERY_PREFIX):
+                queryset = order_by_custom_field(queryset, ordering, keys)
+        except ValueError as e:
+            raise ValidationError({"error": str(e)})
         return queryset
 
+    export_columns = {
+        'id': 'id', 'name': 'name', 'quantity': 'quantity', 'part_number': 'part_number',
+        'manufacturer': 'manufacturer', 'contact': 'contact', 'batch': 'batch', 'expiry_date': 'expiry_date',
+        'custom_fields': 'custom_fields', 'created_at': 'created_at',
+    }
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        return stream_export(self.get_queryset(), self.export_columns, 'items', export_format(request))
+
     def perform_create(self, serializer):
         check_permission(self.request.user, action="create_item")
         serializer.save(user=self.request.user)
@@ -143,6 +323,28 @@ class ItemViewSet(viewsets.ModelViewSet):
         check_permission(self.request.user, action="delete_item")
         instance.delete()
 
+class CustomFieldKeyViewSet(viewsets.ModelViewSet):
+    """Declares which Item.custom_fields keys are indexed for filtering and ordering."""
+    serializer_class = CustomFieldKeySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+
+    def get_queryset(self):
+        check_permission(self.request.user, page="items")
+        return CustomFieldKey.objects.all().order_by('key')
+
+    def perform_create(self, serializer):
+        check_permission(self.request.user, action="create_custom_field_key")
+        serializer.save()
+
+    def perform_update(self, serializer):
+        check_permission(self.request.user, action="update_custom_field_key")
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        check_permission(self.request.user, action="delete_custom_field_key")
+        instance.delete()
+
 class StockRecordViewSet(viewsets.ModelViewSet):
     serializer_class = StockRecordSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -153,7 +355,7 @@ class StockRecordViewSet(viewsets.ModelViewSet):
         queryset = StockRecord.objects.select_related('item').order_by('-created_at')
         search = self.request.query_params.get('search', '').strip()
         if search:
-            queryset = queryset.filter(Q(item__name__icontains=search))
+            queryset = search_items(queryset, search, fields=('name',), prefix='item__')
         return queryset
 
     def list(self, request, *args, **kwargs):
@@ -165,25 +367,27 @@ class StockRecordViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    export_columns = {
+        'id': 'id', 'item': 'item_id', 'item_name': 'item__name', 'part_number': 'item__part_number',
+        'storage_bin': 'storage_bin_id', 'storage_bin_id': 'storage_bin__bin_id', 'location': 'location',
+        'quantity': 'quantity', 'critical': 'critical', 'created_at': 'created_at',
+    }
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        return stream_export(self.get_queryset(), self.export_columns, 'stock_records', export_format(request))
+
+    # StockRecord.save() and the post_delete signal keep StorageBin.used current
     def perform_create(self, serializer):
         check_permission(self.request.user, action="create_stock_record")
-        stock_record = serializer.save(user=self.request.user)
-
-        if stock_record.storage_bin:
-            stock_record.storage_bin.update_used()
+        serializer.save(user=self.request.user)
 
     def perform_update(self, serializer):
         check_permission(self.request.user, action="update_stock_record")
-        old_record = self.get_object()
-        new_record = serializer.save(user=self.request.user)
-
-        if new_record.storage_bin:
-            new_record.storage_bin.update_used()
+        serializer.save(user=self.request.user)
 
     def perform_destroy(self, instance):
         check_permission(self.request.user, action="delete_stock_record")
-        if instance.storage_bin:
-            instance.storage_bin.update_used()
         instance.delete()
 
 class ExpiryTrackedItemViewSet(viewsets.ModelViewSet):
@@ -214,94 +418,136 @@ class ExpiryTrackedItemViewSet(viewsets.ModelViewSet):
         check_permission(self.request.user, action="delete_expiry_tracked_item")
         instance.delete()
 
+class InventoryImportView(APIView):
+    """Bulk upsert of items, bins or stock records from an uploaded CSV/XLSX file (form field 'file')."""
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+    required_actions = {
+        'items': ("create_item", "update_item"),
+        'bins': ("create_storage_bin", "update_storage_bin"),
+        'stock_records': ("create_stock_record", "update_stock_record"),
+    }
+
+    def post(self, request, kind):
+        if kind not in self.required_actions:
+            return Response({"error": f"Unknown import type '{kind}', expected one of: {', '.join(IMPORT_KINDS)}"}, status=404)
+        # Checked once for the whole file instead of once per row
+        for action in self.required_actions[kind]:
+            check_permission(request.user, action=action)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "Upload the file to import in the 'file' field"}, status=400)
+
+        # Validated in this process: the worker pool is for the import_inventory command
+        importer = InventoryImporter(kind, request.user, chunk_size=getattr(settings, 'IMPORT_CHUNK_SIZE', 2000))
+        try:
+            result = importer.run(upload.file, upload.name)
+        except ImportFileError as e:
+            return Response({"error": str(e)}, status=400)
+        except Exception as e:
+            logger.error(f"[InventoryImportView] Error importing {kind}: {str(e)}")
+            return Response({"error": str(e)}, status=400)
+
+        imported = result['created'] + result['updated']
+        logger.info(f"[InventoryImportView] {kind} import by {request.user}: {result['created']} created, {result['updated']} updated, {result['failed']} failed")
+        if not imported and result['failed']:
+            status_code = 400
+        elif result['failed']:
+            status_code = 207
+        else:
+            status_code = 200
+        return Response(result, status=status_code)
+
 class IoTEventView(APIView):
     permission_classes = [APIKeyPermission]
-    
-    def process_iot_event(self, data):
+    throttle_classes = [ApiKeyRateThrottle]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, NDJSONParser]
+
+    def wants_async(self, request):
+        """Async mode is requested with ?mode=async or a 'Prefer: respond-async' header"""
+        return (
+            request.query_params.get('mode') == 'async'
+            or 'respond-async' in request.headers.get('Prefer', '')
+        )
+
+    def process_iot_event(self, data, async_mode=False):
         """Process IoT event data and return response data or error"""
         serializer = LocationEventSerializer(data=data)
         if not serializer.is_valid():
             logger.error(f"[IoTEventView] Invalid IoT event payload: {serializer.errors}")
             return None, serializer.errors
-        
-        storage_bin = serializer.validated_data['storage_bin']
-        item = serializer.validated_data['item']
-        event = serializer.validated_data['event']
-        quantity = serializer.validated_data['quantity']
-        timestamp = serializer.validated_data.get('timestamp', timezone.now())
-        
+
+        validated = dict(serializer.validated_data)
+        validated.setdefault('timestamp', timezone.now())
+        admitted = {}
+        if is_repeated_read(validated, admitted):
+            return debounced_result(validated), None
+
         try:
-            with transaction.atomic():
-                # Create the LocationEvent
-                event_obj = LocationEvent.objects.create(
-                    storage_bin=storage_bin,
-                    item=item,
-                    event=event,
-                    quantity=quantity,
-                    timestamp=timestamp,
-                    processed=True  # Mark as processed immediately
-                )
-                
-                # Find or create StockRecord for this item and bin
-                stock_record, created = StockRecord.objects.get_or_create(
-                    item=item,
-                    storage_bin=storage_bin,
-                    defaults={
-                        'quantity': 0,
-                        'location': f"{storage_bin.row}-{storage_bin.rack}",
-                        'user': None
-                    }
-                )
-                
-                # Update stock record based on event
-                if event == 'item_added':
-                    stock_record.quantity += quantity
-                    item.quantity += quantity
-                elif event == 'item_removed':
-                    # Ensure we don't remove more than available
-                    if stock_record.quantity < quantity:
-                        quantity = stock_record.quantity  # Only remove what's available
-                    stock_record.quantity -= quantity
-                    item.quantity = max(0, item.quantity - quantity)
-                
-                # Save changes
-                stock_record.save()
-                item.save()
-                
-                # Refresh the storage_bin to get updated used value
-                storage_bin.refresh_from_db()
-                
-                logger.info(f"[IoTEventView] IoT event processed: {event} at {storage_bin.bin_id} for {item.name}, quantity: {quantity}")
-                
-                return {
-                    "message": "Event processed successfully",
-                    "event_id": event_obj.id,
-                    "location": f"{storage_bin.row}-{storage_bin.rack}",
-                    "item": item.name,
-                    "quantity": quantity,
-                    "bin_used_capacity": storage_bin.used
-                }, None
-                
+            if async_mode:
+                pending = enqueue_iot_events([validated])[0]
+                record_admitted_reads(admitted)
+                return (accepted_result(pending) if pending else duplicate_result(validated)), None
+            result = apply_iot_events([validated])[0]
+            record_admitted_reads(admitted)
         except Exception as e:
             logger.error(f"[IoTEventView] Error processing IoT event: {str(e)}")
             return None, {"error": str(e)}
 
+        logger.info(f"[IoTEventView] IoT event processed: {validated['event']} at {result['location']} for {result['item']}, quantity: {result['quantity']}")
+        return result, None
+
+    def process_iot_batch(self, payloads, async_mode=False):
+        """Validate a whole batch of IoT events, apply (or buffer) the valid ones together and report per event"""
+        max_events = getattr(settings, 'IOT_BATCH_MAX_EVENTS', 1000)
+        if not payloads:
+            return Response({"error": "Batch must contain at least one event"}, status=400)
+        if len(payloads) > max_events:
+            return Response({"error": f"Batch too large: {len(payloads)} events, maximum is {max_events}"}, status=400)
+
+        try:
+            results, suppressed = ingest_iot_batch(payloads, async_mode=async_mode)
+        except Exception as e:
+            logger.error(f"[IoTEventView] Error processing IoT batch: {str(e)}")
+            return Response({"error": str(e)}, status=400)
+
+        failed = sum(1 for result in results if result['status'] == 'invalid')
+        processed = len(payloads) - failed
+        logger.info(f"[IoTEventView] IoT batch {'accepted' if async_mode else 'processed'}: {processed} valid, {suppressed} suppressed, {failed} rejected")
+        if not processed:
+            status_code = 400
+        elif failed:
+            status_code = 207
+        else:
+            status_code = 202 if async_mode else 200
+        return Response({"processed": processed, "suppressed": suppressed, "failed": failed, "results": results}, status=status_code)
+
     def get(self, request):
         data = {
             'location': request.query_params.get('location'),
             'item_name': request.query_params.get('item_name'),
             'event': request.query_params.get('event'),
             'quantity': request.query_params.get('quantity'),
-            'timestamp': request.query_params.get('timestamp')
+            'timestamp': request.query_params.get('timestamp'),
+            'client_event_id': request.query_params.get('client_event_id') or request.headers.get('Idempotency-Key'),
         }
         
-        response_data, error = self.process_iot_event(data)
+        async_mode = self.wants_async(request)
+        response_data, error = self.process_iot_event(data, async_mode=async_mode)
         if error:
             return Response(error, status=400)
-        return Response(response_data, status=200)
+        return Response(response_data, status=202 if async_mode else 200)
 
     def post(self, request):
-        response_data, error = self.process_iot_event(request.data)
+        async_mode = self.wants_async(request)
+        # A JSON array or an NDJSON body is a batch of events
+        if isinstance(request.data, list):
+            return self.process_iot_batch(request.data, async_mode=async_mode)
+        data = request.data
+        if request.headers.get('Idempotency-Key') and hasattr(data, 'get') and not data.get('client_event_id'):
+            data = data.copy()
+            data['client_event_id'] = request.headers['Idempotency-Key']
+        response_data, error = self.process_iot_event(data, async_mode=async_mode)
         if error:
             return Response(error, status=400)
-        return Response(response_data, status=200)
\ No newline at end of file
+        return Response(response_data, status=202 if async_mode else 200)
\ No newline at end of file
@@ -11,15 +11,10 @@ from .serializers import (
     VendorSerializer,
 )
 from accounts.permissions import DynamicPermission
-from rest_framework.pagination import PageNumberPagination
+from core.pagination import StandardResultsSetPagination
 from django.db.models import Q
 from django.utils import timezone
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
 class RequisitionViewSet(viewsets.ModelViewSet):
     queryset = Requisition.objects.all()
     serializer_class = RequisitionSerializer
@@ -1,16 +1,11 @@
 # product_documentation/views.py
 from rest_framework import viewsets, permissions
-from rest_framework.pagination import PageNumberPagination
+from core.pagination import StandardResultsSetPagination
 from django.db.models import Q
 from .models import ProductInflow, ProductOutflow
 from .serializers import ProductInflowSerializer, ProductOutflowSerializer
 from accounts.permissions import HasMinimumRole
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
 class ProductInflowViewSet(viewsets.ModelViewSet):
     queryset = ProductInflow.objects.all()
     serializer_class = ProductInflowSerializer
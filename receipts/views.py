@@ -1,17 +1,12 @@
 # receipts/views.py
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
+from core.pagination import StandardResultsSetPagination
 from django.db.models import Q
 from .models import Receipt, StockReceipt, SigningReceipt
 from .serializers import ReceiptSerializer, StockReceiptSerializer, SigningReceiptSerializer
 from accounts.permissions import DynamicPermission
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
 class ReceiptViewSet(ModelViewSet):
     queryset = Receipt.objects.all()
     serializer_class = ReceiptSerializer
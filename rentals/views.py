@@ -1,16 +1,11 @@
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
+from core.pagination import StandardResultsSetPagination
 from django.db.models import Q
 from .models import Equipment, Rental, RentalPayment
 from .serializers import EquipmentSerializer, RentalSerializer, RentalPaymentSerializer
 from accounts.permissions import DynamicPermission
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
 class EquipmentViewSet(ModelViewSet):
     queryset = Equipment.objects.all()
     serializer_class = EquipmentSerializer
@@ -1,7 +1,7 @@
 from django.shortcuts import render
 from django.db.models import Q
 from rest_framework import generics, permissions, viewsets
-from rest_framework.pagination import PageNumberPagination
+from core.pagination import StandardResultsSetPagination
 from rest_framework.permissions import IsAuthenticated
 
 from .models import BrandAsset, ERPIntegration, CompanyBranding, Tracker, Announcement
@@ -43,12 +43,6 @@ class TrackerListCreateView(generics.ListCreateAPIView):
         serializer.save(created_by=self.request.user)
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-
 class CompanyBrandingViewSet(viewsets.ModelViewSet):
     queryset = CompanyBranding.objects.all()
     serializer_class = CompanyBrandingSerializer
@@ -1,45 +1,14 @@
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
 from django.db.models import Q
-from rest_framework.pagination import PageNumberPagination
+from core.exports import export_format, stream_export
+from core.pagination import StandardResultsSetPagination
 from .models import WarehouseItem
 from .serializers import WarehouseItemSerializer, ItemSerializer
 from inventory.models import Item
-from accounts.models import PagePermission, ActionPermission, ROLE_LEVELS
+from accounts.permission_engine import check_permission
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-def get_user_role_level(user):
-    return ROLE_LEVELS.get(user.role.lower(), 0)
-
-def get_page_required_level(page):
-    perm = PagePermission.objects.filter(page_name=page).first()
-    return ROLE_LEVELS.get(perm.min_role.lower(), 1) if perm else 1
-
-def get_action_required_level(action_name: str) -> int:
-    try:
-        perm = ActionPermission.objects.get(action_name=action_name)
-        return ROLE_LEVELS.get(perm.min_role.lower(), 1)
-    except ActionPermission.DoesNotExist:
-        return 1
-
-def check_permission(user, page=None, action=None):
-    if not user.is_authenticated:
-        raise PermissionDenied("User not authenticated")
-    user_level = get_user_role_level(user)
-    if page:
-        required = get_page_required_level(page)
-        if user_level < required:
-            raise PermissionDenied(f"Access denied: {page} requires role level {required}")
-    if action:
-        required = get_action_required_level(action)
-        if user_level < required:
-            raise PermissionDenied(f"Access denied: {action} requires role level {required}")
 
 class WarehouseItemViewSet(viewsets.ModelViewSet):
     serializer_class = WarehouseItemSerializer
@@ -61,6 +30,12 @@ class WarehouseItemViewSet(viewsets.ModelViewSet):
             )
         return queryset
 
+    export_columns = {
+        'id': 'id', 'item': 'item_id', 'item_name': 'item__name', 'part_number': 'item__part_number',
+        'storage_bin': 'storage_bin_id', 'storage_bin_id': 'storage_bin__bin_id', 'quantity': 'quantity',
+        'status': 'status', 'last_updated': 'last_updated',
+    }
+
     def perform_create(self, serializer):
         check_permission(self.request.user, action="create_warehouse_item")
         instance = serializer.save()
@@ -81,6 +56,10 @@ class WarehouseItemViewSet(viewsets.ModelViewSet):
         instance.item.save()
         instance.delete()
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        return stream_export(self.get_queryset(), self.export_columns, 'warehouse_items', export_format(request))
+
     @action(detail=False, methods=['get'], url_path='available_items')
     def available_items(self, request):
         check_permission(self.request.user, page="warehouse")
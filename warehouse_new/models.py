@@ -48,6 +48,6 @@ class WarehouseItem(models.Model):
 
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
-        if self.storage_bin:
-            self.storage_bin.update_used()
\ No newline at end of file
+        # StorageBin.used tracks stock records and is maintained incrementally by them,
+        # so there is nothing to re-aggregate here
+        super().save(*args, **kwargs)
\ No newline at end of file